@@ -0,0 +1,87 @@
+# backend/bitacora.py
+from fastapi import HTTPException
+from backend.cargas import carpeta_almacen
+from backend.depuracion import debug_print
+from datetime import datetime
+import threading
+import hashlib
+import json
+import os
+import re
+
+# Bitácora de pasos completados en la creación de un proyecto.
+# Permite reanudar un proyecto fallido desde el último paso correcto en lugar de recrearlo.
+# Vive en disco (PROJECT_JOURNAL_DIR o <almacén>/bitacoras) para sobrevivir a reinicios del backend.
+
+def carpeta_bitacoras() -> str:
+    ruta = os.getenv("PROJECT_JOURNAL_DIR") or os.path.join(carpeta_almacen(), "bitacoras")
+    os.makedirs(ruta, exist_ok=True)
+    return ruta
+
+# Si es 1 (por defecto), un fallo revierte el proyecto completo; con 0 se conserva lo hecho para reanudar
+def rollback_automatico() -> bool:
+    return os.getenv("PROJECT_ROLLBACK_ON_ERROR", "1") == "1"
+
+# Huella del payload: una reanudación debe usar la misma configuración que la ejecución original
+def huella_payload(datos: dict) -> str:
+    return hashlib.sha256(json.dumps(datos, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+class BitacoraProyecto:
+    def __init__(self, nombre_proyecto: str):
+        if not re.match(r'^[a-z0-9_]+$', nombre_proyecto or ""):
+            raise HTTPException(status_code=400, detail=f"Nombre de proyecto inválido: '{nombre_proyecto}'.")
+        self.proyecto = nombre_proyecto
+        self.ruta = os.path.join(carpeta_bitacoras(), f"{nombre_proyecto}.json")
+        self._lock = threading.Lock()
+        self._datos = self._cargar()
+
+    def _cargar(self) -> dict:
+        if os.path.exists(self.ruta):
+            with open(self.ruta, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {"proyecto": self.proyecto, "huella_payload": None, "pasos": {}}
+
+    def _guardar(self):
+        temporal = f"{self.ruta}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(self._datos, f, ensure_ascii=False)
+        os.replace(temporal, self.ruta)
+
+    def existe(self) -> bool:
+        return os.path.exists(self.ruta)
+
+    # Crea la bitácora asociada al payload de la ejecución
+    def iniciar(self, huella: str):
+        with self._lock:
+            self._datos = {"proyecto": self.proyecto, "huella_payload": huella, "pasos": {}}
+            self._guardar()
+
+    @property
+    def huella(self):
+        return self._datos.get("huella_payload")
+
+    def completado(self, paso: str) -> bool:
+        return paso in self._datos["pasos"]
+
+    def detalle(self, paso: str):
+        return self._datos["pasos"].get(paso, {}).get("detalle")
+
+    def pasos(self) -> list:
+        return list(self._datos["pasos"])
+
+    # Registra un paso como completado; el detalle debe ser serializable a JSON
+    def marcar(self, paso: str, detalle=None):
+        with self._lock:
+            self._datos["pasos"][paso] = {
+                "fecha": datetime.now().isoformat(timespec="seconds"),
+                "detalle": detalle
+            }
+            self._guardar()
+        debug_print(f"Bitácora {self.proyecto}: paso completado '{paso}'")
+
+    def eliminar(self):
+        if os.path.exists(self.ruta):
+            os.remove(self.ruta)
+
+    def to_dict(self) -> dict:
+        return {"proyecto": self.proyecto, "pasos": self._datos["pasos"]}
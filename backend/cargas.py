@@ -0,0 +1,431 @@
+# backend/cargas.py
+from fastapi import HTTPException
+from contextlib import contextmanager
+from backend.depuracion import debug_print
+import tempfile
+import hashlib
+import shutil
+import uuid
+import time
+import json
+import os
+import re
+
+try:
+    import fcntl
+except ImportError:  # Windows (entorno de desarrollo)
+    fcntl = None
+    import msvcrt
+
+# Tamaño del buffer fijo usado al copiar cargas a disco (1 MiB)
+TAMANO_BLOQUE_CARGA = 1024 * 1024
+
+# Límite por archivo en bytes (MAX_UPLOAD_SIZE_MB, 0 = sin límite)
+def limite_carga_bytes() -> int:
+    try:
+        return max(0, int(os.getenv("MAX_UPLOAD_SIZE_MB", "0"))) * 1024 * 1024
+    except ValueError:
+        return 0
+
+# Carpeta base de las cargas (TEMP_UPLOAD_DIR o el temporal del sistema)
+def carpeta_base_cargas() -> str:
+    base_dir = os.getenv("TEMP_UPLOAD_DIR")
+    if not base_dir:
+        return tempfile.gettempdir()
+    os.makedirs(base_dir, exist_ok=True)
+    return base_dir
+
+# Copia un archivo en bloques con buffer fijo, calculando tamaño y SHA-256 sobre la marcha.
+# Es bloqueante: desde un endpoint async debe ejecutarse con run_in_threadpool.
+def guardar_en_bloques(origen, ruta_destino: str, limite: int = 0) -> dict:
+    sha256 = hashlib.sha256()
+    tamano = 0
+
+    try:
+        with open(ruta_destino, "wb") as destino:
+            while True:
+                bloque = origen.read(TAMANO_BLOQUE_CARGA)
+                if not bloque:
+                    break
+
+                tamano += len(bloque)
+                if limite and tamano > limite:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"El archivo '{os.path.basename(ruta_destino)}' supera el tamaño máximo permitido ({limite // (1024 * 1024)} MB)."
+                    )
+
+                sha256.update(bloque)
+                destino.write(bloque)
+    except Exception:
+        if os.path.exists(ruta_destino):
+            os.remove(ruta_destino)
+        raise
+
+    return {"bytes": tamano, "sha256": sha256.hexdigest()}
+
+# Validaciones de nombre de archivo TIFF (extensión y nombre base)
+EXTENSIONES_PERMITIDAS = ['tif', 'tiff']
+PATRON_NOMBRE_TIFF = re.compile(r'^[a-z0-9_]+$')
+
+def validar_nombre_tiff(filename: str):
+    ext = filename.split(".")[-1].lower()
+    base = ".".join(filename.split(".")[:-1])
+
+    # Validar extensión
+    if ext not in EXTENSIONES_PERMITIDAS:
+        raise HTTPException(status_code=400, detail=f"Extensión no permitida: {filename}")
+
+    # Validar nombre base del archivo
+    if not PATRON_NOMBRE_TIFF.match(base):
+        raise HTTPException(status_code=400, detail=f"Nombre de archivo inválido: {filename} (solo minúsculas, números y guiones bajos)")
+
+# ---------------------------------------------------------------------------
+# Almacén direccionado por contenido: cada TIFF se guarda una sola vez como <sha256>.tif
+# ---------------------------------------------------------------------------
+PATRON_SHA256 = re.compile(r'^[0-9a-f]{64}$')
+
+def carpeta_almacen() -> str:
+    ruta = os.getenv("TIFF_STORE_DIR") or os.path.join(carpeta_base_cargas(), "almacen_tiff")
+    os.makedirs(ruta, exist_ok=True)
+    return ruta
+
+def ruta_blob(sha256: str) -> str:
+    if not PATRON_SHA256.match(sha256 or ""):
+        raise HTTPException(status_code=400, detail=f"Hash SHA-256 inválido: {sha256}")
+    return os.path.join(carpeta_almacen(), sha256[:2], f"{sha256}.tif")
+
+# Consultar un blob cuenta como uso: se renueva su fecha para que la limpieza del almacén no lo elimine
+def existe_blob(sha256: str) -> bool:
+    ruta = ruta_blob(sha256)
+    if not os.path.exists(ruta):
+        return False
+    try:
+        os.utime(ruta)
+    except OSError:
+        pass
+    return True
+
+# Mueve un archivo ya verificado al almacén; si el contenido ya existía se descarta la copia nueva
+def registrar_en_almacen(ruta_archivo: str, sha256: str) -> str:
+    destino = ruta_blob(sha256)
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    if os.path.exists(destino):
+        os.remove(ruta_archivo)
+        os.utime(destino)
+    else:
+        shutil.move(ruta_archivo, destino)
+    return destino
+
+# Expone un blob del almacén con su nombre original dentro de una carpeta de trabajo
+def vincular_en_carpeta(ruta_origen: str, carpeta: str, nombre: str) -> str:
+    destino = os.path.join(carpeta, nombre)
+    if os.path.exists(destino):
+        os.remove(destino)
+    try:
+        os.link(ruta_origen, destino)
+    except OSError:
+        shutil.copyfile(ruta_origen, destino)
+    return destino
+
+# Archivos derivados de un blob que se eliminan con él (metadatos y versión COG)
+def _derivados_blob(sha256: str) -> list:
+    almacen = carpeta_almacen()
+    return [
+        os.path.join(almacen, "metadatos", f"{sha256}.json"),
+        os.path.join(almacen, "cog", sha256[:2], f"{sha256}.tif"),
+    ]
+
+# Hashes en uso: manifiestos de los espacios de carga y sesiones abiertas
+def _hashes_referenciados() -> set:
+    referenciados = set()
+    base = carpeta_base_cargas()
+    for nombre in os.listdir(base):
+        if nombre.startswith(PREFIJO_ESPACIO) and os.path.isdir(os.path.join(base, nombre)):
+            try:
+                referenciados.update(EspacioTrabajo(nombre[len(PREFIJO_ESPACIO):]).hashes().values())
+            except (HTTPException, OSError, ValueError):
+                pass
+    carpeta = _carpeta_sesiones()
+    for nombre in os.listdir(carpeta):
+        if nombre.endswith(".json"):
+            try:
+                with open(os.path.join(carpeta, nombre), "r", encoding="utf-8") as f:
+                    referenciados.add(json.load(f)["sha256"])
+            except (OSError, ValueError, KeyError):
+                pass
+    return referenciados
+
+_ultima_limpieza_almacen = 0.0
+
+# Elimina los blobs sin referencias y sin uso durante TIFF_STORE_TTL segundos (0 = nunca), con sus derivados.
+# Los proyectos no dependen del blob: sus archivos son enlaces duros o copias.
+# Se ejecuta como mucho una vez por hora en cada proceso.
+def purgar_almacen(forzar: bool = False):
+    global _ultima_limpieza_almacen
+    ttl = float(os.getenv("TIFF_STORE_TTL", "604800"))
+    if ttl <= 0 or (not forzar and time.time() - _ultima_limpieza_almacen < 3600):
+        return
+    _ultima_limpieza_almacen = time.time()
+
+    limite = time.time() - ttl
+    almacen = carpeta_almacen()
+    referenciados = _hashes_referenciados()
+    for prefijo in os.listdir(almacen):
+        carpeta = os.path.join(almacen, prefijo)
+        if not re.match(r'^[0-9a-f]{2}$', prefijo) or not os.path.isdir(carpeta):
+            continue
+        for nombre in os.listdir(carpeta):
+            sha256 = nombre[:-len(".tif")] if nombre.endswith(".tif") else ""
+            if not PATRON_SHA256.match(sha256) or sha256 in referenciados:
+                continue
+            ruta = os.path.join(carpeta, nombre)
+            try:
+                if os.path.getmtime(ruta) >= limite:
+                    continue
+                os.remove(ruta)
+                for derivado in _derivados_blob(sha256):
+                    if os.path.exists(derivado):
+                        os.remove(derivado)
+                debug_print(f"Blob sin uso eliminado del almacén: {sha256}")
+            except OSError:
+                pass
+
+# ---------------------------------------------------------------------------
+# Sesiones de carga reanudables: crear, enviar bloques por offset y finalizar.
+# El estado vive en disco (<almacén>/sesiones) para compartirse entre workers.
+# ---------------------------------------------------------------------------
+
+# Bloqueo exclusivo de una sesión entre hilos y entre procesos (archivo <id>.lock con flock).
+# Con esperar=False retorna False en lugar de esperar si otro lo tiene.
+# El archivo no se borra al finalizar, para no separar a quien ya espera en él: lo elimina la purga por TTL.
+@contextmanager
+def _bloqueo_sesion(id_sesion: str, esperar: bool = True):
+    ruta_json, _ = _rutas_sesion(id_sesion)
+    with open(f"{ruta_json[:-len('.json')]}.lock", "a+b") as archivo:
+        try:
+            if fcntl is not None:
+                fcntl.flock(archivo.fileno(), fcntl.LOCK_EX if esperar else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                archivo.seek(0)
+                msvcrt.locking(archivo.fileno(), msvcrt.LK_LOCK if esperar else msvcrt.LK_NBLCK, 1)
+        except OSError:
+            if esperar:
+                raise
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            if fcntl is not None:
+                fcntl.flock(archivo.fileno(), fcntl.LOCK_UN)
+            else:
+                archivo.seek(0)
+                msvcrt.locking(archivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _carpeta_sesiones() -> str:
+    ruta = os.path.join(carpeta_almacen(), "sesiones")
+    os.makedirs(ruta, exist_ok=True)
+    return ruta
+
+def _rutas_sesion(id_sesion: str):
+    if not re.match(r'^[0-9a-f]{32}$', id_sesion or ""):
+        raise HTTPException(status_code=404, detail=f"No existe la sesión de carga '{id_sesion}'.")
+    base = os.path.join(_carpeta_sesiones(), id_sesion)
+    return f"{base}.json", f"{base}.parte"
+
+# Elimina las sesiones sin actividad durante UPLOAD_SESSION_TTL. La actividad es el archivo más reciente
+# de la sesión (.json, .parte o .lock): cada bloque recibido renueva .parte. Las sesiones con el bloqueo
+# tomado (una petición en curso) se conservan.
+def _purgar_sesiones():
+    ttl = float(os.getenv("UPLOAD_SESSION_TTL", "86400"))
+    limite = time.time() - ttl
+    carpeta = _carpeta_sesiones()
+
+    ultima_actividad = {}
+    for nombre in os.listdir(carpeta):
+        id_sesion, extension = os.path.splitext(nombre)
+        if extension not in (".json", ".parte", ".lock") or not re.match(r'^[0-9a-f]{32}$', id_sesion):
+            continue
+        try:
+            mtime = os.path.getmtime(os.path.join(carpeta, nombre))
+        except OSError:
+            continue
+        ultima_actividad[id_sesion] = max(mtime, ultima_actividad.get(id_sesion, 0))
+
+    for id_sesion, mtime in ultima_actividad.items():
+        if mtime >= limite:
+            continue
+        with _bloqueo_sesion(id_sesion, esperar=False) as obtenido:
+            if not obtenido:
+                continue
+            base = os.path.join(carpeta, id_sesion)
+            for extension in (".json", ".parte", ".lock"):
+                try:
+                    os.remove(base + extension)
+                except OSError:
+                    pass
+
+def estado_sesion(id_sesion: str) -> dict:
+    ruta_json, ruta_parte = _rutas_sesion(id_sesion)
+    if not os.path.exists(ruta_json):
+        raise HTTPException(status_code=404, detail=f"No existe la sesión de carga '{id_sesion}'.")
+    with open(ruta_json, "r", encoding="utf-8") as f:
+        sesion = json.load(f)
+    if existe_blob(sesion["sha256"]):
+        sesion["offset"] = sesion["tamano"]
+        sesion["completa"] = True
+    else:
+        sesion["offset"] = os.path.getsize(ruta_parte) if os.path.exists(ruta_parte) else 0
+        sesion["completa"] = False
+    return sesion
+
+# Crea una sesión; si el contenido ya está en el almacén no hace falta enviar ningún byte
+def crear_sesion(nombre: str, tamano: int, sha256: str) -> dict:
+    validar_nombre_tiff(nombre)
+    sha256 = sha256.lower()
+    ruta_blob(sha256)
+
+    limite = limite_carga_bytes()
+    if limite and tamano > limite:
+        raise HTTPException(status_code=413, detail=f"El archivo '{nombre}' supera el tamaño máximo permitido ({limite // (1024 * 1024)} MB).")
+
+    _purgar_sesiones()
+    id_sesion = uuid.uuid4().hex
+    ruta_json, _ = _rutas_sesion(id_sesion)
+    with open(ruta_json, "w", encoding="utf-8") as f:
+        json.dump({
+            "sessionId": id_sesion,
+            "nombre": nombre,
+            "tamano": tamano,
+            "sha256": sha256,
+            "creado": time.time()
+        }, f)
+    return estado_sesion(id_sesion)
+
+# Escribe un bloque en la posición indicada; el offset debe coincidir con lo ya recibido
+def escribir_bloque(id_sesion: str, offset: int, datos: bytes) -> dict:
+    with _bloqueo_sesion(id_sesion):
+        sesion = estado_sesion(id_sesion)
+        if sesion["completa"]:
+            return sesion
+        if offset != sesion["offset"]:
+            raise HTTPException(status_code=409, detail=f"Offset {offset} inesperado; el servidor tiene {sesion['offset']} bytes.")
+        if offset + len(datos) > sesion["tamano"]:
+            raise HTTPException(status_code=400, detail="El bloque excede el tamaño declarado del archivo.")
+
+        _, ruta_parte = _rutas_sesion(id_sesion)
+        with open(ruta_parte, "ab") as destino:
+            destino.write(datos)
+        return estado_sesion(id_sesion)
+
+# Verifica tamaño y SHA-256 del archivo recibido y lo registra en el almacén
+def finalizar_sesion(id_sesion: str) -> dict:
+    with _bloqueo_sesion(id_sesion):
+        sesion = estado_sesion(id_sesion)
+        ruta_json, ruta_parte = _rutas_sesion(id_sesion)
+
+        if not sesion["completa"]:
+            if sesion["offset"] != sesion["tamano"]:
+                raise HTTPException(status_code=409, detail=f"Carga incompleta: {sesion['offset']} de {sesion['tamano']} bytes.")
+
+            sha256 = hashlib.sha256()
+            with open(ruta_parte, "rb") as origen:
+                for bloque in iter(lambda: origen.read(TAMANO_BLOQUE_CARGA), b""):
+                    sha256.update(bloque)
+            if sha256.hexdigest() != sesion["sha256"]:
+                os.remove(ruta_parte)
+                raise HTTPException(status_code=422, detail=f"El SHA-256 de '{sesion['nombre']}' no coincide con el declarado.")
+
+            registrar_en_almacen(ruta_parte, sesion["sha256"])
+        elif os.path.exists(ruta_parte):
+            # El contenido llegó al almacén por otra vía (deduplicación): lo recibido sobra
+            os.remove(ruta_parte)
+
+        os.remove(ruta_json)
+        return {"nombre": sesion["nombre"], "bytes": sesion["tamano"], "sha256": sesion["sha256"]}
+
+# ---------------------------------------------------------------------------
+# Espacios de trabajo por carga: reemplazan la carpeta global UPLOAD_DIR.
+# Se identifican por uploadId y viven en disco, por lo que cualquier worker
+# (uvicorn/gunicorn) puede resolverlos. Los abandonados se eliminan por TTL.
+# ---------------------------------------------------------------------------
+PREFIJO_ESPACIO = "tiff_uploads_"
+MARCA_EN_USO = ".en_uso"
+MANIFIESTO = ".manifiesto.json"
+
+class EspacioTrabajo:
+    def __init__(self, id_espacio: str):
+        if not re.match(r'^[0-9a-f]{32}$', id_espacio or ""):
+            raise HTTPException(status_code=404, detail=f"No existe el espacio de carga '{id_espacio}'.")
+        self.id = id_espacio
+        self.ruta = os.path.join(carpeta_base_cargas(), f"{PREFIJO_ESPACIO}{id_espacio}")
+
+    @classmethod
+    def crear(cls):
+        purgar_espacios()
+        purgar_almacen()
+        espacio = cls(uuid.uuid4().hex)
+        os.makedirs(espacio.ruta)
+        debug_print(f"Espacio de carga creado: {espacio.ruta}")
+        return espacio
+
+    @classmethod
+    def obtener(cls, id_espacio: str):
+        espacio = cls(id_espacio)
+        if not os.path.isdir(espacio.ruta):
+            raise HTTPException(status_code=404, detail=f"No existe el espacio de carga '{id_espacio}' o ya expiró.")
+        return espacio
+
+    def archivo(self, nombre: str) -> str:
+        return os.path.join(self.ruta, nombre)
+
+    # Manifiesto nombre -> SHA-256 de los archivos del espacio (permite reutilizar cachés por contenido)
+    def registrar_archivo(self, nombre: str, sha256: str):
+        hashes = self.hashes()
+        hashes[nombre] = sha256
+        with open(self.archivo(MANIFIESTO), "w", encoding="utf-8") as f:
+            json.dump(hashes, f)
+
+    def hashes(self) -> dict:
+        ruta = self.archivo(MANIFIESTO)
+        if not os.path.exists(ruta):
+            return {}
+        with open(ruta, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    # Mientras un trabajo usa el espacio, la limpieza por TTL no lo toca
+    def marcar_en_uso(self):
+        open(self.archivo(MARCA_EN_USO), "w").close()
+
+    # Conserva el espacio (p. ej. para reanudar un proyecto) y lo deja expirar por TTL desde ahora
+    def liberar(self):
+        marca = self.archivo(MARCA_EN_USO)
+        if os.path.exists(marca):
+            os.remove(marca)
+        os.utime(self.ruta)
+
+    def eliminar(self):
+        if os.path.exists(self.ruta):
+            shutil.rmtree(self.ruta)
+            debug_print(f"Espacio de carga eliminado: {self.ruta}")
+
+# Elimina espacios sin uso más antiguos que UPLOAD_WORKSPACE_TTL
+def purgar_espacios():
+    ttl = float(os.getenv("UPLOAD_WORKSPACE_TTL", "21600"))
+    limite = time.time() - ttl
+    base = carpeta_base_cargas()
+    for nombre in os.listdir(base):
+        ruta = os.path.join(base, nombre)
+        if not nombre.startswith(PREFIJO_ESPACIO) or not os.path.isdir(ruta):
+            continue
+        try:
+            # Un espacio en uso solo se elimina si la marca quedó huérfana (proceso caído hace mucho)
+            marca = os.path.join(ruta, MARCA_EN_USO)
+            if os.path.exists(marca) and os.path.getmtime(marca) >= time.time() - 4 * ttl:
+                continue
+            if os.path.getmtime(ruta) < limite:
+                shutil.rmtree(ruta)
+                debug_print(f"Espacio de carga expirado eliminado: {ruta}")
+        except OSError:
+            pass
@@ -0,0 +1,155 @@
+# backend/cliente_qgis.py
+from backend.depuracion import debug_print
+from backend.metricas import duracion_subprocesos
+from qgis_tools.modelo_payload import (
+    payload_a_lista, codecs_disponibles, codificar, decodificar, escribir_trama, leer_trama
+)
+import subprocess
+import threading
+import queue
+import time
+import uuid
+import os
+
+# Cliente del proceso QGIS persistente (qgis_tools/qgis_worker.py).
+# El proceso se lanza al primer uso, se reutiliza entre proyectos y se reinicia si muere.
+class ClienteWorkerQgis:
+    def __init__(self, ejecutable: str, script: str, timeout_inicio: float, timeout_trabajo: float):
+        self.ejecutable = ejecutable
+        self.script = script
+        self.timeout_inicio = timeout_inicio
+        self.timeout_trabajo = timeout_trabajo
+        self._proceso = None
+        self._respuestas = None
+        self._codec = "json"
+        # QgsProject.instance() es un singleton: un trabajo a la vez por proceso
+        self._lock = threading.Lock()
+
+    # Lee las respuestas del worker en un hilo aparte para poder aplicar timeouts
+    @staticmethod
+    def _leer_salida(proceso, respuestas):
+        while True:
+            trama = leer_trama(proceso.stdout)
+            respuestas.put(trama)
+            if trama is None:  # EOF: el proceso terminó
+                break
+
+    def _esperar_respuesta(self, timeout: float) -> dict:
+        try:
+            trama = self._respuestas.get(timeout=timeout)
+        except queue.Empty:
+            self.detener()
+            raise TimeoutError(f"El worker QGIS no respondió en {timeout} segundos.")
+        if trama is None:
+            self.detener()
+            raise RuntimeError("El worker QGIS terminó inesperadamente.")
+        return decodificar(trama)
+
+    def _iniciar(self):
+        debug_print(f"Iniciando worker QGIS persistente: {self.ejecutable} {self.script}")
+        self._proceso = subprocess.Popen(
+            [self.ejecutable, self.script],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE
+        )
+        self._respuestas = queue.Queue()
+        threading.Thread(
+            target=self._leer_salida, args=(self._proceso, self._respuestas),
+            name="lector_worker_qgis", daemon=True
+        ).start()
+
+        respuesta = self._esperar_respuesta(self.timeout_inicio)
+        if not respuesta.get("listo"):
+            self.detener()
+            raise RuntimeError(f"Respuesta inesperada al iniciar el worker QGIS: {respuesta}")
+        # msgpack solo si ambos intérpretes lo tienen; si no, JSON
+        self._codec = "msgpack" if "msgpack" in respuesta.get("codecs", []) and "msgpack" in codecs_disponibles() else "json"
+        debug_print(f"Worker QGIS listo (codec {self._codec}).")
+
+    def _activo(self) -> bool:
+        return self._proceso is not None and self._proceso.poll() is None
+
+    def detener(self):
+        if self._proceso is not None:
+            try:
+                self._proceso.kill()
+                self._proceso.wait(timeout=5)
+            except Exception:
+                pass
+        self._proceso = None
+        self._respuestas = None
+        self._codec = "json"
+
+    def _enviar(self, peticion: dict) -> dict:
+        if not self._activo():
+            self._iniciar()
+        escribir_trama(self._proceso.stdin, codificar(peticion, self._codec))
+        return self._esperar_respuesta(self.timeout_trabajo)
+
+    # Lanza el proceso por adelantado para sacar el arranque de QGIS del camino de la petición
+    def precalentar(self):
+        with self._lock:
+            if not self._activo():
+                self._iniciar()
+
+    # Relanza el worker en segundo plano tras matar uno colgado; espera a que termine el trabajo actual
+    def _relanzar(self):
+        try:
+            self.precalentar()
+        except Exception as e:
+            debug_print(f"No se pudo relanzar el worker QGIS: {e}")
+
+    # Genera los proyectos .qgz; si el worker murió se reinicia y se reintenta una vez.
+    # Si no responde a tiempo se mata y se relanza, pero el trabajo no se reintenta (podría volver a colgarse).
+    # payload: modelo del backend o clases de qgis_tools.modelo_payload; viaja en forma posicional.
+    def generar(self, payload, nombre_db: str, grupo_contenedor: str) -> list:
+        peticion = {
+            "id": uuid.uuid4().hex,
+            "payload": payload_a_lista(payload),
+            "nombre_db": nombre_db,
+            "grupo_contenedor": grupo_contenedor
+        }
+        with self._lock:
+            inicio = time.perf_counter()
+            try:
+                respuesta = self._enviar(peticion)
+            except TimeoutError:
+                debug_print("Worker QGIS sin respuesta; se mata el proceso y se relanza.")
+                self.detener()
+                threading.Thread(target=self._relanzar, name="relanzar_worker_qgis", daemon=True).start()
+                raise
+            except (BrokenPipeError, RuntimeError) as e:
+                debug_print(f"Worker QGIS caído ({e}); reiniciando y reintentando.")
+                self.detener()
+                respuesta = self._enviar(peticion)
+            finally:
+                duracion_subprocesos.observar(time.perf_counter() - inicio, comando="qgis_worker",
+                                              resultado="ok" if self._activo() else "error")
+
+        if respuesta.get("id") != peticion["id"]:
+            raise RuntimeError("El worker QGIS devolvió la respuesta de otro trabajo.")
+        if not respuesta.get("ok"):
+            raise RuntimeError(respuesta.get("error") or "(sin mensaje)")
+        return respuesta["resultado"]
+
+_cliente = None
+_cliente_lock = threading.Lock()
+
+def worker_qgis_habilitado() -> bool:
+    return os.getenv("QGIS_WORKER_MODE", "persistente") == "persistente"
+
+def obtener_cliente_qgis() -> ClienteWorkerQgis:
+    global _cliente
+    with _cliente_lock:
+        if _cliente is None:
+            ejecutable = os.getenv("QGIS_EXECUTABLE")
+            if not ejecutable:
+                raise RuntimeError("La variable de entorno QGIS_EXECUTABLE no está definida en el archivo .env")
+            script = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "qgis_tools", "qgis_worker.py"))
+            _cliente = ClienteWorkerQgis(
+                ejecutable,
+                script,
+                timeout_inicio=float(os.getenv("QGIS_WORKER_START_TIMEOUT", "120")),
+                timeout_trabajo=float(os.getenv("QGIS_WORKER_TIMEOUT", "600"))
+            )
+        return _cliente
@@ -0,0 +1,117 @@
+# backend/database/cache_roles.py
+from collections import OrderedDict
+from backend.database.database import get_connection, conexion
+from backend.depuracion import debug_print
+import threading
+import select
+import time
+import os
+
+# Canal de PostgreSQL por el que se avisa a todos los procesos que cambiaron roles o membresías
+CANAL_ROLES = "confiseg_roles"
+
+# Caché en proceso de pertenencia usuario -> rol, con TTL (ROLE_CACHE_TTL) y desalojo LRU (ROLE_CACHE_SIZE).
+# Las respuestas negativas duran solo ROLE_CACHE_NEGATIVE_TTL: un rol recién otorgado se ve enseguida.
+# Se invalida al crear/revertir roles del proyecto y, con ROLE_CACHE_NOTIFY=1, por LISTEN/NOTIFY.
+class CacheRoles:
+    def __init__(self, ttl: float, capacidad: int, ttl_negativo: float = 0):
+        self.ttl = ttl
+        self.ttl_negativo = min(ttl_negativo, ttl)
+        self.capacidad = max(1, capacidad)
+        self._entradas = OrderedDict()  # (rol, usuario) -> (pertenece, vence)
+        self._lock = threading.Lock()
+
+    # Retorna True/False si está en caché y vigente; None si hay que consultar el catálogo
+    def obtener(self, rol: str, usuario: str):
+        clave = (rol, usuario)
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return None
+            pertenece, vence = entrada
+            if vence < time.monotonic():
+                del self._entradas[clave]
+                return None
+            self._entradas.move_to_end(clave)
+            return pertenece
+
+    def guardar(self, rol: str, usuario: str, pertenece: bool):
+        ttl = self.ttl if pertenece else self.ttl_negativo
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entradas[(rol, usuario)] = (pertenece, time.monotonic() + ttl)
+            self._entradas.move_to_end((rol, usuario))
+            while len(self._entradas) > self.capacidad:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self):
+        with self._lock:
+            self._entradas.clear()
+
+cache_roles = CacheRoles(
+    ttl=float(os.getenv("ROLE_CACHE_TTL", "60")),
+    capacidad=int(os.getenv("ROLE_CACHE_SIZE", "1024")),
+    ttl_negativo=float(os.getenv("ROLE_CACHE_NEGATIVE_TTL", "5"))
+)
+
+def notificacion_roles_habilitada() -> bool:
+    return os.getenv("ROLE_CACHE_NOTIFY", "0") == "1"
+
+# Vacía la caché local y avisa a los demás procesos. Se llama después del commit de los cambios de roles.
+# NOTIFY solo llega a quien escucha en la misma base: se envía en "postgres", donde corre la escucha.
+# Si el aviso falla, las cachés ajenas expiran por TTL.
+def notificar_cambio_roles():
+    cache_roles.invalidar()
+    if not notificacion_roles_habilitada():
+        return
+    try:
+        with conexion("postgres") as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute("SELECT pg_notify(%s, 'invalidar')", (CANAL_ROLES,))
+                conn.commit()
+            finally:
+                cur.close()
+    except Exception as e:
+        debug_print(f"No se pudo avisar el cambio de roles por {CANAL_ROLES}: {e}")
+
+_escucha = None
+
+# Hilo que escucha CANAL_ROLES con una conexión dedicada y vacía la caché con cada aviso
+def _escuchar_cambios_roles():
+    espera = 1
+    while True:
+        conn = None
+        try:
+            conn = get_connection("postgres")
+            conn.autocommit = True
+            cur = conn.cursor()
+            cur.execute(f"LISTEN {CANAL_ROLES};")
+            # Lo ocurrido mientras no se escuchaba se desconoce: se descarta la caché
+            cache_roles.invalidar()
+            debug_print(f"Escuchando cambios de roles en el canal {CANAL_ROLES}")
+            espera = 1
+            while True:
+                if select.select([conn], [], [], 60) == ([], [], []):
+                    continue
+                conn.poll()
+                if conn.notifies:
+                    conn.notifies.clear()
+                    cache_roles.invalidar()
+        except Exception as e:
+            debug_print(f"Escucha de cambios de roles interrumpida: {e}; reintentando en {espera} s")
+            time.sleep(espera)
+            espera = min(espera * 2, 60)
+        finally:
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+def iniciar_escucha_roles():
+    global _escucha
+    if _escucha is None and notificacion_roles_habilitada():
+        _escucha = threading.Thread(target=_escuchar_cambios_roles, name="escucha_roles", daemon=True)
+        _escucha.start()
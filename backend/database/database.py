@@ -1,8 +1,14 @@
 # backend/database/database.py
+from contextlib import contextmanager
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+import threading
+import time
 import os
 import psycopg2
+from backend.depuracion import debug_print
+from backend.metricas import espera_conexiones
 
-def get_connection(dbname: str = "postgres"):
+def _parametros_conexion() -> dict:
     user = os.getenv("DB_USER")
     password = os.getenv("DB_PASSWORD")
     host = os.getenv("DB_HOST")
@@ -21,10 +27,263 @@ def get_connection(dbname: str = "postgres"):
     if missing:
         raise ValueError(f"❌ Variables de entorno faltantes: {', '.join(missing)}")
 
-    return psycopg2.connect(
-        dbname=dbname,
-        user=user,
-        password=password,
-        host=host,
-        port=port
-    )
\ No newline at end of file
+    return {"user": user, "password": password, "host": host, "port": port}
+
+# Conexión directa (sin pool). El llamador es responsable de cerrarla.
+def get_connection(dbname: str = "postgres"):
+    with espera_conexiones.medir(origen="apertura"):
+        return psycopg2.connect(dbname=dbname, **_parametros_conexion())
+
+# Pool cerrado mientras se le pedía una conexión (revertido o desalojado por inactividad)
+class PoolCerrado(RuntimeError):
+    pass
+
+# Pool de conexiones para una base de datos concreta
+class PoolConexiones:
+    def __init__(self, dbname: str, minimo: int, maximo: int, idle_timeout: float, validar_despues: float, espera_maxima: float):
+        self.dbname = dbname
+        self.minimo = minimo
+        self.maximo = max(1, maximo)
+        self.idle_timeout = idle_timeout
+        self.validar_despues = validar_despues
+        self.espera_maxima = espera_maxima
+        self._libres = []  # [(conexion, instante de devolución)]
+        self._en_uso = 0
+        self._cerrado = False
+        self._ultimo_uso = time.monotonic()
+        self._condicion = threading.Condition()
+
+    def _total(self) -> int:
+        return len(self._libres) + self._en_uso
+
+    # Cierra conexiones libres que superan idle_timeout, conservando el mínimo
+    def _desalojar_inactivas(self):
+        ahora = time.monotonic()
+        total = self._total()
+        conservadas = []
+        for conn, devuelta in self._libres:
+            if ahora - devuelta > self.idle_timeout and total > self.minimo:
+                self._cerrar(conn)
+                total -= 1
+                continue
+            conservadas.append((conn, devuelta))
+        self._libres = conservadas
+
+    @staticmethod
+    def _cerrar(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    # Abre conexiones hasta DB_POOL_MIN; se llama al crear el pool y desde el hilo de mantenimiento.
+    # Los huecos se reservan bajo el lock y las conexiones se abren fuera de él.
+    def rellenar_minimo(self):
+        with self._condicion:
+            if self._cerrado:
+                return
+            faltantes = min(self.minimo, self.maximo) - self._total()
+            if faltantes <= 0:
+                return
+            self._en_uso += faltantes
+
+        abiertas = []
+        try:
+            for _ in range(faltantes):
+                abiertas.append(get_connection(self.dbname))
+        except Exception as e:
+            debug_print(f"No se pudo completar el mínimo del pool de '{self.dbname}': {e}")
+
+        with self._condicion:
+            self._en_uso -= faltantes
+            ahora = time.monotonic()
+            for conn in abiertas:
+                if self._cerrado:
+                    self._cerrar(conn)
+                else:
+                    self._libres.append((conn, ahora))
+            self._condicion.notify_all()
+
+    # Verifica que una conexión libre siga viva antes de entregarla (se llama fuera del lock)
+    def _saludable(self, conn, devuelta: float) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - devuelta < self.validar_despues:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    # Reserva una conexión libre (conn, devuelta) o un hueco para abrir una nueva (None, None)
+    def _reservar(self, limite: float):
+        with self._condicion:
+            while True:
+                if self._cerrado:
+                    raise PoolCerrado(f"El pool de conexiones de '{self.dbname}' está cerrado.")
+
+                self._ultimo_uso = time.monotonic()
+                self._desalojar_inactivas()
+                if self._libres:
+                    conn, devuelta = self._libres.pop()
+                    self._en_uso += 1
+                    return conn, devuelta
+
+                if self._total() < self.maximo:
+                    self._en_uso += 1
+                    return None, None
+
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    raise TimeoutError(f"No hay conexiones disponibles para '{self.dbname}' (máximo {self.maximo}).")
+                self._condicion.wait(restante)
+
+    def _liberar_hueco(self):
+        with self._condicion:
+            self._en_uso -= 1
+            self._condicion.notify()
+
+    def obtener(self):
+        limite = time.monotonic() + self.espera_maxima
+        while True:
+            conn, devuelta = self._reservar(limite)
+
+            if conn is None:
+                # La conexión nueva se abre fuera del lock
+                try:
+                    return get_connection(self.dbname)
+                except Exception:
+                    self._liberar_hueco()
+                    raise
+
+            # La validación (SELECT 1) también ocurre fuera del lock; si falla se descarta y se reintenta
+            if self._saludable(conn, devuelta):
+                return conn
+            self._cerrar(conn)
+            self._liberar_hueco()
+
+    # Devuelve una conexión al pool en estado limpio (sin transacción abierta, autocommit desactivado)
+    def devolver(self, conn, descartar: bool = False):
+        if not descartar and not conn.closed:
+            try:
+                if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if conn.autocommit:
+                    conn.autocommit = False
+            except Exception:
+                descartar = True
+
+        with self._condicion:
+            self._en_uso -= 1
+            self._ultimo_uso = time.monotonic()
+            if descartar or conn.closed or self._cerrado:
+                self._cerrar(conn)
+            else:
+                self._libres.append((conn, time.monotonic()))
+            self._condicion.notify()
+
+    def cerrar(self):
+        with self._condicion:
+            self._cerrado = True
+            for conn, _ in self._libres:
+                self._cerrar(conn)
+            self._libres = []
+            self._condicion.notify_all()
+
+    # Usado por el hilo de mantenimiento
+    def desalojar_inactivas(self):
+        with self._condicion:
+            self._desalojar_inactivas()
+
+    # Cierra el pool si no tiene conexiones y nadie lo usa desde hace más de `inactividad` segundos
+    def cerrar_si_inactivo(self, inactividad: float) -> bool:
+        with self._condicion:
+            if self._en_uso or self._libres or time.monotonic() - self._ultimo_uso <= inactividad:
+                return False
+            self._cerrado = True
+            return True
+
+_pools = {}
+_pools_lock = threading.Lock()
+_mantenimiento = None
+
+# Una pasada de mantenimiento: cierra conexiones inactivas, repone el mínimo y olvida los pools
+# de bases de proyecto sin uso, para no acumular uno por cada base que el proceso tocó alguna vez
+def _mantener_pools_una_vez():
+    with _pools_lock:
+        pools = list(_pools.items())
+    for dbname, pool in pools:
+        pool.desalojar_inactivas()
+        pool.rellenar_minimo()
+        if dbname != "postgres" and pool.cerrar_si_inactivo(pool.idle_timeout):
+            with _pools_lock:
+                if _pools.get(dbname) is pool:
+                    del _pools[dbname]
+            debug_print(f"Pool de conexiones de '{dbname}' cerrado por inactividad")
+
+# Hilo que mantiene periódicamente todos los pools
+def _mantener_pools(intervalo: float):
+    while True:
+        time.sleep(intervalo)
+        _mantener_pools_una_vez()
+
+def _iniciar_mantenimiento():
+    global _mantenimiento
+    if _mantenimiento is None:
+        intervalo = max(1.0, float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300")) / 2)
+        _mantenimiento = threading.Thread(target=_mantener_pools, args=(intervalo,), name="mantenimiento_pools", daemon=True)
+        _mantenimiento.start()
+
+def obtener_pool(dbname: str = "postgres") -> PoolConexiones:
+    with _pools_lock:
+        _iniciar_mantenimiento()
+        pool = _pools.get(dbname)
+        if pool is None:
+            pool = PoolConexiones(
+                dbname,
+                # El mínimo solo aplica a "postgres": las bases de proyecto se usan por ráfagas
+                minimo=int(os.getenv("DB_POOL_MIN", "0")) if dbname == "postgres" else 0,
+                maximo=int(os.getenv("DB_POOL_MAX", "10")),
+                idle_timeout=float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300")),
+                validar_despues=float(os.getenv("DB_POOL_HEALTHCHECK_AFTER", "30")),
+                espera_maxima=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+            )
+            _pools[dbname] = pool
+            if pool.minimo > 0:
+                # El mínimo se abre en segundo plano: la primera petición no espera por él
+                threading.Thread(target=pool.rellenar_minimo, name=f"minimo_pool_{dbname}", daemon=True).start()
+        return pool
+
+# Cierra y olvida el pool de una base de datos (necesario antes de DROP DATABASE o de usarla como plantilla)
+def cerrar_pool(dbname: str):
+    with _pools_lock:
+        pool = _pools.pop(dbname, None)
+    if pool is not None:
+        pool.cerrar()
+
+# Uso: with conexion("mi_db") as conn: ...
+# La conexión vuelve al pool al salir; si hubo error en la conexión misma se descarta.
+@contextmanager
+def conexion(dbname: str = "postgres"):
+    pool = obtener_pool(dbname)
+    with espera_conexiones.medir(origen="pool"):
+        try:
+            conn = pool.obtener()
+        except PoolCerrado:
+            # El pool se cerró entre obtenerlo y pedirle la conexión: se usa uno nuevo
+            pool = obtener_pool(dbname)
+            conn = pool.obtener()
+    try:
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        pool.devolver(conn, descartar=True)
+        raise
+    except BaseException:
+        pool.devolver(conn)
+        raise
+    else:
+        pool.devolver(conn)
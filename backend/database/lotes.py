@@ -0,0 +1,36 @@
+# backend/database/lotes.py
+from psycopg2.extensions import adapt
+from backend.depuracion import debug_print
+import os
+
+# Sentencias por viaje al servidor al ejecutar un plan (SQL_BATCH_SIZE)
+def tamano_lote() -> int:
+    try:
+        return max(1, int(os.getenv("SQL_BATCH_SIZE", "500")))
+    except ValueError:
+        return 500
+
+# Literal SQL seguro para valores simples (texto, números, None) en planes construidos sin conexión.
+# adapt() sin conexión codifica el texto en latin-1; aquí el texto se cita a mano y queda en Unicode,
+# con E'...' si lleva barras invertidas para no depender de standard_conforming_strings.
+def literal(valor) -> str:
+    if isinstance(valor, str):
+        if "\x00" in valor:
+            raise ValueError("Un literal SQL no puede contener el carácter NUL.")
+        citado = valor.replace("'", "''")
+        if "\\" in citado:
+            return "E'" + citado.replace("\\", "\\\\") + "'"
+        return f"'{citado}'"
+    return adapt(valor).getquoted().decode("utf-8")
+
+# Elimina sentencias repetidas conservando el orden (p. ej. GRANT USAGE por cada tabla del esquema)
+def sin_duplicados(sentencias: list) -> list:
+    return list(dict.fromkeys(sentencias))
+
+# Ejecuta un plan de sentencias como scripts de varias sentencias: un viaje por lote, no uno por sentencia
+def ejecutar_plan(cur, sentencias: list, lote: int = None):
+    lote = lote or tamano_lote()
+    for inicio in range(0, len(sentencias), lote):
+        bloque = sentencias[inicio:inicio + lote]
+        cur.execute("\n".join(s.strip() for s in bloque))
+    debug_print(f"Plan ejecutado: {len(sentencias)} sentencias en {(len(sentencias) + lote - 1) // lote} lotes")
@@ -0,0 +1,114 @@
+# backend/database/mantenimiento.py
+from backend.database.database import conexion
+from backend.depuracion import debug_print
+import hashlib
+import time
+import os
+
+# Índices y parámetros de almacenamiento de las tablas de segmentación (<esquema>.<esquema>_<ráster>),
+# que los estudiantes editan polígono a polígono desde QGIS Server (WMS/WFS-T).
+
+# Límite de PostgreSQL para identificadores
+LONGITUD_MAXIMA_IDENTIFICADOR = 63
+
+# Espacio libre por página para que las ediciones quepan en la misma página (SEGMENTATION_FILLFACTOR)
+def fillfactor_segmentaciones() -> int:
+    try:
+        valor = int(os.getenv("SEGMENTATION_FILLFACTOR", "85"))
+    except ValueError:
+        valor = 85
+    return max(10, min(100, valor))
+
+# Autovacuum/autoanalyze más frecuentes que el 20 %/10 % global: las tablas crecen desde casi vacías
+def opciones_tabla_segmentacion() -> str:
+    vacuum = float(os.getenv("SEGMENTATION_AUTOVACUUM_SCALE", "0.05"))
+    analyze = float(os.getenv("SEGMENTATION_AUTOANALYZE_SCALE", "0.02"))
+    return (
+        f"fillfactor = {fillfactor_segmentaciones()}, "
+        f"autovacuum_vacuum_scale_factor = {vacuum}, "
+        f"autovacuum_analyze_scale_factor = {analyze}"
+    )
+
+# Nombre de índice dentro del límite de 63 caracteres; si hay que recortar, un hash evita colisiones
+def nombre_indice(tabla: str, sufijo: str) -> str:
+    nombre = f"{tabla}_{sufijo}"
+    if len(nombre) <= LONGITUD_MAXIMA_IDENTIFICADOR:
+        return nombre
+    resumen = hashlib.md5(tabla.encode("utf-8")).hexdigest()[:8]
+    return f"{tabla[:LONGITUD_MAXIMA_IDENTIFICADOR - len(sufijo) - 10]}_{resumen}_{sufijo}"
+
+# GiST sobre la geometría y btree sobre cada campo CIAF (clase y código)
+def sentencias_indices_segmentacion(esquema: str, tabla: str, campos_ciaf: list) -> list:
+    fillfactor = fillfactor_segmentaciones()
+    sentencias = [
+        f"CREATE INDEX IF NOT EXISTS {nombre_indice(tabla, 'geom_gist')} "
+        f"ON {esquema}.{tabla} USING gist (geom) WITH (fillfactor = {fillfactor});"
+    ]
+    for campo in campos_ciaf:
+        sentencias.append(
+            f"CREATE INDEX IF NOT EXISTS {nombre_indice(tabla, campo)} "
+            f"ON {esquema}.{tabla} ({campo}) WITH (fillfactor = {fillfactor});"
+        )
+    return sentencias
+
+# Tablas de segmentación de la base actual con sus campos CIAF: (esquema, tabla, [campos]).
+# Solo cuentan las tablas <esquema>.<esquema>_<ráster> con geometría "geom" y al menos un campo CIAF;
+# el prefijo se compara literalmente (LIKE trataría los "_" del esquema como comodines).
+def consultar_tablas_segmentacion(cur) -> list:
+    cur.execute("""
+        SELECT g.f_table_schema, g.f_table_name,
+               array_agg(c.column_name::text ORDER BY c.ordinal_position)
+        FROM geometry_columns g
+        JOIN information_schema.columns c
+          ON c.table_schema = g.f_table_schema AND c.table_name = g.f_table_name
+         AND c.column_name ~ '^(ciaf_[0-9]+|id_ciaf_[0-9]+n)$'
+        WHERE g.f_geometry_column = 'geom'
+          AND length(g.f_table_name) > length(g.f_table_schema) + 1
+          AND left(g.f_table_name, length(g.f_table_schema) + 1) = g.f_table_schema || '_'
+        GROUP BY g.f_table_schema, g.f_table_name
+        ORDER BY 1, 2
+    """)
+    return [(esquema, tabla, list(campos)) for esquema, tabla, campos in cur.fetchall()]
+
+# Asegura índices y parámetros en las tablas de segmentación (también las de proyectos anteriores),
+# las reindexa y actualiza las estadísticas de toda la base del proyecto.
+def mantener_proyecto(trabajo, nombre_db: str, reindexar: bool = True) -> tuple:
+    resumen = []
+    with conexion(nombre_db) as conn:
+        conn.autocommit = True
+        cur = conn.cursor()
+        try:
+            with trabajo.etapa("indices"):
+                tablas = consultar_tablas_segmentacion(cur)
+                opciones = opciones_tabla_segmentacion()
+                for esquema, tabla, campos in tablas:
+                    cur.execute(f"ALTER TABLE {esquema}.{tabla} SET ({opciones});")
+                    for sentencia in sentencias_indices_segmentacion(esquema, tabla, campos):
+                        cur.execute(sentencia)
+
+            with trabajo.etapa("reindexacion"):
+                # CONCURRENTLY (PostgreSQL 12+) no bloquea las ediciones en curso
+                cur.execute("SHOW server_version_num;")
+                concurrente = int(cur.fetchone()[0]) >= 120000
+                for esquema, tabla, campos in tablas:
+                    inicio = time.perf_counter()
+                    if reindexar:
+                        cur.execute(f"REINDEX TABLE {'CONCURRENTLY ' if concurrente else ''}{esquema}.{tabla};")
+                    resumen.append({
+                        "tabla": f"{esquema}.{tabla}",
+                        "indices": [nombre_indice(tabla, "geom_gist")] + [nombre_indice(tabla, c) for c in campos],
+                        "duracion_segundos": round(time.perf_counter() - inicio, 2)
+                    })
+
+            with trabajo.etapa("analisis"):
+                cur.execute("ANALYZE;")
+        finally:
+            cur.close()
+
+    debug_print(f"Mantenimiento de {nombre_db} completado: {len(resumen)} tablas de segmentación")
+    return 200, {
+        "success": True,
+        "msg": f"✅ Mantenimiento del proyecto '{nombre_db}' completado.",
+        "reindexado": reindexar,
+        "tablas": resumen
+    }
@@ -0,0 +1,184 @@
+# backend/database/plantillas.py
+from backend.database.database import get_connection
+from backend.depuracion import debug_print
+import threading
+import hashlib
+import uuid
+import os
+
+# Extensiones que necesita toda base de datos de proyecto
+EXTENSIONES_PROYECTO = [
+    "postgis",
+    "postgis_raster",
+    "postgis_topology",
+    "postgis_sfcgal",
+    "fuzzystrmatch",
+    "address_standardizer",
+    "address_standardizer_data_us",
+    "postgis_tiger_geocoder"
+]
+
+# Prefijo de las bases "calientes" ya creadas a partir de la plantilla
+PREFIJO_BASE_CALIENTE = "confiseg_caliente_"
+
+# Clave del advisory lock que serializa la creación de la plantilla y el uso de bases calientes
+_CLAVE_LOCK = 72150301
+
+_reposicion_lock = threading.Lock()
+_plantillas_verificadas = set()
+
+def plantillas_habilitadas() -> bool:
+    return os.getenv("PROJECT_DB_TEMPLATE", "1") == "1"
+
+# Versión de la plantilla: cambia con el conjunto de extensiones y con la versión por defecto de cada una,
+# de modo que tras actualizar PostGIS (u otra extensión) en el servidor se crea una plantilla nueva
+def version_plantilla(versiones: dict) -> str:
+    clave = ",".join(f"{ext}={versiones.get(ext, '')}" for ext in EXTENSIONES_PROYECTO)
+    return hashlib.sha1(clave.encode("utf-8")).hexdigest()[:8]
+
+def versiones_extensiones(cur) -> dict:
+    cur.execute(
+        "SELECT name, default_version FROM pg_available_extensions WHERE name = ANY(%s)",
+        (EXTENSIONES_PROYECTO,)
+    )
+    return dict(cur.fetchall())
+
+def nombre_plantilla(cur) -> str:
+    return f"confiseg_plantilla_{version_plantilla(versiones_extensiones(cur))}"
+
+# Las bases calientes llevan la versión de la plantilla de la que se copiaron
+def prefijo_bases_calientes(plantilla: str) -> str:
+    return f"{PREFIJO_BASE_CALIENTE}{plantilla.rsplit('_', 1)[-1]}_"
+
+def _tamano_reserva() -> int:
+    try:
+        return max(0, int(os.getenv("PROJECT_DB_WARM_POOL", "0")))
+    except ValueError:
+        return 0
+
+# Bases cuyo nombre empieza literalmente por prefijo, ordenadas por nombre.
+# Se compara con left(): en LIKE cada "_" del prefijo sería un comodín y podría tomarse otra base.
+def _bases_con_prefijo(cur, prefijo: str) -> list:
+    cur.execute(
+        "SELECT datname FROM pg_database WHERE left(datname, length(%s)) = %s ORDER BY datname",
+        (prefijo, prefijo)
+    )
+    return [row[0] for row in cur.fetchall()]
+
+def _existe_base(cur, nombre_db: str) -> bool:
+    cur.execute("SELECT 1 FROM pg_database WHERE datname = %s", (nombre_db,))
+    return cur.fetchone() is not None
+
+# Crea las extensiones del proyecto que aún no existan, con una sola consulta de verificación
+def instalar_extensiones(cur):
+    cur.execute("SELECT extname FROM pg_extension")
+    instaladas = {row[0] for row in cur.fetchall()}
+    for ext in EXTENSIONES_PROYECTO:
+        if ext not in instaladas:
+            cur.execute(f"CREATE EXTENSION IF NOT EXISTS {ext};")
+
+# Crea la plantilla versionada una sola vez (protegida por advisory lock entre workers)
+def asegurar_plantilla() -> str:
+    conn_admin = get_connection("postgres")
+    try:
+        conn_admin.autocommit = True
+        cur = conn_admin.cursor()
+        plantilla = nombre_plantilla(cur)
+        if plantilla in _plantillas_verificadas:
+            cur.close()
+            return plantilla
+        cur.execute("SELECT pg_advisory_lock(%s)", (_CLAVE_LOCK,))
+        try:
+            if not _existe_base(cur, plantilla):
+                debug_print(f"Creando base de datos plantilla: {plantilla}")
+                cur.execute(f"CREATE DATABASE {plantilla}")
+                try:
+                    # La conexión a la plantilla se cierra antes de usarla como TEMPLATE
+                    conn_plantilla = get_connection(plantilla)
+                    try:
+                        conn_plantilla.autocommit = True
+                        cur_plantilla = conn_plantilla.cursor()
+                        instalar_extensiones(cur_plantilla)
+                        cur_plantilla.close()
+                    finally:
+                        conn_plantilla.close()
+                except Exception:
+                    cur.execute(f"DROP DATABASE IF EXISTS {plantilla}")
+                    raise
+                cur.execute(f"ALTER DATABASE {plantilla} WITH IS_TEMPLATE true")
+        finally:
+            cur.execute("SELECT pg_advisory_unlock(%s)", (_CLAVE_LOCK,))
+            cur.close()
+    finally:
+        conn_admin.close()
+    _plantillas_verificadas.add(plantilla)
+    return plantilla
+
+# Intenta renombrar una base caliente de la plantilla vigente como base del proyecto;
+# retorna False si no hay disponibles
+def _tomar_base_caliente(cur, nombre_db: str, plantilla: str) -> bool:
+    cur.execute("SELECT pg_advisory_lock(%s)", (_CLAVE_LOCK,))
+    try:
+        calientes = _bases_con_prefijo(cur, prefijo_bases_calientes(plantilla))
+        if not calientes:
+            return False
+        cur.execute(f"ALTER DATABASE {calientes[0]} RENAME TO {nombre_db}")
+        debug_print(f"Base caliente {calientes[0]} asignada al proyecto {nombre_db}")
+        return True
+    finally:
+        cur.execute("SELECT pg_advisory_unlock(%s)", (_CLAVE_LOCK,))
+
+# Completa la reserva de bases calientes hasta PROJECT_DB_WARM_POOL
+def reponer_bases_calientes():
+    objetivo = _tamano_reserva()
+    if objetivo == 0 or not _reposicion_lock.acquire(blocking=False):
+        return
+    try:
+        plantilla = asegurar_plantilla()
+        conn_admin = get_connection("postgres")
+        try:
+            conn_admin.autocommit = True
+            cur = conn_admin.cursor()
+            prefijo = prefijo_bases_calientes(plantilla)
+
+            # Las bases calientes de una plantilla anterior tienen versiones de extensiones viejas
+            cur.execute("SELECT pg_advisory_lock(%s)", (_CLAVE_LOCK,))
+            try:
+                for obsoleta in _bases_con_prefijo(cur, PREFIJO_BASE_CALIENTE):
+                    if obsoleta.startswith(prefijo):
+                        continue
+                    cur.execute(f"DROP DATABASE IF EXISTS {obsoleta}")
+                    debug_print(f"Base caliente obsoleta eliminada: {obsoleta}")
+            finally:
+                cur.execute("SELECT pg_advisory_unlock(%s)", (_CLAVE_LOCK,))
+
+            faltantes = objetivo - len(_bases_con_prefijo(cur, prefijo))
+            for _ in range(faltantes):
+                nombre = f"{prefijo}{uuid.uuid4().hex[:12]}"
+                cur.execute(f"CREATE DATABASE {nombre} TEMPLATE {plantilla}")
+                debug_print(f"Base caliente creada: {nombre}")
+            cur.close()
+        finally:
+            conn_admin.close()
+    except Exception as e:
+        debug_print(f"No se pudo reponer la reserva de bases calientes: {e}")
+    finally:
+        _reposicion_lock.release()
+
+# Crea la base de datos del proyecto: base caliente renombrada, o copia de la plantilla
+def aprovisionar_base_de_datos(nombre_db: str):
+    plantilla = asegurar_plantilla()
+    conn_admin = get_connection("postgres")
+    try:
+        conn_admin.autocommit = True
+        cur = conn_admin.cursor()
+        if not (_tamano_reserva() > 0 and _tomar_base_caliente(cur, nombre_db, plantilla)):
+            cur.execute(f"CREATE DATABASE {nombre_db} TEMPLATE {plantilla}")
+            debug_print(f"Base de datos {nombre_db} creada desde la plantilla {plantilla}")
+        cur.close()
+    finally:
+        conn_admin.close()
+
+    # La reserva se repone fuera del camino de la petición
+    if _tamano_reserva() > 0:
+        threading.Thread(target=reponer_bases_calientes, name="reponer_bases_calientes", daemon=True).start()
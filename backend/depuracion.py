@@ -0,0 +1,7 @@
+# backend/depuracion.py
+import os
+
+# Manejo de mensajes en consola 
+def debug_print(msg):
+    if os.getenv("DEBUG_MODE", "0") == "1":
+        print(f"[DEBUG] {msg}")
@@ -2,8 +2,14 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import PlainTextResponse
 from backend.routers import login
 from backend.routers import projects
+from backend.cliente_qgis import obtener_cliente_qgis, worker_qgis_habilitado
+from backend.depuracion import debug_print
+from backend.metricas import exponer_metricas
+from backend.database.cache_roles import iniciar_escucha_roles
+import threading
 import os
 
 app = FastAPI()
@@ -17,6 +23,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Arranca el worker QGIS persistente en segundo plano para no pagar su inicio en la primera petición
+@app.on_event("startup")
+def iniciar_worker_qgis():
+    if os.getenv("QGIS_PROJECT_WRITER", "qgis") == "plantilla":
+        return
+    if not worker_qgis_habilitado() or not os.getenv("QGIS_EXECUTABLE"):
+        return
+
+    def precalentar():
+        try:
+            obtener_cliente_qgis().precalentar()
+        except Exception as e:
+            debug_print(f"No se pudo iniciar el worker QGIS: {e}")
+
+    threading.Thread(target=precalentar, name="precalentar_worker_qgis", daemon=True).start()
+
+# Con ROLE_CACHE_NOTIFY=1, la caché de roles del login se vacía ante cada NOTIFY de cambios de roles
+@app.on_event("startup")
+def iniciar_cache_roles():
+    iniciar_escucha_roles()
+
+@app.on_event("shutdown")
+def detener_worker_qgis():
+    if worker_qgis_habilitado() and os.getenv("QGIS_EXECUTABLE"):
+        obtener_cliente_qgis().detener()
+
+# Métricas en formato de texto de Prometheus (etapas, conexiones, subprocesos, cargas)
+@app.get("/metrics", response_class=PlainTextResponse)
+def metricas():
+    return PlainTextResponse(exponer_metricas(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # Incluye rutas API
 app.include_router(login.router)
 app.include_router(projects.router)
@@ -0,0 +1,147 @@
+# backend/metricas.py
+# Métricas en proceso (contadores e histogramas) expuestas en formato de texto de Prometheus en /metrics.
+# Sin dependencias externas; cada worker de uvicorn/gunicorn expone sus propias métricas.
+from contextlib import contextmanager
+import threading
+import bisect
+import time
+
+# Cubetas por defecto en segundos: de operaciones de catálogo a importaciones largas
+CUBETAS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+_lock = threading.Lock()
+_registro = []
+
+def _clave(etiquetas: tuple, valores: dict) -> tuple:
+    return tuple(str(valores.get(e, "")) for e in etiquetas)
+
+def _escapar(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _formatear_etiquetas(etiquetas: tuple, clave: tuple, extra: str = "") -> str:
+    partes = [f'{e}="{_escapar(v)}"' for e, v in zip(etiquetas, clave)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+class Contador:
+    def __init__(self, nombre: str, ayuda: str, etiquetas: tuple = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self._valores = {}
+        with _lock:
+            _registro.append(self)
+
+    def inc(self, valor: float = 1, **etiquetas):
+        clave = _clave(self.etiquetas, etiquetas)
+        with _lock:
+            self._valores[clave] = self._valores.get(clave, 0) + valor
+
+    def exponer(self) -> list:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} counter"]
+        for clave, valor in sorted(self._valores.items()):
+            lineas.append(f"{self.nombre}{_formatear_etiquetas(self.etiquetas, clave)} {valor}")
+        return lineas
+
+class Histograma:
+    def __init__(self, nombre: str, ayuda: str, etiquetas: tuple = (), cubetas: tuple = CUBETAS_SEGUNDOS):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self.cubetas = tuple(sorted(cubetas))
+        self._series = {}  # clave -> [conteos por cubeta, suma, total]
+        with _lock:
+            _registro.append(self)
+
+    def observar(self, valor: float, **etiquetas):
+        clave = _clave(self.etiquetas, etiquetas)
+        indice = bisect.bisect_left(self.cubetas, valor)
+        with _lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = [[0] * len(self.cubetas), 0.0, 0]
+            if indice < len(self.cubetas):
+                serie[0][indice] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    # Uso: with histograma.medir(etapa="x"): ...  (registra también si hay excepción)
+    @contextmanager
+    def medir(self, **etiquetas):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **etiquetas)
+
+    def exponer(self) -> list:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        for clave, (conteos, suma, total) in sorted(self._series.items()):
+            acumulado = 0
+            for limite, conteo in zip(self.cubetas, conteos):
+                acumulado += conteo
+                cubeta = _formatear_etiquetas(self.etiquetas, clave, 'le="%s"' % limite)
+                lineas.append(f"{self.nombre}_bucket{cubeta} {acumulado}")
+            cubeta = _formatear_etiquetas(self.etiquetas, clave, 'le="+Inf"')
+            lineas.append(f"{self.nombre}_bucket{cubeta} {total}")
+            lineas.append(f"{self.nombre}_sum{_formatear_etiquetas(self.etiquetas, clave)} {suma}")
+            lineas.append(f"{self.nombre}_count{_formatear_etiquetas(self.etiquetas, clave)} {total}")
+        return lineas
+
+# Texto completo para /metrics
+def exponer_metricas() -> str:
+    with _lock:
+        lineas = []
+        for metrica in _registro:
+            lineas.extend(metrica.exponer())
+    return "\n".join(lineas) + "\n"
+
+# ---------------------------------------------------------------------------
+# Métricas de la aplicación
+# ---------------------------------------------------------------------------
+duracion_etapas = Histograma(
+    "confiseg_etapa_duracion_segundos",
+    "Duración de cada etapa de los trabajos de creación/actualización de proyectos",
+    ("etapa", "resultado")
+)
+trabajos_terminados = Contador(
+    "confiseg_trabajos_total",
+    "Trabajos de proyecto terminados por estado final",
+    ("estado",)
+)
+duracion_trabajos = Histograma(
+    "confiseg_trabajo_duracion_segundos",
+    "Duración total de los trabajos de proyecto",
+    ("estado",)
+)
+espera_conexiones = Histograma(
+    "confiseg_conexion_espera_segundos",
+    "Tiempo para obtener una conexión a PostgreSQL",
+    ("origen",)
+)
+duracion_subprocesos = Histograma(
+    "confiseg_subproceso_duracion_segundos",
+    "Tiempo de reloj de procesos externos (raster2pgsql, psql, QGIS)",
+    ("comando", "resultado")
+)
+duracion_importacion_rasters = Histograma(
+    "confiseg_raster_importacion_segundos",
+    "Duración de la importación de cada ráster",
+    ("modo", "resultado")
+)
+duracion_normalizacion = Histograma(
+    "confiseg_normalizacion_cog_segundos",
+    "Duración de la normalización de TIFFs a Cloud-Optimized GeoTIFF",
+    ("resultado",)
+)
+bytes_cargados = Contador(
+    "confiseg_bytes_cargados_total",
+    "Bytes de TIFF recibidos",
+    ("via",)
+)
+archivos_cargados = Contador(
+    "confiseg_archivos_cargados_total",
+    "Archivos TIFF recibidos por completo",
+    ("via",)
+)
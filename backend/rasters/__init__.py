@@ -0,0 +1 @@
+# backend/rasters/__init__.py
\ No newline at end of file
@@ -0,0 +1,224 @@
+# backend/rasters/cargador_nativo.py
+import os
+import math
+import struct
+import binascii
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+from psycopg2 import sql
+from backend.depuracion import debug_print
+
+# Tamaño de tesela equivalente a "raster2pgsql -t 512x512"
+TAMANO_TESELA = (512, 512)
+
+# Tamaño de lectura que se entrega a psycopg2 durante el COPY (1 MiB)
+TAMANO_BLOQUE_COPY = 1024 * 1024
+
+# Tipos de píxel de PostGIS raster según el dtype de NumPy
+TIPOS_PIXEL = {
+    "int8": 3,     # 8BSI
+    "uint8": 4,    # 8BUI
+    "int16": 5,    # 16BSI
+    "uint16": 6,   # 16BUI
+    "int32": 7,    # 32BSI
+    "uint32": 8,   # 32BUI
+    "float32": 10, # 32BF
+    "float64": 11, # 64BF
+}
+
+BANDA_CON_NODATA = 0x40
+BANDA_FUERA_DE_BD = 0x80
+
+# Cabecera WKB de PostGIS raster (little endian, versión 0)
+_CABECERA_WKB = struct.Struct("<BHHddddddiHH")
+
+# Nodata representable en el tipo de píxel de la banda, o None si no lo hay.
+# Como raster2pgsql, un valor fuera de rango se ajusta al extremo del tipo (p. ej. -9999 en uint16 -> 0)
+# y NaN en una banda entera se descarta: np.array() fallaría o daría la vuelta al valor.
+def nodata_de_banda(nodata, dtype):
+    if nodata is None:
+        return None
+    dtype = np.dtype(dtype)
+    if dtype.kind in "iu":
+        if math.isnan(nodata):
+            return None
+        info = np.iinfo(dtype)
+        return int(min(max(nodata, info.min), info.max))
+    if dtype == np.float32 and math.isfinite(nodata):
+        limite = float(np.finfo(np.float32).max)
+        return min(max(nodata, -limite), limite)
+    return nodata
+
+# Nodatas de las bandas de un archivo ajustados a su tipo, avisando de los que cambian
+def _nodatas_ajustados(src) -> list:
+    nodatas = []
+    for indice, (nodata, dtype) in enumerate(zip(src.nodatavals, src.dtypes), start=1):
+        ajustado = nodata_de_banda(nodata, dtype)
+        if nodata is not None and not (ajustado == nodata or (ajustado is not None and math.isnan(nodata))):
+            debug_print(f"Nodata {nodata} de la banda {indice} no cabe en {dtype}; se usa {ajustado}")
+        nodatas.append(ajustado)
+    return nodatas
+
+# Construye la representación WKB (en partes) de una tesela con sus bandas
+def tesela_a_wkb(datos: np.ndarray, transformacion, srid: int, nodatas: list) -> list:
+    num_bandas, alto, ancho = datos.shape
+    partes = [_CABECERA_WKB.pack(
+        1, 0, num_bandas,
+        transformacion.a, transformacion.e,
+        transformacion.c, transformacion.f,
+        transformacion.b, transformacion.d,
+        srid, ancho, alto
+    )]
+
+    for indice in range(num_bandas):
+        dtype = datos.dtype
+        tipo_pixel = TIPOS_PIXEL.get(dtype.name)
+        if tipo_pixel is None:
+            raise ValueError(f"Tipo de dato no soportado para PostGIS raster: {dtype.name}")
+
+        nodata = nodata_de_banda(nodatas[indice] if indice < len(nodatas) else None, dtype)
+        formato = dtype.newbyteorder("<")
+        bandera = tipo_pixel | (BANDA_CON_NODATA if nodata is not None else 0)
+        valor_nodata = np.array(nodata if nodata is not None else 0, dtype=formato)
+
+        # Sin copia cuando la banda ya es contigua y little endian
+        banda = np.ascontiguousarray(datos[indice], dtype=formato)
+        partes.append(bytes([bandera]))
+        partes.append(valor_nodata.tobytes())
+        partes.append(memoryview(banda).cast("B"))
+
+    return partes
+
+# WKB de una tesela out-db: por banda, solo tipo, nodata, número de banda en el archivo y su ruta
+def tesela_outdb_a_wkb(transformacion, ancho: int, alto: int, srid: int, dtypes: list, nodatas: list, ruta: bytes) -> list:
+    partes = [_CABECERA_WKB.pack(
+        1, 0, len(dtypes),
+        transformacion.a, transformacion.e,
+        transformacion.c, transformacion.f,
+        transformacion.b, transformacion.d,
+        srid, ancho, alto
+    )]
+
+    for indice, nombre_dtype in enumerate(dtypes):
+        tipo_pixel = TIPOS_PIXEL.get(nombre_dtype)
+        if tipo_pixel is None:
+            raise ValueError(f"Tipo de dato no soportado para PostGIS raster: {nombre_dtype}")
+
+        nodata = nodata_de_banda(nodatas[indice] if indice < len(nodatas) else None, nombre_dtype)
+        bandera = tipo_pixel | BANDA_FUERA_DE_BD | (BANDA_CON_NODATA if nodata is not None else 0)
+        valor_nodata = np.array(nodata if nodata is not None else 0, dtype=np.dtype(nombre_dtype).newbyteorder("<"))
+
+        partes.append(bytes([bandera]))
+        partes.append(valor_nodata.tobytes())
+        partes.append(bytes([indice]))
+        partes.append(ruta + b"\0")
+
+    return partes
+
+# Filas COPY de un registro out-db: mismas teselas que la carga in-db, sin leer píxeles
+def generar_filas_copy_outdb(tiff_path: str, srid: int, tamano_tesela=TAMANO_TESELA):
+    ancho_tesela, alto_tesela = tamano_tesela
+    ruta = os.path.abspath(tiff_path).encode("utf-8")
+    nombre_archivo = os.path.basename(tiff_path).encode("utf-8")
+
+    with rasterio.open(tiff_path) as src:
+        dtypes = list(src.dtypes)
+        nodatas = _nodatas_ajustados(src)
+        for fila in range(0, src.height, alto_tesela):
+            for columna in range(0, src.width, ancho_tesela):
+                ventana = Window(
+                    columna, fila,
+                    min(ancho_tesela, src.width - columna),
+                    min(alto_tesela, src.height - fila)
+                )
+                transformacion = src.window_transform(ventana)
+                partes = tesela_outdb_a_wkb(
+                    transformacion, int(ventana.width), int(ventana.height), srid, dtypes, nodatas, ruta
+                )
+                yield b"".join(binascii.hexlify(p) for p in partes) + b"\t" + nombre_archivo + b"\n"
+
+# Genera las filas COPY (WKB hexadecimal + nombre de archivo) recorriendo el TIFF por ventanas
+def generar_filas_copy(tiff_path: str, srid: int, tamano_tesela=TAMANO_TESELA):
+    ancho_tesela, alto_tesela = tamano_tesela
+    nombre_archivo = os.path.basename(tiff_path).encode("utf-8")
+
+    with rasterio.open(tiff_path) as src:
+        nodatas = _nodatas_ajustados(src)
+        for fila in range(0, src.height, alto_tesela):
+            for columna in range(0, src.width, ancho_tesela):
+                ventana = Window(
+                    columna, fila,
+                    min(ancho_tesela, src.width - columna),
+                    min(alto_tesela, src.height - fila)
+                )
+                datos = src.read(window=ventana)
+                transformacion = src.window_transform(ventana)
+
+                partes = tesela_a_wkb(datos, transformacion, srid, nodatas)
+                yield b"".join(binascii.hexlify(p) for p in partes) + b"\t" + nombre_archivo + b"\n"
+
+# Expone un generador de filas como archivo de lectura para copy_expert
+class _FlujoFilas:
+    def __init__(self, filas):
+        self._filas = filas
+        self._linea = b""
+        self._posicion = 0
+
+    def read(self, size=-1):
+        if self._posicion >= len(self._linea):
+            self._linea = next(self._filas, b"")
+            self._posicion = 0
+            if not self._linea:
+                return b""
+
+        fin = len(self._linea) if size is None or size < 0 else self._posicion + size
+        datos = self._linea[self._posicion:fin]
+        self._posicion += len(datos)
+        return datos
+
+    def readline(self, size=-1):
+        return self.read(size)
+
+# Carga un GeoTIFF en grupo_contenedor.<tabla> sin raster2pgsql ni psql.
+# Reproduce "raster2pgsql -s <srid> -I -C -M -F -t 512x512": tabla (rid, rast, filename),
+# índice GiST sobre ST_ConvexHull, AddRasterConstraints y VACUUM ANALYZE.
+# Con fuera_de_bd=True equivale a añadir -R: las teselas referencian tiff_path (ruta absoluta).
+def importar_raster_nativo(conn, tiff_path: str, esquema: str, tabla: str, srid, fuera_de_bd: bool = False):
+    srid = int(srid)
+    generar_filas = generar_filas_copy_outdb if fuera_de_bd else generar_filas_copy
+    tabla_sql = sql.SQL("{}.{}").format(sql.Identifier(esquema), sql.Identifier(tabla))
+
+    conn.autocommit = False
+    cur = conn.cursor()
+    try:
+        cur.execute(sql.SQL(
+            'CREATE TABLE {} ("rid" serial PRIMARY KEY, "rast" raster, "filename" text);'
+        ).format(tabla_sql))
+
+        # El tipo raster no tiene función de entrada binaria: el COPY va en texto con WKB hexadecimal
+        copy_sql = sql.SQL('COPY {} ("rast", "filename") FROM STDIN;').format(tabla_sql)
+        cur.copy_expert(copy_sql.as_string(conn), _FlujoFilas(generar_filas(tiff_path, srid)), size=TAMANO_BLOQUE_COPY)
+
+        cur.execute(sql.SQL('CREATE INDEX ON {} USING gist (st_convexhull("rast"));').format(tabla_sql))
+        cur.execute(sql.SQL("ANALYZE {};").format(tabla_sql))
+        cur.execute(
+            "SELECT AddRasterConstraints(%s, %s, 'rast', TRUE, TRUE, TRUE, TRUE, TRUE, TRUE, FALSE, TRUE, TRUE, TRUE, TRUE, TRUE);",
+            (esquema, tabla)
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+    # VACUUM no puede ejecutarse dentro de una transacción
+    conn.autocommit = True
+    cur = conn.cursor()
+    try:
+        cur.execute(sql.SQL("VACUUM ANALYZE {};").format(tabla_sql))
+    finally:
+        cur.close()
+
+    debug_print(f"Ráster cargado de forma nativa: {esquema}.{tabla}")
@@ -0,0 +1,77 @@
+# backend/rasters/fuera_de_bd.py
+from fastapi import HTTPException
+from backend.cargas import carpeta_almacen, vincular_en_carpeta
+from backend.depuracion import debug_print
+import shutil
+import os
+
+# Registro out-db: las tablas ráster guardan solo la geometría de cada tesela y la ruta del archivo;
+# los píxeles se leen del TIFF bajo demanda. Los archivos viven en un almacén persistente por proyecto
+# (RASTER_OUTDB_DIR/<proyecto>/<tabla>.tif), que debe ser legible por el servidor PostgreSQL en la misma ruta.
+
+MODO_ALMACENAMIENTO_OUTDB = "outdb"
+
+def carpeta_outdb() -> str:
+    ruta = os.getenv("RASTER_OUTDB_DIR") or os.path.join(carpeta_almacen(), "outdb")
+    ruta = os.path.abspath(ruta)
+    os.makedirs(ruta, exist_ok=True)
+    return ruta
+
+def carpeta_outdb_proyecto(nombre_db: str) -> str:
+    return os.path.join(carpeta_outdb(), nombre_db.lower())
+
+# Deja el TIFF de la carga en el almacén out-db y retorna su ruta absoluta.
+# Es un enlace duro al blob del almacén de cargas cuando el sistema lo permite (sin copiar píxeles),
+# por lo que sobrevive a la eliminación del espacio de carga al terminar el trabajo.
+def publicar_en_outdb(nombre_db: str, ruta_tiff: str, tabla: str) -> str:
+    carpeta = carpeta_outdb_proyecto(nombre_db)
+    os.makedirs(carpeta, exist_ok=True)
+    return vincular_en_carpeta(ruta_tiff, carpeta, f"{tabla}.tif")
+
+# Elimina los archivos out-db de un proyecto (rollback)
+def eliminar_outdb_proyecto(nombre_db: str):
+    carpeta = carpeta_outdb_proyecto(nombre_db)
+    if os.path.isdir(carpeta):
+        shutil.rmtree(carpeta)
+        debug_print(f"Almacén out-db eliminado: {carpeta}")
+
+# Parámetros de PostGIS que permiten leer píxeles out-db (QGIS, ST_CreateOverview, ST_Value...)
+PARAMETROS_OUTDB = {
+    "postgis.enable_outdb_rasters": "true",
+    "postgis.gdal_enabled_drivers": "'GTiff'",
+}
+
+# Ambos parámetros son de superusuario: fijarlos exige serlo o, desde PostgreSQL 15, GRANT SET ON PARAMETER
+def puede_habilitar_outdb(cur) -> bool:
+    cur.execute("SELECT current_setting('is_superuser') = 'on', current_setting('server_version_num')::int;")
+    superusuario, version = cur.fetchone()
+    if superusuario:
+        return True
+    if version < 150000:
+        return False
+    cur.execute(
+        "SELECT bool_and(has_parameter_privilege(p, 'SET')) FROM unnest(%s::text[]) AS p;",
+        (list(PARAMETROS_OUTDB),)
+    )
+    return bool(cur.fetchone()[0])
+
+# Deja los parámetros en la base del proyecto; aplica a las sesiones que se abran después.
+# Se verifica el privilegio antes para fallar con un mensaje claro y sin haber publicado archivos.
+def habilitar_outdb(cur, nombre_db: str):
+    if not puede_habilitar_outdb(cur):
+        raise HTTPException(
+            status_code=500,
+            detail=(
+                "El usuario de base de datos no puede habilitar rásters out-db: fijar "
+                f"{' y '.join(PARAMETROS_OUTDB)} requiere superusuario o, en PostgreSQL 15+, "
+                "GRANT SET ON PARAMETER. Use rasterStorage 'indb' o ajuste los privilegios."
+            )
+        )
+    for parametro, valor in PARAMETROS_OUTDB.items():
+        cur.execute(f"ALTER DATABASE {nombre_db} SET {parametro} = {valor};")
+
+# Habilita la lectura out-db solo en la transacción en curso (SET LOCAL).
+# Las conexiones vuelven al pool: un SET de sesión seguiría activo para el siguiente que la use.
+def habilitar_outdb_transaccion(cur):
+    for parametro, valor in PARAMETROS_OUTDB.items():
+        cur.execute(f"SET LOCAL {parametro} = {valor};")
@@ -0,0 +1,99 @@
+# backend/rasters/importacion.py
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+import subprocess
+import tempfile
+import time
+from backend.depuracion import debug_print
+from backend.metricas import duracion_subprocesos
+
+# Tamaño de lectura que se entrega a psycopg2 durante el COPY (1 MiB)
+TAMANO_BLOQUE_COPY = 1024 * 1024
+
+# Expone las filas de un bloque COPY de raster2pgsql como un archivo de solo lectura
+class _BloqueCopy:
+    def __init__(self, flujo):
+        self._flujo = flujo
+        self._linea = b""
+        self._posicion = 0
+        self._terminado = False
+
+    # Nunca se retiene en memoria más de una fila (una tesela) a la vez
+    def read(self, size=-1):
+        if self._posicion >= len(self._linea):
+            if self._terminado:
+                return b""
+            linea = self._flujo.readline()
+            if not linea or linea.rstrip(b"\r\n") == b"\\.":
+                self._terminado = True
+                return b""
+            self._linea = linea
+            self._posicion = 0
+
+        fin = len(self._linea) if size is None or size < 0 else self._posicion + size
+        datos = self._linea[self._posicion:fin]
+        self._posicion += len(datos)
+        return datos
+
+    def readline(self, size=-1):
+        return self.read(size)
+
+    # Consume lo que quede del bloque si el COPY se interrumpió
+    def descartar(self):
+        while self.read(TAMANO_BLOQUE_COPY):
+            pass
+
+# Ejecuta raster2pgsql (-Y) y envía su salida directamente a PostgreSQL, sin archivo .sql intermedio
+def importar_raster_en_flujo(conn, raster2pgsql_cmd: list):
+    if "-Y" not in raster2pgsql_cmd:
+        raster2pgsql_cmd = [raster2pgsql_cmd[0], "-Y"] + list(raster2pgsql_cmd[1:])
+
+    # raster2pgsql emite BEGIN/END y VACUUM propios, por eso se trabaja en autocommit
+    conn.autocommit = True
+    cur = conn.cursor()
+
+    # stderr va a un archivo temporal para no bloquear el proceso si se llena la tubería
+    with tempfile.TemporaryFile() as errores:
+        inicio = time.perf_counter()
+        proceso = subprocess.Popen(raster2pgsql_cmd, stdout=subprocess.PIPE, stderr=errores)
+        try:
+            sentencia = []
+            for linea in iter(proceso.stdout.readline, b""):
+                texto = linea.decode("utf-8").strip()
+                if not texto and not sentencia:
+                    continue
+
+                sentencia.append(texto)
+                if not texto.endswith(";"):
+                    continue
+
+                sql = " ".join(sentencia)
+                sentencia = []
+
+                if sql.upper().startswith("COPY ") and sql.upper().endswith("FROM STDIN;"):
+                    bloque = _BloqueCopy(proceso.stdout)
+                    try:
+                        cur.copy_expert(sql, bloque, size=TAMANO_BLOQUE_COPY)
+                    finally:
+                        bloque.descartar()
+                else:
+                    cur.execute(sql)
+
+            proceso.stdout.close()
+            codigo = proceso.wait()
+        except Exception:
+            proceso.kill()
+            proceso.wait()
+            duracion_subprocesos.observar(time.perf_counter() - inicio, comando="raster2pgsql", resultado="error")
+            if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                cur.execute("ROLLBACK;")
+            raise
+        finally:
+            cur.close()
+
+        duracion_subprocesos.observar(time.perf_counter() - inicio, comando="raster2pgsql", resultado="ok" if codigo == 0 else "error")
+        if codigo != 0:
+            errores.seek(0)
+            mensaje = errores.read().decode("utf-8", errors="replace").strip()
+            raise subprocess.CalledProcessError(codigo, raster2pgsql_cmd, stderr=mensaje)
+
+        debug_print(f"raster2pgsql finalizó en modo flujo: {' '.join(raster2pgsql_cmd[-2:])}")
@@ -0,0 +1,113 @@
+# backend/rasters/metadatos.py
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from backend.cargas import carpeta_almacen, PATRON_SHA256
+from backend.depuracion import debug_print
+from shapely.geometry import box
+import threading
+import rasterio
+import json
+import os
+
+# Lee una sola vez la cabecera del TIFF: CRS/EPSG, extensión, dimensiones, bandas, dtype y nodata
+def leer_metadatos(tiff_path: str) -> dict:
+    with rasterio.open(tiff_path) as src:
+        crs = src.crs
+        epsg = crs.to_epsg() if crs else None
+        return {
+            "epsg": epsg,
+            "es_geografico": bool(crs and crs.is_geographic),
+            "bounds": list(src.bounds),
+            "ancho": src.width,
+            "alto": src.height,
+            "bandas": src.count,
+            "dtype": src.dtypes[0] if src.count else None,
+            "nodata": src.nodata,
+            "transform": list(src.transform)[:6],
+        }
+
+# SRID a usar en PostGIS; 4326 por defecto si el CRS es geográfico sin EPSG identificable
+def srid_desde_metadatos(metadatos: dict):
+    if metadatos["epsg"] is not None:
+        return str(metadatos["epsg"])
+    if metadatos["es_geografico"]:
+        return "4326"
+    return None
+
+# Contorno rectangular del ráster (equivalente a ST_Envelope(ST_Union(rast))) en WKT
+def huella_wkt(metadatos: dict) -> str:
+    return box(*metadatos["bounds"]).wkt
+
+# Caché de metadatos por SHA-256: memoria (LRU) + disco junto al almacén de TIFFs
+class CacheMetadatos:
+    def __init__(self, capacidad: int = 512):
+        self.capacidad = capacidad
+        self._memoria = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _ruta(sha256: str) -> str:
+        carpeta = os.path.join(carpeta_almacen(), "metadatos")
+        os.makedirs(carpeta, exist_ok=True)
+        return os.path.join(carpeta, f"{sha256}.json")
+
+    def obtener(self, sha256: str):
+        with self._lock:
+            if sha256 in self._memoria:
+                self._memoria.move_to_end(sha256)
+                return self._memoria[sha256]
+        ruta = self._ruta(sha256)
+        if os.path.exists(ruta):
+            with open(ruta, "r", encoding="utf-8") as f:
+                metadatos = json.load(f)
+            self._recordar(sha256, metadatos)
+            return metadatos
+        return None
+
+    def guardar(self, sha256: str, metadatos: dict):
+        self._recordar(sha256, metadatos)
+        temporal = f"{self._ruta(sha256)}.{threading.get_ident()}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(metadatos, f)
+        os.replace(temporal, self._ruta(sha256))
+
+    def _recordar(self, sha256: str, metadatos: dict):
+        with self._lock:
+            self._memoria[sha256] = metadatos
+            self._memoria.move_to_end(sha256)
+            while len(self._memoria) > self.capacidad:
+                self._memoria.popitem(last=False)
+
+cache_metadatos = CacheMetadatos()
+
+# Metadatos de un archivo, reutilizando la caché cuando se conoce su SHA-256
+def obtener_metadatos(tiff_path: str, sha256: str = None) -> dict:
+    usar_cache = bool(sha256 and PATRON_SHA256.match(sha256))
+    if usar_cache:
+        metadatos = cache_metadatos.obtener(sha256)
+        if metadatos is not None:
+            debug_print(f"Metadatos de {os.path.basename(tiff_path)} tomados de la caché")
+            return metadatos
+
+    metadatos = leer_metadatos(tiff_path)
+    if usar_cache:
+        cache_metadatos.guardar(sha256, metadatos)
+    return metadatos
+
+# Extrae en paralelo los metadatos de varios archivos.
+#   archivos: {nombre: (ruta, sha256 | None)}
+#   retorna:  {nombre: metadatos} o {nombre: {"error": "..."}}
+def extraer_metadatos(archivos: dict) -> dict:
+    if not archivos:
+        return {}
+
+    def procesar(item):
+        nombre, (ruta, sha256) = item
+        try:
+            return nombre, obtener_metadatos(ruta, sha256)
+        except Exception as e:
+            return nombre, {"error": str(e)}
+
+    workers = max(1, min(len(archivos), int(os.getenv("RASTER_METADATA_WORKERS", "8"))))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="metadatos_raster") as executor:
+        return dict(executor.map(procesar, archivos.items()))
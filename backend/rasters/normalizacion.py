@@ -0,0 +1,193 @@
+# backend/rasters/normalizacion.py
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from backend.cargas import carpeta_almacen, vincular_en_carpeta, PATRON_SHA256
+from backend.depuracion import debug_print
+from backend.metricas import duracion_normalizacion
+import multiprocessing
+import threading
+import shutil
+import time
+import uuid
+import os
+
+# Normalización de TIFFs cargados a Cloud-Optimized GeoTIFF: teselado interno, compresión y pirámides.
+# Cada archivo se convierte una sola vez por contenido (<almacén>/cog/<sha256>.tif) en un pool de procesos;
+# la detección de SRID, la importación por teselas y QGIS leen después ese archivo en lugar del original.
+
+# Tamaño de bloque interno igual al de las teselas importadas (raster2pgsql -t 512x512)
+TAMANO_BLOQUE_COG = 512
+
+COMPRESIONES_COG = {"DEFLATE", "LZW", "ZSTD", "LZMA", "WEBP", "JPEG", "NONE"}
+
+def normalizacion_habilitada() -> bool:
+    return os.getenv("RASTER_COG_NORMALIZE", "1") == "1"
+
+def compresion_cog() -> str:
+    valor = os.getenv("RASTER_COG_COMPRESSION", "DEFLATE").upper()
+    if valor not in COMPRESIONES_COG:
+        debug_print(f"Compresión COG desconocida '{valor}', se usa DEFLATE")
+        return "DEFLATE"
+    return valor
+
+def obtener_workers_normalizacion() -> int:
+    try:
+        limite = int(os.getenv("RASTER_COG_WORKERS", "0"))
+    except ValueError:
+        limite = 0
+    if limite <= 0:
+        limite = min(4, os.cpu_count() or 1)
+    return max(1, limite)
+
+def ruta_cog(sha256: str) -> str:
+    return os.path.join(carpeta_almacen(), "cog", sha256[:2], f"{sha256}.tif")
+
+# Un archivo ya sirve tal cual si está teselado, comprimido y con pirámides (o cabe en un bloque)
+def _es_cog(src) -> bool:
+    if max(src.width, src.height) <= TAMANO_BLOQUE_COG:
+        return True
+    return bool(src.profile.get("tiled")) and src.compression is not None and bool(src.overviews(1))
+
+# Se ejecuta en un proceso del pool: escribe destino a partir de origen y retorna el resultado
+def convertir_a_cog(origen: str, destino: str, compresion: str) -> str:
+    import rasterio
+    from rasterio.env import GDALVersion
+    from rasterio.enums import Resampling
+    from rasterio.shutil import copy as copiar_raster
+
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    temporal = f"{destino}.{uuid.uuid4().hex}.tmp"
+
+    with rasterio.open(origen) as src:
+        ya_optimizado = _es_cog(src)
+        es_flotante = src.dtypes[0].startswith("float") if src.count else False
+
+    try:
+        if ya_optimizado:
+            # Se registra el original para no volver a inspeccionarlo
+            try:
+                os.link(origen, temporal)
+            except OSError:
+                shutil.copyfile(origen, temporal)
+        else:
+            opciones = {"COMPRESS": compresion, "BIGTIFF": "IF_SAFER"}
+            if compresion in ("DEFLATE", "LZW", "ZSTD", "LZMA"):
+                opciones["PREDICTOR"] = "3" if es_flotante else "2"
+
+            if GDALVersion.runtime().at_least("3.1"):
+                copiar_raster(
+                    origen, temporal, driver="COG",
+                    BLOCKSIZE=str(TAMANO_BLOQUE_COG), OVERVIEWS="AUTO", **opciones
+                )
+            else:
+                # GDAL sin driver COG: GeoTIFF teselado con pirámides internas
+                copiar_raster(
+                    origen, temporal, driver="GTiff", TILED="YES",
+                    BLOCKXSIZE=str(TAMANO_BLOQUE_COG), BLOCKYSIZE=str(TAMANO_BLOQUE_COG), **opciones
+                )
+                with rasterio.open(temporal, "r+") as dst:
+                    factores = []
+                    factor = 2
+                    while max(dst.width, dst.height) / factor >= TAMANO_BLOQUE_COG:
+                        factores.append(factor)
+                        factor *= 2
+                    if factores:
+                        dst.build_overviews(factores, Resampling.nearest)
+
+        # Publicación atómica: otro proceso pudo escribir el mismo contenido en paralelo
+        os.replace(temporal, destino)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+    return "ya_optimizado" if ya_optimizado else "convertido"
+
+_pool = None
+_pool_lock = threading.Lock()
+_en_curso = {}  # sha256 -> (future, inicio)
+
+# Pool de procesos compartido; "spawn" evita heredar los hilos y conexiones del backend
+def _obtener_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=obtener_workers_normalizacion(),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+def _descartar_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool = None
+
+# Encola la conversión de un archivo (sin esperar); retorna None si ya existe o no aplica.
+# Las peticiones repetidas para el mismo contenido comparten la misma conversión en curso.
+def solicitar_normalizacion(ruta: str, sha256: str):
+    if not normalizacion_habilitada() or not PATRON_SHA256.match(sha256 or ""):
+        return None
+    destino = ruta_cog(sha256)
+    if os.path.exists(destino):
+        return None
+    with _pool_lock:
+        en_curso = _en_curso.get(sha256)
+        if en_curso is not None and not en_curso[0].done():
+            return en_curso[0]
+    try:
+        futuro = _obtener_pool().submit(convertir_a_cog, ruta, destino, compresion_cog())
+    except (BrokenProcessPool, RuntimeError):
+        _descartar_pool()
+        futuro = _obtener_pool().submit(convertir_a_cog, ruta, destino, compresion_cog())
+    with _pool_lock:
+        _en_curso[sha256] = (futuro, time.perf_counter())
+    futuro.add_done_callback(lambda _: _terminar(sha256, futuro))
+    return futuro
+
+def _terminar(sha256: str, futuro):
+    with _pool_lock:
+        en_curso = _en_curso.get(sha256)
+        if en_curso is None or en_curso[0] is not futuro:
+            return
+        del _en_curso[sha256]
+    resultado = "error" if futuro.cancelled() or futuro.exception() is not None else futuro.result()
+    duracion_normalizacion.observar(time.perf_counter() - en_curso[1], resultado=resultado)
+
+# Normaliza los archivos {nombre: (ruta, sha256)} y retorna {nombre: ruta a usar}.
+# Si un archivo no puede convertirse se conserva el original: la normalización no bloquea la creación.
+def normalizar_archivos(archivos: dict) -> tuple:
+    rutas = {}
+    resumen = []
+    futuros = {}
+    for nombre, (ruta, sha256) in archivos.items():
+        rutas[nombre] = ruta
+        if not normalizacion_habilitada() or not PATRON_SHA256.match(sha256 or ""):
+            continue
+        if os.path.exists(ruta_cog(sha256)):
+            rutas[nombre] = ruta_cog(sha256)
+            resumen.append({"imagen": nombre, "resultado": "cache"})
+            continue
+        futuros[nombre] = (sha256, solicitar_normalizacion(ruta, sha256))
+
+    for nombre, (sha256, futuro) in futuros.items():
+        try:
+            resultado = futuro.result() if futuro is not None else "cache"
+            rutas[nombre] = ruta_cog(sha256)
+            resumen.append({"imagen": nombre, "resultado": resultado})
+        except Exception as e:
+            debug_print(f"No se pudo normalizar {nombre} a COG, se usa el original: {e}")
+            resumen.append({"imagen": nombre, "resultado": "error", "error": str(e)})
+
+    return rutas, resumen
+
+# Reemplaza en el espacio de carga los TIFFs de las imágenes indicadas por su versión COG
+def normalizar_espacio(espacio, nombres: list) -> list:
+    hashes = espacio.hashes()
+    archivos = {nombre: (espacio.archivo(nombre), hashes.get(nombre)) for nombre in nombres}
+    rutas, resumen = normalizar_archivos(archivos)
+    for nombre, ruta in rutas.items():
+        if ruta != archivos[nombre][0]:
+            vincular_en_carpeta(ruta, espacio.ruta, nombre)
+    return resumen
@@ -0,0 +1,122 @@
+# backend/rasters/piramides.py
+from psycopg2 import sql
+from backend.database.lotes import literal
+from backend.depuracion import debug_print
+from backend.rasters.fuera_de_bd import habilitar_outdb_transaccion
+import os
+
+# Pirámides (overviews) de los rásters importados: tablas o_<factor>_<tabla> en el mismo esquema,
+# registradas en la vista raster_overviews. El proveedor "postgresraster" de QGIS las consulta al abrir
+# la capa y lee el nivel adecuado a la escala, sin recorrer las teselas de resolución completa.
+
+# Algoritmos aceptados por ST_CreateOverview
+ALGORITMOS_REMUESTREO = {"NearestNeighbor", "Bilinear", "Cubic", "CubicSpline", "Lanczos"}
+
+# Factores de reducción (RASTER_OVERVIEW_FACTORS, p. ej. "2,4,8,16"); vacío o "0" desactiva las pirámides
+def factores_piramide() -> list:
+    valor = os.getenv("RASTER_OVERVIEW_FACTORS", "2,4,8,16")
+    factores = set()
+    for parte in valor.split(","):
+        parte = parte.strip()
+        if not parte:
+            continue
+        try:
+            factor = int(parte)
+        except ValueError:
+            debug_print(f"Factor de pirámide inválido ignorado: '{parte}'")
+            continue
+        if factor > 1:
+            factores.add(factor)
+    return sorted(factores)
+
+# Algoritmo de remuestreo de las pirámides de la carga nativa (RASTER_OVERVIEW_RESAMPLING)
+def remuestreo_piramide() -> str:
+    valor = os.getenv("RASTER_OVERVIEW_RESAMPLING", "NearestNeighbor")
+    for algoritmo in ALGORITMOS_REMUESTREO:
+        if algoritmo.lower() == valor.lower():
+            return algoritmo
+    debug_print(f"Algoritmo de remuestreo desconocido '{valor}', se usa NearestNeighbor")
+    return "NearestNeighbor"
+
+def nombre_tabla_piramide(tabla: str, factor: int) -> str:
+    return f"o_{factor}_{tabla}"
+
+# Argumentos de raster2pgsql para generar y registrar las pirámides (-l 2,4,...)
+def argumentos_raster2pgsql(factores: list) -> list:
+    if not factores:
+        return []
+    return ["-l", ",".join(str(f) for f in factores)]
+
+# Crea y registra las pirámides de esquema.tabla dentro de PostgreSQL (carga nativa).
+# ST_CreateOverview crea o_<factor>_<tabla> y le aplica las restricciones ráster y de overview;
+# aquí se añaden el índice GiST y las estadísticas, igual que hace raster2pgsql -I -M.
+# Con fuera_de_bd=True la lectura out-db se habilita solo dentro de la transacción.
+def crear_piramides(conn, esquema: str, tabla: str, factores: list, algoritmo: str = "NearestNeighbor", fuera_de_bd: bool = False):
+    if not factores:
+        return
+
+    conn.autocommit = False
+    cur = conn.cursor()
+    try:
+        if fuera_de_bd:
+            habilitar_outdb_transaccion(cur)
+        for factor in factores:
+            cur.execute(
+                "SELECT ST_CreateOverview(format('%%I.%%I', %s, %s)::regclass, 'rast', %s, %s);",
+                (esquema, tabla, factor, algoritmo)
+            )
+            cur.execute(sql.SQL('CREATE INDEX ON {}.{} USING gist (st_convexhull("rast"));').format(
+                sql.Identifier(esquema), sql.Identifier(nombre_tabla_piramide(tabla, factor))
+            ))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+    conn.autocommit = True
+    cur = conn.cursor()
+    try:
+        for factor in factores:
+            cur.execute(sql.SQL("VACUUM ANALYZE {}.{};").format(
+                sql.Identifier(esquema), sql.Identifier(nombre_tabla_piramide(tabla, factor))
+            ))
+    finally:
+        cur.close()
+
+    debug_print(f"Pirámides creadas para {esquema}.{tabla}: {factores}")
+
+# Bloque DO que repite sobre las pirámides registradas de las tablas un GRANT ya otorgado a la tabla base
+def sentencia_permisos_piramides(esquema: str, tablas: list, privilegios: str, roles: list) -> str:
+    arreglo_tablas = ", ".join(literal(t) for t in tablas)
+    arreglo_roles = ", ".join(literal(r) for r in roles)
+    return f"""
+        DO $$
+        DECLARE t text; r text;
+        BEGIN
+            FOR t IN
+                SELECT format('%I.%I', o_table_schema, o_table_name) FROM raster_overviews
+                WHERE r_table_schema = {literal(esquema)} AND r_table_name = ANY(ARRAY[{arreglo_tablas}]::text[])
+            LOOP
+                FOREACH r IN ARRAY ARRAY[{arreglo_roles}]::text[] LOOP
+                    EXECUTE format('GRANT {privilegios} ON %s TO %I', t, r);
+                END LOOP;
+            END LOOP;
+        END $$;
+    """
+
+# Bloque DO que elimina las pirámides registradas de una tabla (antes de eliminar la tabla base)
+def sentencia_eliminar_piramides(esquema: str, tabla: str) -> str:
+    return f"""
+        DO $$
+        DECLARE t text;
+        BEGIN
+            FOR t IN
+                SELECT format('%I.%I', o_table_schema, o_table_name) FROM raster_overviews
+                WHERE r_table_schema = {literal(esquema)} AND r_table_name = {literal(tabla)}
+            LOOP
+                EXECUTE 'DROP TABLE IF EXISTS ' || t || ' CASCADE';
+            END LOOP;
+        END $$;
+    """
@@ -1,29 +1,39 @@
 #backend/routers/login.py
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from backend.database.database import get_connection
+from backend.database.database import conexion
+from backend.database.cache_roles import cache_roles
 
 router = APIRouter(prefix="/api", tags=["login"])
 
 class LoginRequest(BaseModel):
     username: str
 
+ROL_CONFIGURADOR = "rol_configurador"
+
+# Pertenencia a rol_configurador, consultada al catálogo solo si no está en la caché de roles
 def tiene_rol_configurador(username: str) -> bool:
-    conn = get_connection()
-    try:
+    pertenece = cache_roles.obtener(ROL_CONFIGURADOR, username)
+    if pertenece is None:
+        pertenece = consultar_rol_configurador(username)
+        cache_roles.guardar(ROL_CONFIGURADOR, username, pertenece)
+    return pertenece
+
+def consultar_rol_configurador(username: str) -> bool:
+    with conexion() as conn:
         cur = conn.cursor()
-        cur.execute("""
-            SELECT 1
-            FROM pg_roles r
-            JOIN pg_auth_members m ON r.oid = m.roleid
-            JOIN pg_roles u ON u.oid = m.member
-            WHERE r.rolname = 'rol_configurador' AND u.rolname = %s
-        """, (username,))
-        result = cur.fetchone()
-        return result is not None
-    finally:
-        cur.close()
-        conn.close()
+        try:
+            cur.execute("""
+                SELECT 1
+                FROM pg_roles r
+                JOIN pg_auth_members m ON r.oid = m.roleid
+                JOIN pg_roles u ON u.oid = m.member
+                WHERE r.rolname = %s AND u.rolname = %s
+            """, (ROL_CONFIGURADOR, username))
+            result = cur.fetchone()
+            return result is not None
+        finally:
+            cur.close()
 
 @router.post("/login")
 def login(request: LoginRequest):
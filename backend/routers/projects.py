@@ -1,16 +1,45 @@
 #backend/routers/projects.py
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Request
 from fastapi.responses import JSONResponse
-from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, PrivateAttr
 from typing import List, Literal
 from collections import Counter
-from backend.database.database import get_connection
+from backend.database.database import get_connection, conexion, cerrar_pool
+from backend.database.plantillas import plantillas_habilitadas, aprovisionar_base_de_datos, instalar_extensiones
+from backend.database.cache_roles import notificar_cambio_roles
+from backend.database.lotes import ejecutar_plan, literal, sin_duplicados, tamano_lote
+from backend.database.mantenimiento import opciones_tabla_segmentacion, sentencias_indices_segmentacion, mantener_proyecto
+from backend.depuracion import debug_print
+from backend.trabajos import lanzar_trabajo, estado_trabajo
+from backend.bitacora import BitacoraProyecto, huella_payload, rollback_automatico
+from backend.metricas import (
+    duracion_subprocesos, duracion_importacion_rasters, bytes_cargados, archivos_cargados
+)
+from backend.cargas import (
+    guardar_en_bloques, limite_carga_bytes, validar_nombre_tiff,
+    registrar_en_almacen, vincular_en_carpeta, existe_blob, ruta_blob,
+    crear_sesion, estado_sesion, escribir_bloque, finalizar_sesion, EspacioTrabajo
+)
+from backend.cliente_qgis import obtener_cliente_qgis, worker_qgis_habilitado
+from qgis_tools.plantilla_qgs import generar_proyectos_qgs, esquemas_relevantes
+from qgis_tools.indice_payload import indice_payload, nombre_tabla_raster
+from qgis_tools.modelo_payload import payload_a_lista, codificar
+from backend.rasters.importacion import importar_raster_en_flujo
+from backend.rasters.cargador_nativo import importar_raster_nativo
+from backend.rasters.piramides import (
+    factores_piramide, remuestreo_piramide, argumentos_raster2pgsql, crear_piramides,
+    sentencia_permisos_piramides, sentencia_eliminar_piramides
+)
+from backend.rasters.normalizacion import solicitar_normalizacion, normalizar_espacio
+from backend.rasters.fuera_de_bd import (
+    MODO_ALMACENAMIENTO_OUTDB, publicar_en_outdb, eliminar_outdb_proyecto, habilitar_outdb
+)
+from backend.rasters.metadatos import leer_metadatos, srid_desde_metadatos, extraer_metadatos, huella_wkt
 from typing import Optional
-from shapely.geometry import box, mapping
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import traceback
-import tempfile
-import rasterio
 import subprocess
 import shutil
 import uuid
@@ -19,14 +48,6 @@ import os
 import re
 import json
 
-# Manejo de mensajes en consola 
-def debug_print(msg):
-    if os.getenv("DEBUG_MODE", "0") == "1":
-        print(f"[DEBUG] {msg}")
-
-# Crear carpeta uploads si no existe
-UPLOAD_DIR = None  # Carpeta temporal para los TIFFs durante el proceso
-
 router = APIRouter(prefix="/api/projects", tags=["projects"])
 
 class Relation(BaseModel):
@@ -67,34 +88,38 @@ class ProjectExecutionRequest(BaseModel):
     memberGroupMappings: List[MemberGroupMapping]
     members: List[Miembro]
     grupoContenedor: str
+    uploadId: Optional[str] = None  # Espacio de carga devuelto por /upload-tiffs o /prepare-tiffs
+    rasterStorage: Literal["indb", "outdb"] = "indb"  # "outdb": píxeles en el almacén RASTER_OUTDB_DIR, no en PostGIS
+    _indice = PrivateAttr(default=None)  # IndicePayload, construido al primer uso (ver indice_payload)
 
-# Obtiene el SRID de un archivo .tif
-def get_raster_srid(tiff_path: str) -> str:
+# Obtiene el SRID de un archivo .tif (a partir de sus metadatos si ya se leyeron)
+def get_raster_srid(tiff_path: str, metadatos: dict = None) -> str:
     try:
-        with rasterio.open(tiff_path) as src:
-            crs = src.crs
-            if crs:
-                if crs.to_epsg() is not None:
-                    srid = str(crs.to_epsg())
-                    debug_print(f"SRID detectado para {tiff_path}: {srid}")
-                    return srid
-                # Usar 4326 por defecto si no se detecta ningún SRID
-                elif crs.is_geographic:
-                    debug_print(f"SRID no identificado, pero es geográfico: {tiff_path}. Asignando 4326")
-                    return "4326"
-        raise HTTPException(status_code=400, detail=f"No se pudo determinar el SRID del archivo TIFF '{os.path.basename(tiff_path)}'")
+        if metadatos is None:
+            metadatos = leer_metadatos(tiff_path)
+        srid = srid_desde_metadatos(metadatos)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al leer el archivo TIFF '{os.path.basename(tiff_path)}': {str(e)}")
 
-# Validación de imágenes + verificación/asignación de SRID
-def validar_y_determinar_srids(raster_mappings: List[RasterGroupMapping]) -> list:
+    if srid is None:
+        raise HTTPException(status_code=400, detail=f"No se pudo determinar el SRID del archivo TIFF '{os.path.basename(tiff_path)}'")
+
+    # Se usa 4326 por defecto si el CRS es geográfico pero sin EPSG identificable
+    debug_print(f"SRID detectado para {tiff_path}: {srid}")
+    return srid
+
+# Validación de imágenes + verificación/asignación de SRID.
+# Los metadatos se leen una vez por archivo, en paralelo y con caché por SHA-256;
+# se retornan para que las etapas siguientes no vuelvan a abrir los TIFFs.
+def validar_y_determinar_srids(raster_mappings: List[RasterGroupMapping], espacio: EspacioTrabajo) -> tuple:
 
-    global UPLOAD_DIR
     errores = []
+    hashes = espacio.hashes()
+    archivos = {}
 
     for raster in raster_mappings:
         image_name = raster.imageName
-        tiff_path = os.path.join(UPLOAD_DIR, image_name)
+        tiff_path = espacio.archivo(image_name)
 
         if not os.path.exists(tiff_path):
             errores.append({
@@ -103,10 +128,26 @@ def validar_y_determinar_srids(raster_mappings: List[RasterGroupMapping]) -> lis
             })
             continue
 
+        archivos[image_name] = (tiff_path, hashes.get(image_name))
+
+    metadatos = extraer_metadatos(archivos)
+
+    for raster in raster_mappings:
+        image_name = raster.imageName
+        if image_name not in metadatos:
+            continue
+
+        meta = metadatos[image_name]
+        if "error" in meta:
+            errores.append({
+                "imagen": image_name,
+                "error": f"Error al leer el archivo TIFF '{image_name}': {meta['error']}"
+            })
+            continue
+
         try:
             # Esto lanza HTTPException si falla
-            srid = get_raster_srid(tiff_path)
-            raster.srid = srid
+            raster.srid = get_raster_srid(archivos[image_name][0], meta)
         except HTTPException as e:
             errores.append({
                 "imagen": image_name,
@@ -118,7 +159,7 @@ def validar_y_determinar_srids(raster_mappings: List[RasterGroupMapping]) -> lis
                 "error": f"Error inesperado al procesar la imagen: {str(ex)}"
             })
 
-    return errores
+    return errores, metadatos
 
 # Verifica si ya existe una base de datos con ese nombre
 #def database_exists(dbname: str) -> bool:
@@ -131,82 +172,192 @@ def validar_y_determinar_srids(raster_mappings: List[RasterGroupMapping]) -> lis
     conn.close()
     return exists
 
-# Crea la base de datos
+# Crea la base de datos (desde la plantilla con extensiones, salvo PROJECT_DB_TEMPLATE=0)
 def crear_base_de_datos(nombre_db: str):
     try:
-        conn_admin = get_connection("postgres")
-        conn_admin.autocommit = True
-        cur_admin = conn_admin.cursor()
-        cur_admin.execute(f"CREATE DATABASE {nombre_db}")
-        cur_admin.close()
-        conn_admin.close()
+        if plantillas_habilitadas():
+            aprovisionar_base_de_datos(nombre_db)
+            return
+
+        with conexion("postgres") as conn_admin:
+            conn_admin.autocommit = True
+            cur_admin = conn_admin.cursor()
+            cur_admin.execute(f"CREATE DATABASE {nombre_db}")
+            cur_admin.close()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al crear la base de datos: {str(e)}")
 
-# Habilita las extensiones de la base de datos
+# Habilita las extensiones de la base de datos (solo crea las que falten; con plantilla ya están todas)
 def habilitar_extensiones(nombre_db: str):
-    extensiones = [
-        "postgis",
-        "postgis_raster",
-        "postgis_topology",
-        "postgis_sfcgal",
-        "fuzzystrmatch",
-        "address_standardizer",
-        "address_standardizer_data_us",
-        "postgis_tiger_geocoder"
-    ]
     try:
-        conn_proj = get_connection(nombre_db)
-        conn_proj.autocommit = True
-        cur_proj = conn_proj.cursor()
-        for ext in extensiones:
-            cur_proj.execute(f"CREATE EXTENSION IF NOT EXISTS {ext};")
-        cur_proj.close()
-        conn_proj.close()
+        with conexion(nombre_db) as conn_proj:
+            conn_proj.autocommit = True
+            cur_proj = conn_proj.cursor()
+            instalar_extensiones(cur_proj)
+            cur_proj.close()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al habilitar extensiones: {str(e)}")
 
-# Crea los esquemas en la base de datos
-def crear_esquemas(nombre_db: str, payload: ProjectExecutionRequest):
-    try:
-        conn = get_connection(nombre_db)
-        cur = conn.cursor()
+# Sentencias para crear los esquemas del proyecto (grupos, tutores y contenedor de rásters)
+def plan_esquemas(payload: ProjectExecutionRequest) -> list:
+    sentencias = []
 
-        debug_print(f" Creando esquemas en la base de datos '{nombre_db}'...")
+    # 1. Esquemas para grupos (definidos desde la GUI)
+    for grupo in payload.groupNames:
+        sentencias.append(f"CREATE SCHEMA IF NOT EXISTS {grupo};")
 
-        # 1. Esquemas para grupos (definidos desde la GUI)
-        for grupo in payload.groupNames:
-            cur.execute(f"CREATE SCHEMA IF NOT EXISTS {grupo};")
-            debug_print(f"Esquema de grupo creado: {grupo}")
+    # 2. Esquemas para tutores
+    tutores = set()
+    for miembro in payload.members:
+        if miembro.role == "Tutor":
+            nombre_esquema = miembro.email.split("@")[0].lower()
+            tutores.add(nombre_esquema)
+            sentencias.append(f"CREATE SCHEMA IF NOT EXISTS {nombre_esquema};")
 
-        # 2. Esquemas para tutores
-        tutores = set()
-        for miembro in payload.members:
-            if miembro.role == "Tutor":
-                nombre_esquema = miembro.email.split("@")[0].lower()
-                tutores.add(nombre_esquema)
-                cur.execute(f"CREATE SCHEMA IF NOT EXISTS {nombre_esquema};")
-                debug_print(f"Esquema de tutor creado: {nombre_esquema}")
+    # 3. Esquema contenedor de rásters (si aplica)
+    grupo_contenedor = payload.grupoContenedor
+    es_tutor_contenedor = grupo_contenedor in tutores
 
-        # 3. Esquema contenedor de rásters (si aplica)
-        grupo_contenedor = payload.grupoContenedor
-        es_tutor_contenedor = grupo_contenedor in tutores
+    if payload.studentTutor == "no" and not es_tutor_contenedor:
+        sentencias.append(f"CREATE SCHEMA IF NOT EXISTS {grupo_contenedor};")
 
-        if payload.studentTutor == "no" and not es_tutor_contenedor:
-            cur.execute(f"CREATE SCHEMA IF NOT EXISTS {grupo_contenedor};")
-            debug_print(f"Esquema contenedor creado: {grupo_contenedor}")
+    return sin_duplicados(sentencias)
 
-        conn.commit()
-        cur.close()
-        conn.close()
+# Crea los esquemas en la base de datos
+def crear_esquemas(nombre_db: str, payload: ProjectExecutionRequest):
+    try:
+        with conexion(nombre_db) as conn:
+            cur = conn.cursor()
+
+            debug_print(f" Creando esquemas en la base de datos '{nombre_db}'...")
+            ejecutar_plan(cur, plan_esquemas(payload))
+
+            conn.commit()
+            cur.close()
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al crear esquemas: {str(e)}")
 
+# subprocess.run con registro del tiempo de reloj en la métrica de subprocesos
+def ejecutar_subproceso(nombre: str, comando: list, **kwargs):
+    inicio = time.perf_counter()
+    resultado = "error"
+    try:
+        proceso = subprocess.run(comando, **kwargs)
+        resultado = "ok" if proceso.returncode == 0 else "error"
+        return proceso
+    finally:
+        duracion_subprocesos.observar(time.perf_counter() - inicio, comando=nombre, resultado=resultado)
+
+# Número de importaciones de rásters simultáneas (RASTER_IMPORT_WORKERS)
+def obtener_workers_importacion(num_rasters: int) -> int:
+    try:
+        limite = int(os.getenv("RASTER_IMPORT_WORKERS", "0"))
+    except ValueError:
+        limite = 0
+    if limite <= 0:
+        limite = min(4, os.cpu_count() or 1)
+    return max(1, min(limite, num_rasters))
+
+# Importa un único ráster; cada worker usa su propia conexión
+def importar_raster(nombre_db: str, raster: RasterGroupMapping, grupo_contenedor: str, carpeta_tiffs: str, modo_importacion: str, fuera_de_bd: bool = False) -> dict:
+    db_user = os.getenv("DB_USER")
+    db_pass = os.getenv("DB_PASSWORD")
+    db_host = os.getenv("DB_HOST")
+    db_port = os.getenv("DB_PORT")
+
+    image_name = raster.imageName
+    tiff_path = os.path.join(carpeta_tiffs, image_name)
+    table_name = nombre_tabla_raster(image_name)
+
+    modo_metrica = f"{modo_importacion}_outdb" if fuera_de_bd else modo_importacion
+
+    inicio = time.perf_counter()
+    try:
+        factores = factores_piramide()
+        if fuera_de_bd:
+            # El TIFF pasa al almacén out-db y las teselas guardan su ruta absoluta (raster2pgsql -R)
+            tiff_path = publicar_en_outdb(nombre_db, tiff_path, table_name)
+            argumentos_extra = ["-R"]
+        else:
+            # -l genera y registra las pirámides o_<factor>_<tabla> (RASTER_OVERVIEW_FACTORS)
+            argumentos_extra = argumentos_raster2pgsql(factores)
+
+        # CAMBIO APLICADO: mejora del comando raster2pgsql
+        # Se agregó el flag -F y se dejó -t 512x512 por control explícito de tile size
+        raster2pgsql_cmd = [
+            "raster2pgsql", "-s", raster.srid, "-I", "-C", "-M", "-F", "-t", "512x512",
+            *argumentos_extra,
+            tiff_path, f"{grupo_contenedor}.{table_name}"
+        ]
+
+        if modo_importacion == "nativo":
+            # Teselado y codificación WKB en proceso con rasterio, sin binarios externos
+            debug_print(f" Importando ráster de forma nativa: {table_name}")
+            with conexion(nombre_db) as conn:
+                importar_raster_nativo(conn, tiff_path, grupo_contenedor.lower(), table_name, raster.srid, fuera_de_bd)
+                if not fuera_de_bd:
+                    crear_piramides(conn, grupo_contenedor.lower(), table_name, factores, remuestreo_piramide())
+        elif modo_importacion == "archivo":
+            # Paso 1: Crear SQL con raster2pgsql
+            sql_file = tiff_path.replace(".tif", ".sql").replace(".tiff", ".sql")
+            with open(sql_file, "w", encoding="utf-8") as f:
+                ejecutar_subproceso("raster2pgsql", raster2pgsql_cmd, stdout=f, check=True)
+
+            # Paso 2: Ejecutar SQL con psql
+            env = os.environ.copy()
+            env["PGPASSWORD"] = db_pass
+
+            debug_print(f" Ejecutando psql para importar ráster: {table_name}")
+            debug_print(f"Comando: psql -h {db_host} -p {db_port} -U {db_user} -d {nombre_db} -f {sql_file}")         
+            ejecutar_subproceso(
+                "psql",
+                ["psql", "-h", db_host, "-p", db_port, "-U", db_user, "-d", nombre_db, "-f", sql_file],
+                text=True,
+                capture_output=True,
+                env=env,
+                check=True
+            )
+            debug_print(f"Finalizó ejecución de psql para {table_name}")
+        else:
+            # Salida de raster2pgsql enviada por COPY sin tocar disco
+            debug_print(f" Importando ráster en modo flujo: {table_name}")
+            with conexion(nombre_db) as conn:
+                importar_raster_en_flujo(conn, raster2pgsql_cmd)
+
+        if fuera_de_bd and factores:
+            # Las pirámides de un ráster out-db se generan en la base leyendo el archivo del almacén
+            with conexion(nombre_db) as conn:
+                crear_piramides(conn, grupo_contenedor.lower(), table_name, factores, remuestreo_piramide(), fuera_de_bd=True)
+
+        duracion = time.perf_counter() - inicio
+        duracion_importacion_rasters.observar(duracion, modo=modo_metrica, resultado="ok")
+        return {
+            "imagen": image_name,
+            "status": "éxito",
+            "almacenamiento": "outdb" if fuera_de_bd else "indb",
+            "piramides": factores,
+            "duracion_segundos": round(duracion, 2)
+        }
+
+    except Exception as e_img:
+        duracion = time.perf_counter() - inicio
+        duracion_importacion_rasters.observar(duracion, modo=modo_metrica, resultado="error")
+        debug_print(f" Error al importar ráster {grupo_contenedor}.{table_name}: {e_img}")
+        return {
+            "imagen": image_name,
+            "status": "error",
+            "error": str(e_img),
+            "duracion_segundos": round(duracion, 2)
+        }
+
 # Importa los rásters como tablas a los esquemas de la base de datos
-def importar_rasters(nombre_db: str, raster_mappings: List[RasterGroupMapping], grupo_contenedor: str) -> list:
-    global UPLOAD_DIR
-    resultados = []
+#   fuera_de_bd: registra los rásters como out-db sobre el almacén RASTER_OUTDB_DIR
+def importar_rasters(nombre_db: str, raster_mappings: List[RasterGroupMapping], grupo_contenedor: str, carpeta_tiffs: str, fuera_de_bd: bool = False) -> list:
+
+    # Modo de importación: "nativo" (rasterio + COPY en proceso), "flujo" (raster2pgsql -Y por COPY)
+    # o "archivo" (.sql intermedio + psql)
+    modo_importacion = os.getenv("RASTER_IMPORT_MODE", "nativo").lower()
 
     try:
         # Variables de entorno necesarias para conexión
@@ -218,64 +369,30 @@ def importar_rasters(nombre_db: str, raster_mappings: List[RasterGroupMapping],
         if not all([db_user, db_pass, db_host, db_port]):
             raise HTTPException(status_code=500, detail="Faltan variables de entorno de conexión.")
 
-        conn = get_connection(nombre_db)
-        cur = conn.cursor()
-
-        for raster in raster_mappings:
-            image_name = raster.imageName
-            tiff_path = os.path.join(UPLOAD_DIR, image_name)
-            table_name = os.path.splitext(image_name)[0].lower()
-
-            inicio = time.perf_counter()
-            try:
-                # Paso 1: Crear SQL con raster2pgsql
-                sql_file = tiff_path.replace(".tif", ".sql").replace(".tiff", ".sql")
-
-                # CAMBIO APLICADO: mejora del comando raster2pgsql
-                # Se agregó el flag -F y se dejó -t 512x512 por control explícito de tile size
-                raster2pgsql_cmd = [
-                    "raster2pgsql", "-s", raster.srid, "-I", "-C", "-M", "-F", "-t", "512x512",
-                    tiff_path, f"{grupo_contenedor}.{table_name}"
-                ]
-
-                with open(sql_file, "w", encoding="utf-8") as f:
-                    subprocess.run(raster2pgsql_cmd, stdout=f, check=True)
-
-                # Paso 2: Ejecutar SQL con psql
-                env = os.environ.copy()
-                env["PGPASSWORD"] = db_pass
-
-                debug_print(f" Ejecutando psql para importar ráster: {table_name}")
-                debug_print(f"Comando: psql -h {db_host} -p {db_port} -U {db_user} -d {nombre_db} -f {sql_file}")         
-                subprocess.run(
-                    ["psql", "-h", db_host, "-p", db_port, "-U", db_user, "-d", nombre_db, "-f", sql_file],
-                    text=True,
-                    capture_output=True,
-                    env=env,
-                    check=True
-                )
-
-                debug_print(f"Finalizó ejecución de psql para {table_name}")
-                duracion = time.perf_counter() - inicio
-                resultados.append({
-                    "imagen": image_name,
-                    "status": "éxito",
-                    "duracion_segundos": round(duracion, 2)
-                })
-
-            except Exception as e_img:
-                duracion = time.perf_counter() - inicio
-                debug_print(f" Ráster importado como: {grupo_contenedor}.{table_name}")
-                resultados.append({
-                    "imagen": image_name,
-                    "status": "error",
-                    "error": str(e_img),
-                    "duracion_segundos": round(duracion, 2)
-                })
+        if not raster_mappings:
+            return []
+
+        if fuera_de_bd:
+            with conexion(nombre_db) as conn:
+                cur = conn.cursor()
+                habilitar_outdb(cur, nombre_db)
+                conn.commit()
+                cur.close()
+
+        # Cada tabla grupo_contenedor.<raster> es independiente: se importan en paralelo.
+        # El trabajo pesado ocurre en raster2pgsql/PostgreSQL, por lo que bastan hilos.
+        workers = obtener_workers_importacion(len(raster_mappings))
+        debug_print(f"Importando {len(raster_mappings)} rásters con {workers} workers")
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="importar_raster") as executor:
+            # map conserva el orden de raster_mappings en los resultados
+            resultados = list(executor.map(
+                lambda raster: importar_raster(nombre_db, raster, grupo_contenedor, carpeta_tiffs, modo_importacion, fuera_de_bd),
+                raster_mappings
+            ))
 
-        conn.commit()
-        cur.close()
-        conn.close()
+    except HTTPException:
+        raise
 
     except Exception as e:
         raise HTTPException(
@@ -285,128 +402,175 @@ def importar_rasters(nombre_db: str, raster_mappings: List[RasterGroupMapping],
 
     return resultados
 
+# Contorno (WKT) y SRID de cada imagen a partir de los metadatos leídos en la validación
+def calcular_huellas(raster_mappings: List[RasterGroupMapping], metadatos: dict) -> dict:
+    huellas = {}
+    for raster in raster_mappings:
+        meta = metadatos.get(raster.imageName)
+        if meta and "error" not in meta and raster.srid:
+            huellas[raster.imageName] = (huella_wkt(meta), int(raster.srid))
+    return huellas
+
+# Sentencias para crear y sembrar las tablas de segmentación de grupos y tutores.
+#   huellas: {imageName: (wkt, srid)}; si falta una imagen, la geometría se toma de raster_columns
+#   tablas_existentes: {(esquema, tabla)} que se omiten (actualización incremental)
+def plan_segmentaciones(payload: ProjectExecutionRequest, grupo_contenedor: str, huellas: dict = None, tablas_existentes: set = None) -> list:
+    sentencias = []
+
+    indice = indice_payload(payload)
+    tablas_existentes = tablas_existentes or set()
+
+    # Determinar campos CIAF según nivel
+    nivel = payload.ciafLevel
+    ciaf_field = f"ciaf_{nivel}"
+    num_field = f"id_ciaf_{nivel}n"
+    opciones_tabla = opciones_tabla_segmentacion()
+
+    for mapping_raster in payload.rasterGroupMappings:
+        raster_base = nombre_tabla_raster(mapping_raster.imageName)
+        tabla_raster = f"{grupo_contenedor}.{raster_base}"
+
+        # 1. Segmentaciones en esquemas de grupos; 2. una sola por tutor relacionado por cualquier grupo
+        esquemas = [
+            e for e in indice.esquemas_segmentacion(mapping_raster)
+            if (e, f"{e}_{raster_base}") not in tablas_existentes
+        ]
+        if not esquemas:
+            continue
+
+        # Contorno y SRID calculados desde la cabecera del TIFF (sin ST_Union sobre las teselas)
+        huella = (huellas or {}).get(mapping_raster.imageName)
+        if huella is not None:
+            geom_wkt, srid = huella
+            geometria = f"ST_GeomFromText({literal(geom_wkt)}, {int(srid)})"
+        else:
+            # Respaldo: extensión registrada por AddRasterConstraints en raster_columns
+            srid = mapping_raster.srid
+            geometria = (
+                f"(SELECT ST_Envelope(extent) FROM raster_columns "
+                f"WHERE r_table_schema = {literal(grupo_contenedor.lower())} "
+                f"AND r_table_name = {literal(raster_base)} AND r_raster_column = 'rast')"
+            )
+        if not srid:
+            raise HTTPException(status_code=500, detail=f"No se pudo determinar el SRID del ráster en {tabla_raster}")
+        srid = int(srid)
+
+        for esquema in esquemas:
+            nombre_tabla = f"{esquema}_{raster_base}"
+            sentencias.append(f"""
+                CREATE TABLE IF NOT EXISTS {esquema}.{nombre_tabla} (
+                    id UUID PRIMARY KEY,
+                    {ciaf_field} TEXT,
+                    {num_field} INTEGER,
+                    geom geometry(Polygon, {srid})
+                ) WITH ({opciones_tabla});
+            """)
+            sentencias.append(f"""
+                INSERT INTO {esquema}.{nombre_tabla} (id, {ciaf_field}, {num_field}, geom)
+                VALUES ({literal(str(uuid.uuid4()))}, {literal(f"clase_{nivel}")}, {nivel * 100}, {geometria});
+            """)
+            # Sin índices, cada petición WMS/WFS de QGIS Server recorre la tabla completa
+            sentencias.extend(sentencias_indices_segmentacion(esquema, nombre_tabla, [ciaf_field, num_field]))
+
+    return sentencias
+
+# Tablas que crea un plan; el plan también lleva los INSERT y los índices de cada tabla
+def tablas_en_plan(sentencias: list) -> int:
+    return sum(1 for s in sentencias if s.lstrip().startswith("CREATE TABLE"))
+
 # Crea las segmentaciones en cada una de los esquemas
-def crear_segmentaciones(payload: ProjectExecutionRequest, nombre_db: str, grupo_contenedor: str):
+def crear_segmentaciones(payload: ProjectExecutionRequest, nombre_db: str, grupo_contenedor: str, huellas: dict = None, tablas_existentes: set = None):
     try:
-        conn = get_connection(nombre_db)
-        cur = conn.cursor()
+        with conexion(nombre_db) as conn:
+            cur = conn.cursor()
 
-        # Preconstruir mapa de miembros tipo Tutor
-        tutores_por_grupo = {}
-        for rel in payload.memberGroupMappings:
-            miembro = next((m for m in payload.members if m.id == rel.memberId), None)
-            if miembro and miembro.role == "Tutor":
-                grupo_id = rel.groupId
-                tutor_esquema = miembro.email.split("@")[0].lower()
-                tutores_por_grupo.setdefault(grupo_id, set()).add(tutor_esquema)
-
-        for mapping_raster in payload.rasterGroupMappings:
-            raster_base = os.path.splitext(mapping_raster.imageName)[0].lower()
-            tabla_raster = f"{grupo_contenedor}.{raster_base}"
-
-            # Obtener contorno del ráster
-            cur.execute(f"SELECT ST_AsText(ST_Envelope(ST_Union(rast))) FROM {tabla_raster};")
-            row = cur.fetchone()
-            if not row or not row[0]:
+            huellas = dict(huellas or {})
+            faltantes = {
+                tabla: m.imageName
+                for tabla, m in indice_payload(payload).rasters_por_tabla.items() if m.imageName not in huellas
+            }
+            if faltantes:
+                # Una sola consulta a raster_columns para todas las imágenes sin huella
+                cur.execute("""
+                    SELECT r_table_name, ST_AsText(ST_Envelope(extent)), srid
+                    FROM raster_columns
+                    WHERE r_table_schema = %s AND r_table_name = ANY(%s) AND r_raster_column = 'rast'
+                """, (grupo_contenedor.lower(), list(faltantes)))
+                for tabla, geom_wkt, srid in cur.fetchall():
+                    if geom_wkt and srid:
+                        huellas[faltantes.pop(tabla)] = (geom_wkt, int(srid))
+            if faltantes:
+                tabla_raster = f"{grupo_contenedor}.{next(iter(faltantes))}"
                 raise HTTPException(status_code=500, detail=f"No se pudo obtener el contorno del ráster: {tabla_raster}")
-            geom_wkt = row[0]
-
-            # Obtener el SRID real desde la tabla importada
-            cur.execute(f"SELECT ST_SRID(rast) FROM {tabla_raster} LIMIT 1;")
-            row_srid = cur.fetchone()
-            if not row_srid or not row_srid[0]:
-                raise HTTPException(status_code=500, detail=f"No se pudo determinar el SRID del ráster en {tabla_raster}")
-            srid = row_srid[0]
-
-            # Determinar campos CIAF según nivel
-            nivel = payload.ciafLevel
-            ciaf_field = f"ciaf_{nivel}"
-            num_field = f"id_ciaf_{nivel}n"
-
-            # Para cada grupo relacionado al ráster
-            # 1. Crear segmentaciones en esquemas de grupos
-            for grupo in mapping_raster.groups:
-                esquema_grupo = grupo.groupName.lower()
-                nombre_tabla = f"{esquema_grupo}_{raster_base}"
 
-                cur.execute(f"""
-                    CREATE TABLE IF NOT EXISTS {esquema_grupo}.{nombre_tabla} (
-                        id UUID PRIMARY KEY,
-                        {ciaf_field} TEXT,
-                        {num_field} INTEGER,
-                        geom geometry(Polygon, {srid})
-                    );
-                """)
-                cur.execute(f"""
-                    INSERT INTO {esquema_grupo}.{nombre_tabla} (id, {ciaf_field}, {num_field}, geom)
-                    VALUES (%s, %s, %s, ST_GeomFromText(%s, %s));
-                """, (
-                    str(uuid.uuid4()),
-                    f"clase_{nivel}",
-                    nivel * 100,
-                    geom_wkt,
-                    srid
-                ))
+            sentencias = plan_segmentaciones(payload, grupo_contenedor, huellas, tablas_existentes)
+            ejecutar_plan(cur, sentencias)
+            debug_print(f"Segmentaciones creadas: {tablas_en_plan(sentencias)} tablas")
 
-                debug_print(f"Segmentación creada: {nombre_tabla}")
-
-            # 2. Mapear imagen - tutores únicos relacionados por cualquier grupo
-            imagenes_por_tutor = dict()
-            for grupo in mapping_raster.groups:
-                tutores = tutores_por_grupo.get(grupo.groupId, set())
-                for tutor in tutores:
-                    if tutor not in imagenes_por_tutor:
-                        imagenes_por_tutor[tutor] = set()
-                    imagenes_por_tutor[tutor].add(raster_base)
-
-            # 3. Crear una sola segmentación por tutor por imagen
-            for tutor, imagenes in imagenes_por_tutor.items():
-                for raster_tutor in imagenes:
-                    nombre_tabla_tutor = f"{tutor}_{raster_tutor}"
-                    cur.execute(f"""
-                        CREATE TABLE IF NOT EXISTS {tutor}.{nombre_tabla_tutor} (
-                            id UUID PRIMARY KEY,
-                            {ciaf_field} TEXT,
-                            {num_field} INTEGER,
-                            geom geometry(Polygon, {srid})
-                        );
-                    """)
-                    cur.execute(f"""
-                        INSERT INTO {tutor}.{nombre_tabla_tutor} (id, {ciaf_field}, {num_field}, geom)
-                        VALUES (%s, %s, %s, ST_GeomFromText(%s, %s));
-                    """, (
-                        str(uuid.uuid4()),
-                        f"clase_{nivel}",
-                        nivel * 100,
-                        geom_wkt,
-                        srid
-                    ))
-
-                    debug_print(f"Segmentación creada en tutor {tutor}: {nombre_tabla_tutor}")
-            # -------------------- BLOQUE NUEVO TERMINA AQUÍ --------------------
+            conn.commit()
+            cur.close()
 
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al crear segmentaciones: {str(e)}")
 
+# Consulta única al catálogo: tablas existentes de los esquemas del proyecto y metadatos de rásters
+def consultar_catalogo_qgis(nombre_db: str, payload: ProjectExecutionRequest, grupo_contenedor: str):
+    esquemas = {grupo_contenedor.lower()}
+    esquemas.update(g.lower() for g in payload.groupNames)
+    for mapping_raster in payload.rasterGroupMappings:
+        esquemas.update(esquemas_relevantes(payload, mapping_raster))
 
-        conn.commit()
+    with conexion(nombre_db) as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT t.table_schema, t.table_name, rc.srid,
+                   ST_XMin(rc.extent), ST_YMin(rc.extent), ST_XMax(rc.extent), ST_YMax(rc.extent)
+            FROM information_schema.tables t
+            LEFT JOIN raster_columns rc
+              ON rc.r_table_schema = t.table_schema AND rc.r_table_name = t.table_name
+            WHERE t.table_schema = ANY(%s)
+        """, (sorted(esquemas),))
+        filas = cur.fetchall()
         cur.close()
-        conn.close()
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error al crear segmentaciones: {str(e)}")
+    tablas_existentes = set()
+    metadatos_raster = {}
+    for esquema, tabla, srid, xmin, ymin, xmax, ymax in filas:
+        tablas_existentes.add((esquema, tabla))
+        if esquema == grupo_contenedor.lower() and srid is not None:
+            extension = (xmin, ymin, xmax, ymax) if xmin is not None else None
+            metadatos_raster[tabla] = (srid, extension)
+
+    return tablas_existentes, metadatos_raster
 
 # Ejecución de proyectos QGIS
 def ejecutar_qgis_script(payload: ProjectExecutionRequest, nombre_db: str, grupo_contenedor: str) -> list:
     import tempfile
     import json
-    import subprocess
 
-    # 1. Guardar archivo temporal con parámetros
-    with tempfile.NamedTemporaryFile(mode="w", suffix=".json", delete=False, encoding="utf-8") as tmp_file:
-        json.dump({
-            "payload": payload.model_dump(),
+    # Escritura directa del XML desde plantilla (QGIS_PROJECT_WRITER=plantilla): sin runtime de QGIS
+    if os.getenv("QGIS_PROJECT_WRITER", "qgis") == "plantilla":
+        try:
+            tablas_existentes, metadatos_raster = consultar_catalogo_qgis(nombre_db, payload, grupo_contenedor)
+            return generar_proyectos_qgs(payload, nombre_db, grupo_contenedor, tablas_existentes, metadatos_raster)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error al generar proyectos QGIS desde plantilla: {str(e)}")
+
+    # Worker QGIS persistente (QGIS_WORKER_MODE=persistente): sin arranque de QGIS por proyecto
+    if worker_qgis_habilitado():
+        try:
+            return obtener_cliente_qgis().generar(payload, nombre_db, grupo_contenedor)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error al generar proyectos QGIS: {str(e)}")
+
+    # 1. Guardar archivo temporal con parámetros (payload posicional; JSON porque el
+    #    intérprete de QGIS puede no tener msgpack)
+    with tempfile.NamedTemporaryFile(mode="wb", suffix=".json", delete=False) as tmp_file:
+        tmp_file.write(codificar({
+            "payload": payload_a_lista(payload),
             "nombre_db": nombre_db,
             "grupo_contenedor": grupo_contenedor
-        }, tmp_file, ensure_ascii=False, indent=2)
+        }, "json"))
         ruta_json = tmp_file.name
 
     # 2. Ruta al script y ejecutable
@@ -423,7 +587,7 @@ def ejecutar_qgis_script(payload: ProjectExecutionRequest, nombre_db: str, grupo
     debug_print(f"Ruta JSON que se pasa al script: {ruta_json}")
     debug_print(f"Existe archivo JSON? {os.path.exists(ruta_json)}")
 
-    resultado = subprocess.run(comando, capture_output=True, text=True)
+    resultado = ejecutar_subproceso("qgis_script", comando, capture_output=True, text=True)
 
     debug_print(f"stdout del script:\n{resultado.stdout.strip()}")
     debug_print(f"stderr del script:\n{resultado.stderr.strip()}")
@@ -460,153 +624,124 @@ def ejecutar_qgis_script(payload: ProjectExecutionRequest, nombre_db: str, grupo
             detail=f"La salida del script QGIS no es un JSON válido: {str(e)}"
         )
 
-# Crear miembros y roles
-def gestionar_miembros_y_roles(payload: ProjectExecutionRequest, nombre_db: str, fecha_actual: str):
-    try:
-        conn = get_connection(nombre_db)
-        cur = conn.cursor()
+# Bloque DO que crea, en un solo viaje, los roles de la lista que aún no existan
+def _sentencia_crear_roles(roles: list, opciones: str = "") -> str:
+    arreglo = ", ".join(literal(r) for r in roles)
+    return f"""
+        DO $$
+        DECLARE r text;
+        BEGIN
+            FOREACH r IN ARRAY ARRAY[{arreglo}]::text[] LOOP
+                IF NOT EXISTS (SELECT FROM pg_roles WHERE rolname = r) THEN
+                    EXECUTE format('CREATE ROLE %I{opciones}', r);
+                END IF;
+            END LOOP;
+        END $$;
+    """
+
+# Lista de roles entre comillas para un único GRANT con varios destinatarios
+def _lista_roles(roles: list) -> str:
+    return ", ".join(f'"{r}"' for r in roles)
+
+# Sentencias de usuarios, roles de grupo, rol tutor y permisos del proyecto.
+#   rasters: limita los permisos sobre tablas a esos mapeos (actualización incremental); por defecto todos
+def plan_miembros_y_roles(payload: ProjectExecutionRequest, nombre_db: str, fecha_actual: str, rasters: list = None) -> list:
+    sentencias = []
+    if rasters is None:
+        rasters = payload.rasterGroupMappings
+    indice = indice_payload(payload)
+    usuarios = list(dict.fromkeys(
+        m.email.replace('"', '').replace("'", "") for m in payload.members
+    ))
+    nombre_rol_tutor = f"tutor_{nombre_db}"
+
+    # BLOQUE 1: Crear usuarios tipo LOGIN, con permiso básico
+    if usuarios:
+        sentencias.append(_sentencia_crear_roles(usuarios, " LOGIN"))
+        sentencias.append(f"GRANT SELECT ON pg_roles TO {_lista_roles(usuarios)};")
+
+    # BLOQUE 2: Crear roles de grupo (uno por grupo definido en la GUI) y el rol tutor del proyecto
+    roles_grupo = [f"{grupo}_{fecha_actual}" for grupo in payload.groupNames]
+    sentencias.append(_sentencia_crear_roles(roles_grupo + [nombre_rol_tutor]))
+
+    # BLOQUE 3: Otorgar permisos a roles de grupo
+    for mapping in rasters:
+        raster = nombre_tabla_raster(mapping.imageName)
+        for grupo in mapping.groups:
+            esquema = grupo.groupName.lower()
+            tabla_segmentacion = f"{esquema}_{raster}"
+            nombre_rol = f"{esquema}_{fecha_actual}"
+
+            sentencias.append(f'GRANT SELECT, INSERT, UPDATE, DELETE ON {esquema}.{tabla_segmentacion} TO "{nombre_rol}";')
+            sentencias.append(f'GRANT USAGE ON SCHEMA {esquema} TO "{nombre_rol}";')
+            sentencias.append(f'GRANT SELECT ON {payload.grupoContenedor}.{raster} TO "{nombre_rol}";')
+
+            # Solo otorgar permiso SELECT a segmentaciones de otros grupos si segmentan la misma imagen
+            if payload.studentTutor == "no":
+                for otro_grupo in mapping.groups:
+                    otro_esquema = otro_grupo.groupName.lower()
+                    if otro_esquema != esquema:
+                        sentencias.append(f'GRANT SELECT ON {otro_esquema}.{otro_esquema}_{raster} TO "{nombre_rol}";')
+
+    # BLOQUE 4: Asignar roles de grupo a miembros (Estudiantes y Contribuyentes)
+    for relacion in payload.memberGroupMappings:
+        miembro = indice.miembros_por_id.get(relacion.memberId)
+        if not miembro or miembro.role in ["Tutor", "Líder"]:
+            continue
 
-        debug_print("Ejecutando gestión de miembros y roles")
+        usuario_safe = miembro.email.replace('"', '').replace("'", "")
+        grupo_nombre = indice.grupos_por_id.get(relacion.groupId)
+        if grupo_nombre is None:
+            raise HTTPException(
+                status_code=500,
+                detail=f"No se encontró un nombre de grupo correspondiente a groupId='{relacion.groupId}' en el payload."
+            )
 
-        # BLOQUE 1: Crear usuarios tipo LOGIN
-        for miembro in payload.members:
-            usuario = miembro.email
-            usuario_safe = usuario.replace('"', '').replace("'", "")
-            cur.execute(f"""
-                DO $$
-                BEGIN
-                    IF NOT EXISTS (SELECT FROM pg_roles WHERE rolname = '{usuario_safe}') THEN
-                        EXECUTE format('CREATE ROLE "%s" LOGIN', '{usuario_safe}');
-                    END IF;
-                END $$;
-            """)
-            # Permiso básico
-            cur.execute(f'GRANT SELECT ON pg_roles TO "{usuario_safe}";')
+        sentencias.append(f'GRANT "{grupo_nombre}_{fecha_actual}" TO "{usuario_safe}";')
 
-        # BLOQUE 2: Crear roles de grupo (uno por grupo definido en la GUI)
-        for grupo in payload.groupNames:
-            nombre_rol = f"{grupo}_{fecha_actual}"
-            cur.execute(f"""
-                DO $$
-                BEGIN
-                    IF NOT EXISTS (SELECT FROM pg_roles WHERE rolname = '{nombre_rol}') THEN
-                        EXECUTE format('CREATE ROLE %I', '{nombre_rol}');
-                    END IF;
-                END $$;
-            """)
+    # BLOQUE 5: Otorgar permisos al rol tutor del proyecto
+    for mapping in rasters:
+        raster = nombre_tabla_raster(mapping.imageName)
 
-        # BLOQUE 3: Otorgar permisos a roles de grupo
-        for mapping in payload.rasterGroupMappings:
-            raster = os.path.splitext(mapping.imageName)[0].lower()
-            for grupo in mapping.groups:
-                esquema = grupo.groupName.lower()
-                tabla_segmentacion = f"{esquema}_{raster}"
-                nombre_rol = f"{esquema}_{fecha_actual}"
+        sentencias.append(f'GRANT SELECT, INSERT, UPDATE, DELETE ON {payload.grupoContenedor}.{raster} TO "{nombre_rol_tutor}";')
+        sentencias.append(f'GRANT USAGE ON SCHEMA {payload.grupoContenedor} TO "{nombre_rol_tutor}";')
 
-                cur.execute(f"""
-                    GRANT SELECT, INSERT, UPDATE, DELETE
-                    ON {esquema}.{tabla_segmentacion}
-                    TO "{nombre_rol}";
-                """)
+        for grupo in mapping.groups:
+            esquema = grupo.groupName.lower()
+            sentencias.append(f'GRANT SELECT, INSERT, UPDATE, DELETE ON {esquema}.{esquema}_{raster} TO "{nombre_rol_tutor}";')
+            sentencias.append(f'GRANT USAGE ON SCHEMA {esquema} TO "{nombre_rol_tutor}";')
 
-                cur.execute(f"""
-                    GRANT USAGE ON SCHEMA {esquema} TO "{nombre_rol}";
-                """)
-                
-                cur.execute(f"""
-                    GRANT SELECT
-                    ON {payload.grupoContenedor}.{raster}
-                    TO "{nombre_rol}";
-                """)
-
-                # Solo otorgar permiso SELECT a segmentaciones de otros grupos si segmentan la misma imagen
-                if payload.studentTutor == "no":
-                    for otro_grupo in mapping.groups:
-                        otro_esquema = otro_grupo.groupName.lower()
-                        otra_tabla = f"{otro_esquema}_{raster}"
-
-                        if otro_esquema != esquema:
-                            cur.execute(f"""
-                                GRANT SELECT
-                                ON {otro_esquema}.{otra_tabla}
-                                TO "{nombre_rol}";
-                            """)
-
-
-        # BLOQUE 4: Asignar roles de grupo a miembros (Estudiantes y Contribuyentes)
-        for relacion in payload.memberGroupMappings:
-            miembro = next((m for m in payload.members if m.id == relacion.memberId), None)
-            if not miembro or miembro.role in ["Tutor", "Líder"]:
-                continue
-
-            usuario = miembro.email
-            usuario_safe = usuario.replace('"', '').replace("'", "")
-            grupo_id = relacion.groupId
-
-            grupo_nombre = next(
-                (g.groupName for mapping in payload.rasterGroupMappings for g in mapping.groups if g.groupId == grupo_id),
-                None
-            )
+    # Las pirámides de cada ráster reciben la lectura otorgada a su tabla base
+    tablas_raster = [nombre_tabla_raster(m.imageName) for m in rasters]
+    roles_lectura = list(dict.fromkeys(
+        [f"{g.groupName.lower()}_{fecha_actual}" for m in rasters for g in m.groups] + [nombre_rol_tutor]
+    ))
+    if tablas_raster:
+        sentencias.append(sentencia_permisos_piramides(payload.grupoContenedor.lower(), tablas_raster, "SELECT", roles_lectura))
 
-            if grupo_nombre is None:
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"No se encontró un nombre de grupo correspondiente a groupId='{grupo_id}' en el payload."
-                )
-
-            nombre_rol = f"{grupo_nombre}_{fecha_actual}"
-            cur.execute(f'GRANT "{nombre_rol}" TO "{usuario_safe}";')
-
-        # BLOQUE 5: Crear rol tutor del proyecto
-        nombre_rol_tutor = f"tutor_{nombre_db}"
-        cur.execute(f"""
-            DO $$
-            BEGIN
-                IF NOT EXISTS (SELECT FROM pg_roles WHERE rolname = '{nombre_rol_tutor}') THEN
-                    EXECUTE format('CREATE ROLE %I', '{nombre_rol_tutor}');
-                END IF;
-            END $$;
-        """)
-
-        # BLOQUE 6: Otorgar permisos al rol tutor del proyecto
-        for mapping in payload.rasterGroupMappings:
-            raster = os.path.splitext(mapping.imageName)[0].lower()
+    # BLOQUE 6: Asignar rol tutor a Tutores y Líderes
+    tutores_y_lideres = list(dict.fromkeys(
+        m.email.replace('"', '').replace("'", "") for m in payload.members if m.role in ["Tutor", "Líder"]
+    ))
+    if tutores_y_lideres:
+        sentencias.append(f'GRANT "{nombre_rol_tutor}" TO {_lista_roles(tutores_y_lideres)};')
 
-            cur.execute(f"""
-                GRANT SELECT, INSERT, UPDATE, DELETE
-                ON {payload.grupoContenedor}.{raster}
-                TO "{nombre_rol_tutor}";
-            """)
+    # Los GRANT USAGE/SELECT se repiten por cada imagen; basta con uno
+    return sin_duplicados(sentencias)
 
-            cur.execute(f"""
-                GRANT USAGE ON SCHEMA {payload.grupoContenedor} TO "{nombre_rol_tutor}";
-            """)
+# Crear miembros y roles
+def gestionar_miembros_y_roles(payload: ProjectExecutionRequest, nombre_db: str, fecha_actual: str, rasters: list = None):
+    try:
+        with conexion(nombre_db) as conn:
+            cur = conn.cursor()
 
-            for grupo in mapping.groups:
-                esquema = grupo.groupName.lower()
-                tabla_segmentacion = f"{esquema}_{raster}"
-                cur.execute(f"""
-                    GRANT SELECT, INSERT, UPDATE, DELETE
-                    ON {esquema}.{tabla_segmentacion}
-                    TO "{nombre_rol_tutor}";
-                """)
+            debug_print("Ejecutando gestión de miembros y roles")
+            ejecutar_plan(cur, plan_miembros_y_roles(payload, nombre_db, fecha_actual, rasters))
 
-                cur.execute(f"""
-                    GRANT USAGE ON SCHEMA {esquema} TO "{nombre_rol_tutor}";
-                """)
-
-        # BLOQUE 7: Asignar rol tutor a Tutores y Líderes
-        for miembro in payload.members:
-            if miembro.role in ["Tutor", "Líder"]:
-                usuario = miembro.email
-                usuario_safe = usuario.replace('"', '').replace("'", "")
-                cur.execute(f'GRANT "{nombre_rol_tutor}" TO "{usuario_safe}";')
-                debug_print(f'Asignado rol "{nombre_rol_tutor}" al usuario {usuario_safe}')
-
-        # BLOQUE FINAL: Confirmar y cerrar
-        conn.commit()
-        cur.close()
-        conn.close()
+            # BLOQUE FINAL: Confirmar y cerrar
+            conn.commit()
+            cur.close()
+        notificar_cambio_roles()
         debug_print("Gestión de miembros y roles completada.")
 
     except Exception as e:
@@ -617,90 +752,95 @@ def gestionar_miembros_y_roles(payload: ProjectExecutionRequest, nombre_db: str,
 # Creación y llenado de tabla parametros_configuracion
 def crear_configuracion(nombre_db: str, grupo_contenedor: str, payload: ProjectExecutionRequest, fecha_actual: str, resumen_qgis: list):
     try:
-        conn = get_connection(nombre_db)
-        cur = conn.cursor()
+        with conexion(nombre_db) as conn:
+            cur = conn.cursor()
 
-        debug_print("Creando tabla parametros_configuracion si no existe...")
-
-        # 1. Crear la tabla si no existe
-        cur.execute(f"""
-            CREATE TABLE IF NOT EXISTS {grupo_contenedor}.parametros_configuracion (
-                servantMap TEXT PRIMARY KEY,
-                hostNames TEXT,
-                dbmsNames TEXT,
-                imageNames TEXT,
-                leaderUsernames TEXT [],
-                isStudentTutors BOOLEAN,
-                CIAFLevels INTEGER,
-                shpFields TEXT,
-                shpNumFields TEXT,
-                segmenterGroups TEXT []
-            );
-        """)
-
-        # 2. Obtener valores comunes
-        host = os.getenv("DB_HOST", "localhost")
-        port = os.getenv("QGIS_SERVER_PORT", "80")
-        is_student_tutor = payload.studentTutor == "si"
-        ciaf_level = int(payload.ciafLevel)
-        campo_ciaf = f"ciaf_{ciaf_level}"
-        campo_id = f"id_ciaf_{ciaf_level}n"
-
-        # Obtener líderes/tutores
-        lideres = [m.email for m in payload.members if m.role in ["Líder", "Tutor"]]
-        lideres_list = lideres
-
-        # 3. Insertar una fila por cada imagen
-        for mapping in payload.rasterGroupMappings:
-            nombre_raster = os.path.splitext(mapping.imageName)[0].lower()
-            servant_map = next((r["servantMap"] for r in resumen_qgis if r["imagen"] == mapping.imageName), None)
-            if not servant_map:
-                raise HTTPException(status_code=500, detail=f"No se encontró servantMap para la imagen '{mapping.imageName}' devuelta por el componente QGIS.")
-
-            # Eliminar cualquier configuración anterior con ese servantMap (por seguridad)
-            cur.execute(f"DELETE FROM {grupo_contenedor}.parametros_configuracion WHERE servantMap = %s", (servant_map,))
-
-            # Determinar roles de los grupos que segmentan esta imagen
-            roles_segmentacion = set()
-            for grupo in mapping.groups:
-                roles_segmentacion.add(f"{grupo.groupName}_{fecha_actual}")
-
-            segmenter_groups_list = list(roles_segmentacion)
-
-            # Validar que los roles existan
-            for rol_seg in segmenter_groups_list:
-                cur.execute("SELECT 1 FROM pg_roles WHERE rolname = %s", (rol_seg,))
-                if cur.fetchone() is None:
-                    raise HTTPException(
-                        status_code=500,
-                        detail=f"El rol de segmentación '{rol_seg}' no existe en PostgreSQL. Asegúrate de haber ejecutado correctamente gestionar_miembros_y_roles()."
-                    )
-                
-            # Insertar nuevo registro
+            debug_print("Creando tabla parametros_configuracion si no existe...")
+
+            # 1. Crear la tabla si no existe
             cur.execute(f"""
-                INSERT INTO {grupo_contenedor}.parametros_configuracion (
-                    servantMap, hostNames, dbmsNames, imageNames,
-                    leaderUsernames, isStudentTutors, CIAFLevels,
-                    shpFields, shpNumFields, segmenterGroups
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                servant_map,
-                host,
-                nombre_db,
-                nombre_raster,
-                lideres_list,
-                is_student_tutor,
-                ciaf_level,
-                campo_ciaf,
-                campo_id,
-                segmenter_groups_list
-            ))
+                CREATE TABLE IF NOT EXISTS {grupo_contenedor}.parametros_configuracion (
+                    servantMap TEXT PRIMARY KEY,
+                    hostNames TEXT,
+                    dbmsNames TEXT,
+                    imageNames TEXT,
+                    leaderUsernames TEXT [],
+                    isStudentTutors BOOLEAN,
+                    CIAFLevels INTEGER,
+                    shpFields TEXT,
+                    shpNumFields TEXT,
+                    segmenterGroups TEXT []
+                );
+            """)
 
-            debug_print(f"Registro insertado para servantMap: {servant_map}")
+            # 2. Obtener valores comunes
+            host = os.getenv("DB_HOST", "localhost")
+            port = os.getenv("QGIS_SERVER_PORT", "80")
+            is_student_tutor = payload.studentTutor == "si"
+            ciaf_level = int(payload.ciafLevel)
+            campo_ciaf = f"ciaf_{ciaf_level}"
+            campo_id = f"id_ciaf_{ciaf_level}n"
+
+            # Obtener líderes/tutores
+            lideres = [m.email for m in payload.members if m.role in ["Líder", "Tutor"]]
+            lideres_list = lideres
+
+            # 3. Insertar una fila por cada imagen
+            servant_maps = {r["imagen"]: r["servantMap"] for r in resumen_qgis}
+
+            # Roles de segmentación existentes, en una sola consulta
+            roles_esperados = sorted({f"{g.groupName}_{fecha_actual}" for m in payload.rasterGroupMappings for g in m.groups})
+            cur.execute("SELECT rolname FROM pg_roles WHERE rolname = ANY(%s)", (roles_esperados,))
+            roles_existentes = {row[0] for row in cur.fetchall()}
+
+            for mapping in payload.rasterGroupMappings:
+                nombre_raster = nombre_tabla_raster(mapping.imageName)
+                servant_map = servant_maps.get(mapping.imageName)
+                if not servant_map:
+                    raise HTTPException(status_code=500, detail=f"No se encontró servantMap para la imagen '{mapping.imageName}' devuelta por el componente QGIS.")
+
+                # Eliminar cualquier configuración anterior con ese servantMap (por seguridad)
+                cur.execute(f"DELETE FROM {grupo_contenedor}.parametros_configuracion WHERE servantMap = %s", (servant_map,))
+
+                # Determinar roles de los grupos que segmentan esta imagen
+                roles_segmentacion = set()
+                for grupo in mapping.groups:
+                    roles_segmentacion.add(f"{grupo.groupName}_{fecha_actual}")
+
+                segmenter_groups_list = list(roles_segmentacion)
+
+                # Validar que los roles existan
+                for rol_seg in segmenter_groups_list:
+                    if rol_seg not in roles_existentes:
+                        raise HTTPException(
+                            status_code=500,
+                            detail=f"El rol de segmentación '{rol_seg}' no existe en PostgreSQL. Asegúrate de haber ejecutado correctamente gestionar_miembros_y_roles()."
+                        )
+                
+                # Insertar nuevo registro
+                cur.execute(f"""
+                    INSERT INTO {grupo_contenedor}.parametros_configuracion (
+                        servantMap, hostNames, dbmsNames, imageNames,
+                        leaderUsernames, isStudentTutors, CIAFLevels,
+                        shpFields, shpNumFields, segmenterGroups
+                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """, (
+                    servant_map,
+                    host,
+                    nombre_db,
+                    nombre_raster,
+                    lideres_list,
+                    is_student_tutor,
+                    ciaf_level,
+                    campo_ciaf,
+                    campo_id,
+                    segmenter_groups_list
+                ))
 
-        conn.commit()
-        cur.close()
-        conn.close()
+                debug_print(f"Registro insertado para servantMap: {servant_map}")
+
+            conn.commit()
+            cur.close()
         debug_print("Tabla parametros_configuracion creada y registros insertados correctamente.")
 
     except Exception as e:
@@ -730,97 +870,103 @@ def revertir_proyecto_fallido(nombre_db: str):
     except Exception as e:
         debug_print(f"No se pudo eliminar carpeta QGIS: {e}")
 
+    # Archivos de rásters out-db del proyecto
+    try:
+        eliminar_outdb_proyecto(nombre_db)
+    except Exception as e:
+        debug_print(f"No se pudo eliminar el almacén out-db: {e}")
+
     # 2. Eliminar base de datos si existe
+    # Las conexiones del pool a esa base impedirían el DROP DATABASE
+    cerrar_pool(nombre_db)
     try:
-        conn = get_connection("postgres")
-        conn.autocommit = True
-        cur = conn.cursor()
+        with conexion("postgres") as conn:
+            conn.autocommit = True
+            cur = conn.cursor()
 
-        cur.execute("SELECT 1 FROM pg_database WHERE datname = %s", (nombre_db,))
-        if cur.fetchone():
-            cur.execute(f"""
-                SELECT pg_terminate_backend(pg_stat_activity.pid)
-                FROM pg_stat_activity
-                WHERE pg_stat_activity.datname = %s
-                  AND pid <> pg_backend_pid();
-            """, (nombre_db,))
-            cur.execute(f"DROP DATABASE IF EXISTS {nombre_db}")
-            debug_print(f"Base de datos eliminada: {nombre_db}")
+            cur.execute("SELECT 1 FROM pg_database WHERE datname = %s", (nombre_db,))
+            if cur.fetchone():
+                cur.execute(f"""
+                    SELECT pg_terminate_backend(pg_stat_activity.pid)
+                    FROM pg_stat_activity
+                    WHERE pg_stat_activity.datname = %s
+                      AND pid <> pg_backend_pid();
+                """, (nombre_db,))
+                cur.execute(f"DROP DATABASE IF EXISTS {nombre_db}")
+                debug_print(f"Base de datos eliminada: {nombre_db}")
 
-        cur.close()
-        conn.close()
+            cur.close()
     except Exception as e:
         debug_print(f"No se pudo eliminar base de datos: {e}")
 
     # 3. Revocar y eliminar roles de grupo del proyecto actual
     try:
-        conn = get_connection("postgres")
-        conn.autocommit = True
-        cur = conn.cursor()
-
-        # Extraer fecha desde el nombre del proyecto
-        import re
-        match = re.search(r'(\d{8}_\d{6})$', nombre_db)
-        fecha_proyecto = match.group(1) if match else None
-
-        if not fecha_proyecto:
-            debug_print(f"No se pudo extraer la fecha del nombre del proyecto: {nombre_db}")
-            cur.close()
-            conn.close()
-            return
+        with conexion("postgres") as conn:
+            conn.autocommit = True
+            cur = conn.cursor()
 
-        debug_print(f"Buscando roles de grupo asociados a la fecha del proyecto: {fecha_proyecto}")
+            # Extraer fecha desde el nombre del proyecto
+            import re
+            match = re.search(r'(\d{8}_\d{6})$', nombre_db)
+            fecha_proyecto = match.group(1) if match else None
 
-        # 3.1 Encontrar roles de grupo del proyecto actual
-        cur.execute("""
-            SELECT rolname
-            FROM pg_roles
-            WHERE rolcanlogin = false AND rolname ~ %s;
-        """, (f'_{fecha_proyecto}(_\\d{{6}})?$',))
-
-        roles_grupo = [row[0] for row in cur.fetchall()]
-        debug_print(f"Roles de grupo detectados: {roles_grupo}")
-
-        for rol in roles_grupo:
-            # Obtener OID del rol
-            cur.execute("""
-                SELECT oid FROM pg_roles WHERE rolname = %s
-            """, (rol,))
-            row_oid = cur.fetchone()
+            if not fecha_proyecto:
+                debug_print(f"No se pudo extraer la fecha del nombre del proyecto: {nombre_db}")
+                cur.close()
+                return
 
-            if not row_oid:
-                debug_print(f"Rol no encontrado (puede haber sido eliminado): {rol}")
-                continue
+            debug_print(f"Buscando roles de grupo asociados a la fecha del proyecto: {fecha_proyecto}")
 
-            rol_oid = row_oid[0]
-
-            # 3.2 Revocar el rol de todos los usuarios que lo tengan asignado
+            # 3.1 Encontrar roles de grupo del proyecto actual
             cur.execute("""
-                SELECT member::regrole::text
-                FROM pg_auth_members
-                WHERE roleid = %s
-            """, (rol_oid,))
-            miembros = [r[0] for r in cur.fetchall()]
-
-            for miembro in miembros:
-                if not miembro.strip():
-                    debug_print(f"Miembro vacío al intentar revocar {rol}")
+                SELECT rolname
+                FROM pg_roles
+                WHERE rolcanlogin = false AND rolname ~ %s;
+            """, (f'_{fecha_proyecto}(_\\d{{6}})?$',))
+
+            roles_grupo = [row[0] for row in cur.fetchall()]
+            debug_print(f"Roles de grupo detectados: {roles_grupo}")
+
+            for rol in roles_grupo:
+                # Obtener OID del rol
+                cur.execute("""
+                    SELECT oid FROM pg_roles WHERE rolname = %s
+                """, (rol,))
+                row_oid = cur.fetchone()
+
+                if not row_oid:
+                    debug_print(f"Rol no encontrado (puede haber sido eliminado): {rol}")
                     continue
-                try:
-                    cur.execute(f'REVOKE "{rol}" FROM "{miembro}";')
-                    debug_print(f"Revocado {rol} de {miembro}")
-                except Exception as e_revoke:
-                    debug_print(f"Error al revocar {rol} de {miembro}: {e_revoke}")
 
-            # 3.3 Eliminar el rol de grupo
-            try:
-                cur.execute(f'DROP ROLE IF EXISTS "{rol}";')
-                debug_print(f"Rol de grupo eliminado: {rol}")
-            except Exception as e_drop:
-                debug_print(f"No se pudo eliminar el rol de grupo {rol}: {e_drop}")
+                rol_oid = row_oid[0]
+
+                # 3.2 Revocar el rol de todos los usuarios que lo tengan asignado
+                cur.execute("""
+                    SELECT member::regrole::text
+                    FROM pg_auth_members
+                    WHERE roleid = %s
+                """, (rol_oid,))
+                miembros = [r[0] for r in cur.fetchall()]
+
+                for miembro in miembros:
+                    if not miembro.strip():
+                        debug_print(f"Miembro vacío al intentar revocar {rol}")
+                        continue
+                    try:
+                        cur.execute(f'REVOKE "{rol}" FROM "{miembro}";')
+                        debug_print(f"Revocado {rol} de {miembro}")
+                    except Exception as e_revoke:
+                        debug_print(f"Error al revocar {rol} de {miembro}: {e_revoke}")
+
+                # 3.3 Eliminar el rol de grupo
+                try:
+                    cur.execute(f'DROP ROLE IF EXISTS "{rol}";')
+                    debug_print(f"Rol de grupo eliminado: {rol}")
+                except Exception as e_drop:
+                    debug_print(f"No se pudo eliminar el rol de grupo {rol}: {e_drop}")
 
-        cur.close()
-        conn.close()
+            cur.close()
+        notificar_cambio_roles()
 
     except Exception as e:
         debug_print(f"Error en la limpieza de roles de grupo: {e}")
@@ -829,44 +975,34 @@ def revertir_proyecto_fallido(nombre_db: str):
 @router.post("/upload-tiffs")
 async def upload_tiffs(projectName: str = Form(...), files: List[UploadFile] = File(...)):
     try:
-        global UPLOAD_DIR
-
-        # Selección de entorno
-        # Entorno de desarrollo (comentar en producción)
-        UPLOAD_DIR = tempfile.mkdtemp(prefix="tiff_uploads_")
-
-        # Entorno de producción (descomentar para usar)
-        # base_dir = os.getenv("TEMP_UPLOAD_DIR", "/var/tmp/tiff_cargas")
-        # UPLOAD_DIR = tempfile.mkdtemp(prefix="tiff_uploads_", dir=base_dir)
-
-        debug_print(f"Carpeta temporal creada: {UPLOAD_DIR}")
+        # Espacio de carga propio de esta petición (dentro de TEMP_UPLOAD_DIR)
+        espacio = EspacioTrabajo.crear()
 
         # Validaciones de archivos
-        allowed_exts = ['tif', 'tiff']
-        nombre_invalido = re.compile(r'^[a-z0-9_]+$')
+        limite = limite_carga_bytes()
+        archivos = []
 
         for file in files:
             filename = file.filename
-            ext = filename.split(".")[-1].lower()
-            base = ".".join(filename.split(".")[:-1])
-
-            # Validar extensión
-            if ext not in allowed_exts:
-                raise HTTPException(status_code=400, detail=f"Extensión no permitida: {filename}")
+            validar_nombre_tiff(filename)
 
-            # Validar nombre base del archivo
-            if not nombre_invalido.match(base):
-                raise HTTPException(status_code=400, detail=f"Nombre de archivo inválido: {filename} (solo minúsculas, números y guiones bajos)")
+            # Guardar archivo por bloques fuera del event loop, sin cargarlo completo en memoria
+            full_path = espacio.archivo(filename)
+            info = await run_in_threadpool(guardar_en_bloques, file.file, full_path, limite)
+            bytes_cargados.inc(info["bytes"], via="multipart")
+            archivos_cargados.inc(via="multipart")
 
-            # Guardar archivo
-            full_path = os.path.join(UPLOAD_DIR, filename)
-            with open(full_path, "wb") as out_file:
-                content = await file.read()
-                out_file.write(content)
+            # Registrar en el almacén por contenido (sin duplicados) y exponerlo en la carpeta de trabajo
+            blob = await run_in_threadpool(registrar_en_almacen, full_path, info["sha256"])
+            # La conversión a COG empieza ya en segundo plano; /create la reutiliza por hash
+            solicitar_normalizacion(blob, info["sha256"])
+            await run_in_threadpool(vincular_en_carpeta, blob, espacio.ruta, filename)
+            espacio.registrar_archivo(filename, info["sha256"])
+            archivos.append({"nombre": filename, **info})
 
-            debug_print(f"TIFF recibido y guardado: {filename}")
+            debug_print(f"TIFF recibido y guardado: {filename} ({info['bytes']} bytes, sha256={info['sha256']})")
 
-        return {"success": True}
+        return {"success": True, "uploadId": espacio.id, "archivos": archivos}
 
     except HTTPException as he:
         return JSONResponse(status_code=he.status_code, content={"success": False, "detail": he.detail})
@@ -877,65 +1013,214 @@ async def upload_tiffs(projectName: str = Form(...), files: List[UploadFile] = F
             content={"success": False, "detail": f"Error al procesar los TIFFs: {str(e)}"}
         )
 
-# Endpoint para creación de elementos en el servidor postgresql
-@router.post("/create")
-async def create_project(payload: ProjectExecutionRequest):
-    debug_print(f"Campos en payload: {list(payload.__dict__.keys())}")
-    global UPLOAD_DIR
-    errores_imagenes = []
+class SesionCargaRequest(BaseModel):
+    nombre: str
+    tamano: int
+    sha256: str
+
+class ArchivoAlmacenado(BaseModel):
+    nombre: str
+    sha256: str
+
+class PrepararTiffsRequest(BaseModel):
+    projectName: str
+    archivos: List[ArchivoAlmacenado]
+
+# Tamaño máximo de un bloque en PUT /upload-sessions/{id} (UPLOAD_CHUNK_MAX_MB)
+MAX_BLOQUE_SESION = int(os.getenv("UPLOAD_CHUNK_MAX_MB", "64")) * 1024 * 1024
+
+# Crea una sesión de carga reanudable; si el SHA-256 ya está en el almacén se marca completa sin enviar datos
+@router.post("/upload-sessions")
+async def crear_sesion_carga(request: SesionCargaRequest):
+    return await run_in_threadpool(crear_sesion, request.nombre, request.tamano, request.sha256)
+
+# Estado de la sesión: offset desde el que debe continuar el cliente
+@router.get("/upload-sessions/{session_id}")
+async def consultar_sesion_carga(session_id: str):
+    return await run_in_threadpool(estado_sesion, session_id)
+
+# Recibe un bloque (cuerpo binario) en la posición ?offset=N
+@router.put("/upload-sessions/{session_id}")
+async def enviar_bloque_carga(session_id: str, offset: int, request: Request):
+    datos = bytearray()
+    async for parte in request.stream():
+        datos.extend(parte)
+        if len(datos) > MAX_BLOQUE_SESION:
+            raise HTTPException(status_code=413, detail=f"El bloque supera el máximo de {MAX_BLOQUE_SESION // (1024 * 1024)} MB.")
+    estado = await run_in_threadpool(escribir_bloque, session_id, offset, bytes(datos))
+    bytes_cargados.inc(len(datos), via="sesion")
+    return estado
+
+# Verifica el hash y registra el archivo en el almacén direccionado por contenido
+@router.post("/upload-sessions/{session_id}/finalize")
+async def finalizar_sesion_carga(session_id: str):
+    estado = await run_in_threadpool(finalizar_sesion, session_id)
+    archivos_cargados.inc(via="sesion")
+    solicitar_normalizacion(ruta_blob(estado["sha256"]), estado["sha256"])
+    return estado
+
+# Prepara la carpeta de TIFFs de un proyecto a partir de archivos ya presentes en el almacén
+@router.post("/prepare-tiffs")
+async def preparar_tiffs(request: PrepararTiffsRequest):
     try:
-        debug_print("JSON recibido en /create:")
-        debug_print(json.dumps(payload.model_dump(), indent=2))
+        faltantes = [a.nombre for a in request.archivos if not existe_blob(a.sha256.lower())]
+        if faltantes:
+            raise HTTPException(status_code=404, detail=f"Archivos no presentes en el almacén: {', '.join(faltantes)}")
 
-        if not UPLOAD_DIR:
-            raise HTTPException(
-                status_code=500,
-                detail="No se encontró la carpeta temporal para los TIFFs."
-            )
+        espacio = EspacioTrabajo.crear()
+        for archivo in request.archivos:
+            validar_nombre_tiff(archivo.nombre)
+            await run_in_threadpool(vincular_en_carpeta, ruta_blob(archivo.sha256.lower()), espacio.ruta, archivo.nombre)
+            espacio.registrar_archivo(archivo.nombre, archivo.sha256.lower())
+
+        debug_print(f"Espacio de carga preparado desde el almacén: {espacio.ruta}")
+        return {"success": True, "uploadId": espacio.id}
+
+    except HTTPException as he:
+        return JSONResponse(status_code=he.status_code, content={"success": False, "detail": he.detail})
+
+# Fecha del nombre del proyecto (sufijo _AAAAMMDD_HHMMSS), usada para nombrar roles de grupo
+def extraer_fecha_proyecto(nombre_proyecto: str) -> str:
+    match = re.search(r'_(\d{8}_\d{6})$', nombre_proyecto)
+    if not match:
+        raise HTTPException(status_code=500, detail="No se pudo extraer la fecha del nombre del proyecto.")
+    return match.group(1)
+
+# Etapas del pipeline de creación reportadas por /jobs/{id}
+ETAPAS_CREACION = [
+    "validacion",
+    "normalizacion",
+    "base_de_datos",
+    "extensiones",
+    "esquemas",
+    "importacion_rasters",
+    "segmentaciones",
+    "proyectos_qgis",
+    "miembros_y_roles",
+    "configuracion",
+]
+
+# Ejecuta una etapa del pipeline salvo que la bitácora ya la registre como completada.
+# Lo que retorna la función queda en la bitácora y se reutiliza al reanudar.
+def etapa_con_bitacora(trabajo, bitacora: BitacoraProyecto, nombre: str, funcion, *args):
+    with trabajo.etapa(nombre) as etapa:
+        if bitacora.completado(nombre):
+            etapa["detalle"] = "completada en una ejecución anterior"
+            return bitacora.detalle(nombre)
+        resultado = funcion(*args)
+        bitacora.marcar(nombre, resultado)
+        return resultado
+
+# Elimina tablas de rásters cuya importación no llegó a completarse (antes de reintentarlas)
+def descartar_rasters_incompletos(nombre_db: str, grupo_contenedor: str, rasters: list):
+    if not rasters:
+        return
+    with conexion(nombre_db) as conn:
+        cur = conn.cursor()
+        sentencias = []
+        for r in rasters:
+            tabla = nombre_tabla_raster(r.imageName)
+            sentencias.append(sentencia_eliminar_piramides(grupo_contenedor.lower(), tabla))
+            sentencias.append(f"DROP TABLE IF EXISTS {grupo_contenedor}.{tabla} CASCADE;")
+        ejecutar_plan(cur, sentencias)
+        conn.commit()
+        cur.close()
 
-        # Validar todas las imágenes (CRS, existencia, SRID)
-        errores_imagenes = validar_y_determinar_srids(payload.rasterGroupMappings)
+# Tras un fallo: revierte todo (PROJECT_ROLLBACK_ON_ERROR=1, por defecto) o conserva lo hecho para reanudar.
+# Retorna True si el proyecto quedó reanudable.
+def tras_fallo_creacion(nombre_db: str, bitacora: BitacoraProyecto) -> bool:
+    if rollback_automatico():
+        revertir_proyecto_fallido(nombre_db)
+        bitacora.eliminar()
+        return False
+    if not bitacora.pasos():
+        # Nada llegó a crearse: no hay desde dónde reanudar
+        bitacora.eliminar()
+        return False
+    debug_print(f"Proyecto {nombre_db} conservado para reanudar; pasos completados: {bitacora.pasos()}")
+    return True
+
+# Pipeline completo de creación; se ejecuta en segundo plano y retorna (status_code, contenido).
+# Cada paso queda en la bitácora del proyecto; con reanudar=True se omiten los ya completados.
+def ejecutar_creacion_proyecto(trabajo, payload: ProjectExecutionRequest, espacio: Optional[EspacioTrabajo], bitacora: BitacoraProyecto, reanudar: bool = False):
+    errores_imagenes = []
+    nombre_db = payload.projectName
+    grupo_contenedor = payload.grupoContenedor
+    try:
+        # Rásters aún no importados (todos, salvo al reanudar)
+        pendientes = [
+            r for r in payload.rasterGroupMappings
+            if not bitacora.completado(f"raster:{nombre_tabla_raster(r.imageName)}")
+        ]
+
+        with trabajo.etapa("validacion"):
+            if pendientes and espacio is None:
+                raise HTTPException(status_code=400, detail="Faltan los archivos TIFF de las imágenes pendientes (uploadId).")
+            # Validar las imágenes por importar (CRS, existencia, SRID)
+            errores_imagenes, metadatos_rasters = validar_y_determinar_srids(pendientes, espacio) if pendientes else ([], {})
+            # Índices de miembros, grupos, tutores y rásters que consumen las etapas siguientes
+            indice_payload(payload)
 
         # Si hay errores en imágenes, abortar
         if errores_imagenes:
-            return JSONResponse(
-                status_code=400,
-                content={
-                    "success": False,
-                    "msg": "Hay errores en las imágenes que impiden continuar.",
-                    "errores": errores_imagenes
-                }
-            )
+            return 400, {
+                "success": False,
+                "msg": "Hay errores en las imágenes que impiden continuar.",
+                "errores": errores_imagenes,
+                "reanudable": tras_fallo_creacion(nombre_db, bitacora)
+            }
+
+        # TIFFs pendientes reescritos como COG (teselados, comprimidos y con pirámides), una vez por contenido
+        resumen_normalizacion = []
+        with trabajo.etapa("normalizacion"):
+            if pendientes:
+                resumen_normalizacion = normalizar_espacio(espacio, [r.imageName for r in pendientes])
 
         # Acciones sobre el servidor PostgreSQL
-        crear_base_de_datos(payload.projectName)
-        habilitar_extensiones(payload.projectName)
-        crear_esquemas(payload.projectName, payload)
-        resumen_rasters = importar_rasters(payload.projectName, payload.rasterGroupMappings, payload.grupoContenedor)
+        with trabajo.etapa("base_de_datos") as etapa:
+            if bitacora.completado("base_de_datos"):
+                etapa["detalle"] = "completada en una ejecución anterior"
+            elif reanudar and existe_base_de_datos(nombre_db):
+                # La base se creó pero el proceso cayó antes de registrarlo
+                bitacora.marcar("base_de_datos")
+            else:
+                crear_base_de_datos(nombre_db)
+                bitacora.marcar("base_de_datos")
+        etapa_con_bitacora(trabajo, bitacora, "extensiones", habilitar_extensiones, nombre_db)
+        etapa_con_bitacora(trabajo, bitacora, "esquemas", crear_esquemas, nombre_db, payload)
+
+        with trabajo.etapa("importacion_rasters") as etapa:
+            if reanudar:
+                descartar_rasters_incompletos(nombre_db, grupo_contenedor, pendientes)
+            resumen_rasters = importar_rasters(
+                nombre_db, pendientes, grupo_contenedor, espacio.ruta if espacio else None,
+                payload.rasterStorage == MODO_ALMACENAMIENTO_OUTDB
+            )
+            # Cada ráster importado es un punto de control propio
+            for raster, resumen in zip(pendientes, resumen_rasters):
+                if resumen["status"] != "error":
+                    bitacora.marcar(f"raster:{nombre_tabla_raster(raster.imageName)}", resumen)
+            etapa["detalle"] = resumen_rasters
 
         # Verificar si hubo errores en al menos una imagen importada
         errores_en_importacion = [r for r in resumen_rasters if r["status"] == "error"]
         if errores_en_importacion:
-            return JSONResponse(
-                status_code=400,
-                content={
-                    "success": False,
-                    "msg": "El proyecto no se creó por errores en las imágenes.",
-                    "errores": errores_en_importacion
-                }
-            )
-        
-        crear_segmentaciones(payload, payload.projectName, payload.grupoContenedor)
+            return 400, {
+                "success": False,
+                "msg": "El proyecto no se creó por errores en las imágenes.",
+                "errores": errores_en_importacion,
+                "reanudable": tras_fallo_creacion(nombre_db, bitacora)
+            }
+
+        huellas = calcular_huellas(pendientes, metadatos_rasters)
+        etapa_con_bitacora(trabajo, bitacora, "segmentaciones", crear_segmentaciones, payload, nombre_db, grupo_contenedor, huellas)
 
         # Fecha actual para nombrar roles de grupo
-        match = re.search(r'_(\d{8}_\d{6})$', payload.projectName)
-        if not match:
-            raise HTTPException(status_code=500, detail="No se pudo extraer la fecha del nombre del proyecto.")
-        fecha_actual = match.group(1)
+        fecha_actual = extraer_fecha_proyecto(nombre_db)
 
-        # Generar proyectos QGIS por imagen
+        # Generar proyectos QGIS por imagen; el resumen se conserva en la bitácora para la configuración
         try:
-            resumen_qgis = ejecutar_qgis_script(payload, payload.projectName, payload.grupoContenedor)
+            resumen_qgis = etapa_con_bitacora(trabajo, bitacora, "proyectos_qgis", ejecutar_qgis_script, payload, nombre_db, grupo_contenedor)
             debug_print("Proyectos QGIS generados:")
             for r in resumen_qgis:
                 debug_print(f"- {r['imagen']} → {r['servantMap']}")
@@ -945,56 +1230,427 @@ async def create_project(payload: ProjectExecutionRequest):
                 status_code=500,
                 detail="Ocurrió un problema al generar los archivos del proyecto QGIS. Intenta nuevamente o contacta al administrador."
             )
-        
-        
+
         # Asignar usuarios, roles y permisos SQL
         try:
-            gestionar_miembros_y_roles(payload, payload.projectName, fecha_actual)
+            etapa_con_bitacora(trabajo, bitacora, "miembros_y_roles", gestionar_miembros_y_roles, payload, nombre_db, fecha_actual)
             debug_print("Miembros y roles gestionados correctamente.")
         except Exception as e_roles:
             raise HTTPException(
                 status_code=500,
                 detail="Ocurrió un error inesperado al asignar los usuarios y roles del proyecto. Ccontacta al administrador."
             )
-    
+
         # Crear e insertar párametros en la tabla parametros_configuracion
         try:
-            crear_configuracion(payload.projectName, payload.grupoContenedor, payload, fecha_actual, resumen_qgis)
+            etapa_con_bitacora(trabajo, bitacora, "configuracion", crear_configuracion, nombre_db, grupo_contenedor, payload, fecha_actual, resumen_qgis)
         except Exception as e_config:
             raise HTTPException(status_code=500, detail=f"Error al crear configuración del proyecto: {str(e_config)}")
 
+        # Proyecto completo: la bitácora ya no es necesaria
+        bitacora.eliminar()
+
         #  RESPUESTA FINAL DE ÉXITO
+        return 200, {
+            "success": True,
+            "msg": f"✅ El proyecto '{nombre_db}' se generó correctamente.",
+            "normalizacion": resumen_normalizacion,
+            #"resumen_qgis": resumen_qgis
+        }
+
+    except HTTPException as he:
+        debug_print(f"Error controlado: {he.detail}")
+        reanudable = tras_fallo_creacion(nombre_db, bitacora)
+        return he.status_code, {"success": False, "detail": he.detail, "errores": errores_imagenes, "reanudable": reanudable}
+
+    except Exception as e:
+        debug_print(f"ERROR GENERAL EN /create: {str(e)}")
+        traceback.print_exc()
+        reanudable = tras_fallo_creacion(nombre_db, bitacora)
+        return 500, {"success": False, "detail": str(e), "errores": errores_imagenes, "reanudable": reanudable}
+
+    finally:
+        if espacio is not None:
+            try:
+                # Si el proyecto puede reanudarse (bitácora conservada), los TIFFs quedan hasta que expire el espacio
+                if bitacora.existe():
+                    espacio.liberar()
+                else:
+                    espacio.eliminar()
+            except Exception as cleanup_error:
+                debug_print(f" No se pudo eliminar la carpeta temporal: {cleanup_error}")
+
+# Datos del payload que identifican una ejecución (el uploadId puede cambiar al reanudar)
+def huella_de_payload(payload: ProjectExecutionRequest) -> str:
+    return huella_payload(payload.model_dump(exclude={"uploadId"}))
+
+# Espacio de carga del payload, marcado en uso; None si no se envió uploadId
+def resolver_espacio(payload: ProjectExecutionRequest) -> Optional[EspacioTrabajo]:
+    if not payload.uploadId:
+        return None
+    espacio = EspacioTrabajo.obtener(payload.uploadId)
+    espacio.marcar_en_uso()
+    return espacio
+
+# Endpoint para creación de elementos en el servidor postgresql.
+# Retorna de inmediato un jobId; el avance se consulta en /jobs/{job_id}
+@router.post("/create")
+async def create_project(payload: ProjectExecutionRequest):
+    debug_print(f"Campos en payload: {list(payload.__dict__.keys())}")
+    debug_print("JSON recibido en /create:")
+    debug_print(json.dumps(payload.model_dump(), indent=2))
+
+    try:
+        bitacora = BitacoraProyecto(payload.projectName)
+    except HTTPException as he:
+        return JSONResponse(status_code=he.status_code, content={"success": False, "detail": he.detail, "errores": []})
+    if bitacora.existe():
         return JSONResponse(
-            status_code=200,
+            status_code=409,
             content={
-                "success": True,
-                "msg": f"✅ El proyecto '{payload.projectName}' se generó correctamente.",
-                #"resumen_qgis": resumen_qgis
+                "success": False,
+                "detail": f"El proyecto '{payload.projectName}' tiene una creación incompleta. Usa /{payload.projectName}/resume o /{payload.projectName}/rollback.",
+                "errores": []
             }
         )
 
+    try:
+        espacio = resolver_espacio(payload)
+        if espacio is None:
+            raise HTTPException(status_code=404, detail="Falta el uploadId.")
     except HTTPException as he:
-        debug_print(f"Error controlado: {he.detail}")
-        revertir_proyecto_fallido(payload.projectName)
+        return JSONResponse(status_code=he.status_code, content={"success": False, "detail": he.detail, "errores": []})
+
+    bitacora.iniciar(huella_de_payload(payload))
+    trabajo = lanzar_trabajo(
+        ejecutar_creacion_proyecto, ETAPAS_CREACION, payload, espacio, bitacora,
+        descripcion=f"Creación del proyecto {payload.projectName}"
+    )
+    debug_print(f"Trabajo de creación encolado: {trabajo.id}")
+
+    return JSONResponse(
+        status_code=202,
+        content={"success": True, "jobId": trabajo.id, "estado": trabajo.estado}
+    )
+
+# Reanuda una creación fallida desde el último paso completado según la bitácora.
+# El payload debe ser el mismo de la ejecución original; uploadId solo hace falta si quedan rásters por importar.
+@router.post("/{project_name}/resume")
+async def resume_project(project_name: str, payload: ProjectExecutionRequest):
+    if payload.projectName != project_name:
         return JSONResponse(
-            status_code=he.status_code,
-            content={"success": False, "detail": he.detail, "errores": errores_imagenes}
+            status_code=400,
+            content={"success": False, "detail": "El projectName del payload no coincide con el proyecto de la URL.", "errores": []}
         )
 
+    try:
+        bitacora = BitacoraProyecto(project_name)
+        if not bitacora.existe():
+            raise HTTPException(status_code=404, detail=f"No hay una creación incompleta del proyecto '{project_name}'.")
+        if bitacora.huella != huella_de_payload(payload):
+            raise HTTPException(status_code=409, detail="El payload no coincide con el de la creación original; no se puede reanudar.")
+        espacio = resolver_espacio(payload)
+    except HTTPException as he:
+        return JSONResponse(status_code=he.status_code, content={"success": False, "detail": he.detail, "errores": []})
+
+    trabajo = lanzar_trabajo(
+        ejecutar_creacion_proyecto, ETAPAS_CREACION, payload, espacio, bitacora, True,
+        descripcion=f"Reanudación del proyecto {project_name}"
+    )
+    debug_print(f"Trabajo de reanudación encolado: {trabajo.id} (pasos previos: {bitacora.pasos()})")
+
+    return JSONResponse(
+        status_code=202,
+        content={"success": True, "jobId": trabajo.id, "estado": trabajo.estado}
+    )
+
+# Pasos completados de una creación incompleta
+@router.get("/{project_name}/checkpoints")
+def obtener_bitacora(project_name: str):
+    bitacora = BitacoraProyecto(project_name)
+    if not bitacora.existe():
+        raise HTTPException(status_code=404, detail=f"No hay una creación incompleta del proyecto '{project_name}'.")
+    return bitacora.to_dict()
+
+# Rollback explícito de una creación incompleta: elimina base de datos, roles de grupo y proyectos QGIS
+@router.post("/{project_name}/rollback")
+async def rollback_project(project_name: str):
+    bitacora = BitacoraProyecto(project_name)
+    if not bitacora.existe():
+        raise HTTPException(status_code=404, detail=f"No hay una creación incompleta del proyecto '{project_name}'.")
+    await run_in_threadpool(revertir_proyecto_fallido, project_name)
+    bitacora.eliminar()
+    return {"success": True, "msg": f"Se revirtió la creación del proyecto '{project_name}'."}
+
+# Endpoint de consulta de progreso de un trabajo de creación
+@router.get("/jobs/{job_id}")
+def obtener_estado_trabajo(job_id: str):
+    estado = estado_trabajo(job_id)
+    if estado is None:
+        raise HTTPException(status_code=404, detail=f"No existe el trabajo '{job_id}'.")
+    return estado
+
+# ---------------------------------------------------------------------------
+# Actualización incremental de un proyecto existente
+# ---------------------------------------------------------------------------
+
+# Los nombres de proyecto llegan por la URL y se interpolan como identificadores SQL
+PATRON_NOMBRE_PROYECTO = re.compile(r'^[a-z0-9_]+$')
+
+def nombre_proyecto_invalido(project_name: str) -> Optional[JSONResponse]:
+    if PATRON_NOMBRE_PROYECTO.match(project_name):
+        return None
+    return JSONResponse(status_code=400, content={"success": False, "detail": f"Nombre de proyecto inválido: '{project_name}'."})
+
+def existe_base_de_datos(nombre_db: str) -> bool:
+    with conexion("postgres") as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT 1 FROM pg_database WHERE datname = %s", (nombre_db,))
+        existe = cur.fetchone() is not None
+        cur.close()
+    return existe
+
+# Estado actual del proyecto: tablas de sus esquemas e imágenes ya registradas en parametros_configuracion
+def consultar_estado_proyecto(nombre_db: str, payload: ProjectExecutionRequest, grupo_contenedor: str) -> tuple:
+    tablas_existentes, _ = consultar_catalogo_qgis(nombre_db, payload, grupo_contenedor)
+    imagenes_configuradas = set()
+    if (grupo_contenedor.lower(), "parametros_configuracion") in tablas_existentes:
+        with conexion(nombre_db) as conn:
+            cur = conn.cursor()
+            cur.execute(f"SELECT imageNames FROM {grupo_contenedor}.parametros_configuracion")
+            imagenes_configuradas = {row[0] for row in cur.fetchall()}
+            cur.close()
+    return tablas_existentes, imagenes_configuradas
+
+# Rásters nuevos (sin tabla en el esquema contenedor) y afectados (nuevos, sin fila en parametros_configuracion
+# o con alguna tabla de segmentación faltante, p. ej. por un grupo o tutor agregado)
+def diferencias_proyecto(payload: ProjectExecutionRequest, grupo_contenedor: str, tablas_existentes: set, imagenes_configuradas: set) -> tuple:
+    rasters_importados = {tabla for esquema, tabla in tablas_existentes if esquema == grupo_contenedor.lower()}
+    indice = indice_payload(payload)
+
+    nuevos = [m for tabla, m in indice.rasters_por_tabla.items() if tabla not in rasters_importados]
+    afectados = [
+        m for tabla, m in indice.rasters_por_tabla.items()
+        if tabla not in rasters_importados
+        or tabla not in imagenes_configuradas
+        or any((e, f"{e}_{tabla}") not in tablas_existentes for e in indice.esquemas_segmentacion(m))
+    ]
+    return nuevos, afectados
+
+# Copia del payload limitada a algunos rásters (con su propio índice)
+def subconjunto_rasters(payload: ProjectExecutionRequest, rasters: list) -> ProjectExecutionRequest:
+    parcial = payload.model_copy(update={"rasterGroupMappings": list(rasters)})
+    parcial._indice = None
+    return parcial
+
+# Líderes y tutores actuales en todas las filas de parametros_configuracion
+def actualizar_lideres_configuracion(nombre_db: str, grupo_contenedor: str, payload: ProjectExecutionRequest):
+    lideres = [m.email for m in payload.members if m.role in ["Líder", "Tutor"]]
+    with conexion(nombre_db) as conn:
+        cur = conn.cursor()
+        cur.execute(f"UPDATE {grupo_contenedor}.parametros_configuracion SET leaderUsernames = %s", (lideres,))
+        conn.commit()
+        cur.close()
+
+# Etapas del mantenimiento de índices reportadas por /jobs/{id}
+ETAPAS_MANTENIMIENTO = ["indices", "reindexacion", "analisis"]
+
+# Etapas de la actualización incremental reportadas por /jobs/{id}
+ETAPAS_ACTUALIZACION = [
+    "diferencias",
+    "validacion",
+    "normalizacion",
+    "esquemas",
+    "importacion_rasters",
+    "segmentaciones",
+    "proyectos_qgis",
+    "miembros_y_roles",
+    "configuracion",
+]
+
+# Aplica al proyecto solo lo que falta según el payload: rásters nuevos, tablas de segmentación faltantes,
+# .qgz y filas de configuración de los rásters afectados, y permisos sobre esos rásters.
+# Es aditiva (no elimina imágenes, grupos ni miembros) e idempotente: si falla, se puede repetir.
+def ejecutar_actualizacion_proyecto(trabajo, payload: ProjectExecutionRequest, espacio: Optional[EspacioTrabajo]):
+    nombre_db = payload.projectName
+    grupo_contenedor = payload.grupoContenedor
+    errores_imagenes = []
+    try:
+        fecha_actual = extraer_fecha_proyecto(nombre_db)
+
+        with trabajo.etapa("diferencias") as etapa:
+            tablas_existentes, imagenes_configuradas = consultar_estado_proyecto(nombre_db, payload, grupo_contenedor)
+            nuevos, afectados = diferencias_proyecto(payload, grupo_contenedor, tablas_existentes, imagenes_configuradas)
+            etapa["detalle"] = {
+                "rasters_nuevos": [m.imageName for m in nuevos],
+                "rasters_afectados": [m.imageName for m in afectados],
+            }
+
+        with trabajo.etapa("validacion"):
+            metadatos_rasters = {}
+            if nuevos:
+                if espacio is None:
+                    return 400, {
+                        "success": False,
+                        "msg": "Faltan los archivos TIFF de las imágenes nuevas (uploadId).",
+                        "errores": [{"imagen": m.imageName, "error": "Archivo no cargado."} for m in nuevos]
+                    }
+                errores_imagenes, metadatos_rasters = validar_y_determinar_srids(nuevos, espacio)
+
+        if errores_imagenes:
+            return 400, {
+                "success": False,
+                "msg": "Hay errores en las imágenes que impiden continuar.",
+                "errores": errores_imagenes
+            }
+
+        resumen_normalizacion = []
+        with trabajo.etapa("normalizacion"):
+            if nuevos:
+                resumen_normalizacion = normalizar_espacio(espacio, [m.imageName for m in nuevos])
+
+        with trabajo.etapa("esquemas"):
+            crear_esquemas(nombre_db, payload)
+        with trabajo.etapa("importacion_rasters") as etapa:
+            resumen_rasters = importar_rasters(
+                nombre_db, nuevos, grupo_contenedor, espacio.ruta if espacio else None,
+                payload.rasterStorage == MODO_ALMACENAMIENTO_OUTDB
+            )
+            etapa["detalle"] = resumen_rasters
+
+        errores_en_importacion = [r for r in resumen_rasters if r["status"] == "error"]
+        if errores_en_importacion:
+            return 400, {
+                "success": False,
+                "msg": "El proyecto no se actualizó por errores en las imágenes.",
+                "errores": errores_en_importacion
+            }
+
+        with trabajo.etapa("segmentaciones"):
+            huellas = calcular_huellas(nuevos, metadatos_rasters)
+            crear_segmentaciones(payload, nombre_db, grupo_contenedor, huellas, tablas_existentes)
+
+        parcial = subconjunto_rasters(payload, afectados)
+        resumen_qgis = []
+        with trabajo.etapa("proyectos_qgis"):
+            if afectados:
+                resumen_qgis = ejecutar_qgis_script(parcial, nombre_db, grupo_contenedor)
+
+        # Roles y membresías son idempotentes; los permisos sobre tablas se limitan a los rásters afectados
+        with trabajo.etapa("miembros_y_roles"):
+            gestionar_miembros_y_roles(payload, nombre_db, fecha_actual, afectados)
+
+        with trabajo.etapa("configuracion"):
+            if afectados:
+                crear_configuracion(nombre_db, grupo_contenedor, parcial, fecha_actual, resumen_qgis)
+            actualizar_lideres_configuracion(nombre_db, grupo_contenedor, payload)
+
+        return 200, {
+            "success": True,
+            "msg": f"✅ El proyecto '{nombre_db}' se actualizó correctamente.",
+            "rasters_nuevos": [m.imageName for m in nuevos],
+            "rasters_actualizados": [m.imageName for m in afectados],
+            "normalizacion": resumen_normalizacion,
+        }
+
+    # Sin rollback: el proyecto existente se conserva y la actualización puede repetirse
+    except HTTPException as he:
+        debug_print(f"Error controlado en actualización: {he.detail}")
+        return he.status_code, {"success": False, "detail": he.detail, "errores": errores_imagenes}
+
     except Exception as e:
-        debug_print(f"ERROR GENERAL EN /create: {str(e)}")
+        debug_print(f"ERROR GENERAL EN actualización: {str(e)}")
         traceback.print_exc()
-        revertir_proyecto_fallido(payload.projectName)
+        return 500, {"success": False, "detail": str(e), "errores": errores_imagenes}
+
+    finally:
+        if espacio is not None:
+            try:
+                espacio.eliminar()
+            except Exception as cleanup_error:
+                debug_print(f" No se pudo eliminar la carpeta temporal: {cleanup_error}")
+
+# Endpoint de actualización incremental: mismo payload que /create con la configuración completa deseada.
+# Los TIFFs solo son necesarios para las imágenes nuevas (uploadId opcional). Retorna un jobId.
+@router.patch("/{project_name}")
+async def update_project(project_name: str, payload: ProjectExecutionRequest):
+    invalido = nombre_proyecto_invalido(project_name)
+    if invalido is not None:
+        return invalido
+
+    if payload.projectName != project_name:
         return JSONResponse(
-            status_code=500,
-            content={"success": False, "detail": str(e), "errores": errores_imagenes}
+            status_code=400,
+            content={"success": False, "detail": "El projectName del payload no coincide con el proyecto de la URL."}
         )
 
-    finally:
+    if not await run_in_threadpool(existe_base_de_datos, project_name):
+        return JSONResponse(status_code=404, content={"success": False, "detail": f"No existe el proyecto '{project_name}'."})
+
+    if BitacoraProyecto(project_name).existe():
+        return JSONResponse(
+            status_code=409,
+            content={"success": False, "detail": f"La creación del proyecto '{project_name}' está incompleta; reanúdala o reviértela antes de actualizarlo."}
+        )
+
+    espacio = None
+    if payload.uploadId:
         try:
-            if UPLOAD_DIR and os.path.exists(UPLOAD_DIR):
-                shutil.rmtree(UPLOAD_DIR)
-                debug_print(f"Carpeta temporal eliminada: {UPLOAD_DIR}")
-                UPLOAD_DIR = None
-        except Exception as cleanup_error:
-            debug_print(f" No se pudo eliminar la carpeta temporal: {cleanup_error}")
+            espacio = EspacioTrabajo.obtener(payload.uploadId)
+            espacio.marcar_en_uso()
+        except HTTPException as he:
+            return JSONResponse(status_code=he.status_code, content={"success": False, "detail": he.detail})
+
+    trabajo = lanzar_trabajo(
+        ejecutar_actualizacion_proyecto, ETAPAS_ACTUALIZACION, payload, espacio,
+        descripcion=f"Actualización del proyecto {project_name}"
+    )
+    debug_print(f"Trabajo de actualización encolado: {trabajo.id}")
+
+    return JSONResponse(
+        status_code=202,
+        content={"success": True, "jobId": trabajo.id, "estado": trabajo.estado}
+    )
+
+# Mantenimiento de un proyecto existente: crea los índices y parámetros faltantes en sus tablas de
+# segmentación, las reindexa (?reindexar=false lo omite) y ejecuta ANALYZE. Retorna un jobId.
+@router.post("/{project_name}/maintenance")
+async def mantener_indices_proyecto(project_name: str, reindexar: bool = True):
+    invalido = nombre_proyecto_invalido(project_name)
+    if invalido is not None:
+        return invalido
+
+    if not await run_in_threadpool(existe_base_de_datos, project_name):
+        return JSONResponse(status_code=404, content={"success": False, "detail": f"No existe el proyecto '{project_name}'."})
+
+    trabajo = lanzar_trabajo(
+        mantener_proyecto, ETAPAS_MANTENIMIENTO, project_name, reindexar,
+        descripcion=f"Mantenimiento del proyecto {project_name}"
+    )
+    debug_print(f"Trabajo de mantenimiento encolado: {trabajo.id}")
+
+    return JSONResponse(
+        status_code=202,
+        content={"success": True, "jobId": trabajo.id, "estado": trabajo.estado}
+    )
+
+# Simulación (dry-run): retorna el SQL que se ejecutaría para esquemas, segmentaciones y roles, sin tocar el servidor.
+# Sin huellas calculadas, la geometría de las segmentaciones se toma de raster_columns.
+@router.post("/plan")
+def planear_proyecto(payload: ProjectExecutionRequest):
+    try:
+        fecha_actual = extraer_fecha_proyecto(payload.projectName)
+        plan = {
+            "esquemas": plan_esquemas(payload),
+            "segmentaciones": plan_segmentaciones(payload, payload.grupoContenedor),
+            "miembros_y_roles": plan_miembros_y_roles(payload, payload.projectName, fecha_actual),
+        }
+    except HTTPException as he:
+        return JSONResponse(status_code=he.status_code, content={"success": False, "detail": he.detail})
+
+    return {
+        "success": True,
+        "nombre_db": payload.projectName,
+        "tamano_lote": tamano_lote(),
+        "sentencias": {etapa: [" ".join(s.split()) for s in sentencias] for etapa, sentencias in plan.items()},
+    }
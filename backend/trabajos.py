@@ -0,0 +1,208 @@
+# backend/trabajos.py
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+import threading
+import traceback
+import json
+import time
+import uuid
+import os
+import re
+from backend.cargas import carpeta_almacen
+from backend.depuracion import debug_print
+from backend.metricas import duracion_etapas, trabajos_terminados, duracion_trabajos
+
+# Tiempo que se conservan en memoria los trabajos terminados (segundos)
+TTL_TRABAJOS_TERMINADOS = int(os.getenv("PROJECT_JOB_TTL", "3600"))
+
+# Ejecutor en segundo plano compartido por todos los trabajos de creación
+_executor = ThreadPoolExecutor(
+    max_workers=max(1, int(os.getenv("PROJECT_JOB_WORKERS", "2"))),
+    thread_name_prefix="trabajo_proyecto"
+)
+
+_trabajos = {}
+_lock = threading.Lock()
+
+# El estado de cada trabajo se guarda también en disco (PROJECT_JOB_DIR o <almacén>/trabajos):
+# /jobs/{id} puede llegar a un worker de uvicorn/gunicorn distinto del que ejecuta el trabajo.
+def carpeta_trabajos() -> str:
+    ruta = os.getenv("PROJECT_JOB_DIR") or os.path.join(carpeta_almacen(), "trabajos")
+    os.makedirs(ruta, exist_ok=True)
+    return ruta
+
+def _ruta_trabajo(id_trabajo: str):
+    if not re.match(r'^[0-9a-f]{32}$', id_trabajo or ""):
+        return None
+    return os.path.join(carpeta_trabajos(), f"{id_trabajo}.json")
+
+# Estado y progreso por etapas de un trabajo en segundo plano
+class Trabajo:
+    def __init__(self, etapas: list, descripcion: str = ""):
+        self.id = uuid.uuid4().hex
+        self.descripcion = descripcion
+        self.estado = "pendiente"  # pendiente | en_progreso | completado | error
+        self.creado = datetime.now().isoformat(timespec="seconds")
+        self.etapas = [{"nombre": nombre, "estado": "pendiente", "duracion_segundos": None} for nombre in etapas]
+        self.etapa_actual = None
+        self.status_code = None
+        self.resultado = None
+        self._inicio = None
+        self._fin = None
+        self._inicio_reloj = None  # time.time(), para calcular la duración desde otros procesos
+
+    def _buscar_etapa(self, nombre: str) -> dict:
+        for etapa in self.etapas:
+            if etapa["nombre"] == nombre:
+                return etapa
+        etapa = {"nombre": nombre, "estado": "pendiente", "duracion_segundos": None}
+        self.etapas.append(etapa)
+        return etapa
+
+    # Marca una etapa como en curso y registra su duración al salir
+    @contextmanager
+    def etapa(self, nombre: str):
+        with _lock:
+            etapa = self._buscar_etapa(nombre)
+            etapa["estado"] = "en_progreso"
+            self.etapa_actual = nombre
+        self.guardar()
+        inicio = time.perf_counter()
+        try:
+            yield etapa
+        except BaseException:
+            duracion = time.perf_counter() - inicio
+            with _lock:
+                etapa["estado"] = "error"
+                etapa["duracion_segundos"] = round(duracion, 2)
+            self.guardar()
+            duracion_etapas.observar(duracion, etapa=nombre, resultado="error")
+            raise
+        duracion = time.perf_counter() - inicio
+        with _lock:
+            etapa["estado"] = "completado"
+            etapa["duracion_segundos"] = round(duracion, 2)
+        self.guardar()
+        duracion_etapas.observar(duracion, etapa=nombre, resultado="completado")
+
+    def terminado(self) -> bool:
+        return self.estado in ("completado", "error")
+
+    def to_dict(self) -> dict:
+        with _lock:
+            completadas = sum(1 for e in self.etapas if e["estado"] == "completado")
+            duracion = None
+            if self._inicio is not None:
+                duracion = round((self._fin or time.perf_counter()) - self._inicio, 2)
+            return {
+                "jobId": self.id,
+                "descripcion": self.descripcion,
+                "estado": self.estado,
+                "creado": self.creado,
+                "etapaActual": self.etapa_actual,
+                "progreso": round(completadas / len(self.etapas), 2) if self.etapas else 0,
+                "duracion_segundos": duracion,
+                "etapas": [dict(e) for e in self.etapas],
+                "status_code": self.status_code,
+                "resultado": self.resultado,
+            }
+
+    # Escribe el estado en disco de forma atómica (el trabajo lo actualiza desde un solo hilo)
+    def guardar(self):
+        datos = self.to_dict()
+        datos["inicio_reloj"] = self._inicio_reloj
+        ruta = _ruta_trabajo(self.id)
+        temporal = f"{ruta}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temporal, "w", encoding="utf-8") as f:
+                json.dump(datos, f, ensure_ascii=False, default=str)
+            os.replace(temporal, ruta)
+        except Exception as e:
+            debug_print(f"No se pudo guardar el estado del trabajo {self.id}: {e}")
+            if os.path.exists(temporal):
+                os.remove(temporal)
+
+# Elimina los trabajos terminados hace más de TTL_TRABAJOS_TERMINADOS, en memoria y en disco.
+# Un trabajo que sigue "en progreso" mucho después (proceso caído) también se descarta.
+def _purgar_trabajos():
+    limite = time.perf_counter() - TTL_TRABAJOS_TERMINADOS
+    with _lock:
+        vencidos = [t.id for t in _trabajos.values() if t._fin is not None and t._fin < limite]
+        for id_trabajo in vencidos:
+            del _trabajos[id_trabajo]
+
+    carpeta = carpeta_trabajos()
+    ahora = time.time()
+    for nombre in os.listdir(carpeta):
+        ruta = os.path.join(carpeta, nombre)
+        try:
+            antiguedad = ahora - os.path.getmtime(ruta)
+            if antiguedad < TTL_TRABAJOS_TERMINADOS:
+                continue
+            if nombre.endswith(".json") and antiguedad < 4 * TTL_TRABAJOS_TERMINADOS:
+                with open(ruta, "r", encoding="utf-8") as f:
+                    if json.load(f).get("estado") not in ("completado", "error"):
+                        continue
+            os.remove(ruta)
+        except (OSError, ValueError) as e:
+            debug_print(f"No se pudo purgar el trabajo {nombre}: {e}")
+
+# Registra un trabajo y lo ejecuta en segundo plano.
+# funcion(trabajo, *args) debe retornar (status_code, contenido)
+def lanzar_trabajo(funcion, etapas: list, *args, descripcion: str = "") -> Trabajo:
+    _purgar_trabajos()
+    trabajo = Trabajo(etapas, descripcion)
+    with _lock:
+        _trabajos[trabajo.id] = trabajo
+    trabajo.guardar()
+
+    def ejecutar():
+        with _lock:
+            trabajo.estado = "en_progreso"
+            trabajo._inicio = time.perf_counter()
+            trabajo._inicio_reloj = time.time()
+        trabajo.guardar()
+        try:
+            status_code, contenido = funcion(trabajo, *args)
+        except Exception as e:
+            debug_print(f"Error no controlado en trabajo {trabajo.id}: {e}")
+            debug_print(traceback.format_exc())
+            status_code, contenido = 500, {"success": False, "detail": str(e)}
+        with _lock:
+            trabajo.status_code = status_code
+            trabajo.resultado = contenido
+            trabajo.estado = "completado" if status_code < 400 else "error"
+            trabajo.etapa_actual = None
+            trabajo._fin = time.perf_counter()
+        trabajo.guardar()
+        trabajos_terminados.inc(estado=trabajo.estado)
+        duracion_trabajos.observar(trabajo._fin - trabajo._inicio, estado=trabajo.estado)
+        debug_print(f"Trabajo {trabajo.id} finalizado con estado {trabajo.estado}")
+
+    _executor.submit(ejecutar)
+    return trabajo
+
+def obtener_trabajo(id_trabajo: str):
+    with _lock:
+        return _trabajos.get(id_trabajo)
+
+# Estado de un trabajo lanzado por cualquier worker: en memoria si es de este proceso, si no desde disco
+def estado_trabajo(id_trabajo: str):
+    trabajo = obtener_trabajo(id_trabajo)
+    if trabajo is not None:
+        return trabajo.to_dict()
+
+    ruta = _ruta_trabajo(id_trabajo)
+    if ruta is None or not os.path.exists(ruta):
+        return None
+    try:
+        with open(ruta, "r", encoding="utf-8") as f:
+            datos = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    inicio_reloj = datos.pop("inicio_reloj", None)
+    if datos.get("estado") == "en_progreso" and inicio_reloj:
+        datos["duracion_segundos"] = round(time.time() - inicio_reloj, 2)
+    return datos
@@ -759,7 +759,8 @@ document.addEventListener('DOMContentLoaded', () => {
         rasterGroupMappings,
         memberGroupMappings,
         members: miembrosList,
-        grupoContenedor: grupoContenedorNombre
+        grupoContenedor: grupoContenedorNombre,
+        rasterStorage: document.getElementById('rasterStorage')?.value || 'indb'
       };   
 
       // Construir FormData con archivos TIFF cargados
@@ -789,6 +790,9 @@ document.addEventListener('DOMContentLoaded', () => {
           alert("❌ Error al cargar archivos TIFF: " + (uploadResult.detail || 'Desconocido'));
           return;
         }
+
+        // Espacio de carga propio de este proyecto
+        finalPayload.uploadId = uploadResult.uploadId;
       } 
 
       catch (err) {
@@ -817,7 +821,15 @@ document.addEventListener('DOMContentLoaded', () => {
           return;
         }
 
-      if (!createResponse.ok || !createResult.success) {
+      // La creación corre en segundo plano: consultar el trabajo hasta que termine
+      let createOk = createResponse.ok;
+      if (createOk && createResult.jobId) {
+        const trabajo = await esperarTrabajo(createResult.jobId);
+        createOk = trabajo.status_code !== null && trabajo.status_code < 400;
+        createResult = trabajo.resultado || { success: false, detail: "El trabajo terminó sin resultado." };
+      }
+
+      if (!createOk || !createResult.success) {
         const erroresImagenes = Array.isArray(createResult.errores) && createResult.errores.length > 0;
 
         if (erroresImagenes) {
@@ -840,6 +852,11 @@ document.addEventListener('DOMContentLoaded', () => {
           alert(mensaje);
         }
 
+        // Lo ya creado se conserva: reanudar desde el último paso completado o descartar el proyecto
+        if (createResult.reanudable) {
+          await ofrecerReanudacion(finalPayload);
+        }
+
         return;
       }
 
@@ -860,6 +877,66 @@ document.addEventListener('DOMContentLoaded', () => {
   });
 });
 
+//Reanudación o descarte de una creación fallida que dejó pasos completados
+async function ofrecerReanudacion(payload) {
+  const nombre = encodeURIComponent(payload.projectName);
+  while (true) {
+    const reintentar = confirm(
+      "El proyecto quedó creado parcialmente.\n\n" +
+      "Aceptar: reintentar desde el último paso completado.\n" +
+      "Cancelar: descartar lo creado."
+    );
+
+    if (!reintentar) {
+      const response = await fetch(`/api/projects/${nombre}/rollback`, { method: 'POST' });
+      const resultado = await response.json().catch(() => ({}));
+      alert(response.ok ? "Se descartó la creación del proyecto." : "❌ No se pudo descartar el proyecto: " + (resultado.detail || response.status));
+      return;
+    }
+
+    const response = await fetch(`/api/projects/${nombre}/resume`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(payload)
+    });
+    let resultado = await response.json().catch(() => ({ success: false }));
+
+    if (response.ok && resultado.jobId) {
+      const trabajo = await esperarTrabajo(resultado.jobId);
+      resultado = trabajo.resultado || { success: false, detail: "El trabajo terminó sin resultado." };
+      if (trabajo.status_code !== null && trabajo.status_code < 400 && resultado.success) {
+        alert(resultado.msg || "✅ Proyecto creado exitosamente.");
+        return;
+      }
+    }
+
+    alert("❌ La reanudación falló.\n\n" + (resultado.detail || resultado.msg || "Sin detalle del servidor."));
+    if (!resultado.reanudable) {
+      return;
+    }
+  }
+}
+
+//Consulta periódica del estado de un trabajo de creación hasta que termine
+async function esperarTrabajo(jobId, intervaloMs = 2000) {
+  while (true) {
+    const response = await fetch(`/api/projects/jobs/${encodeURIComponent(jobId)}`);
+    if (!response.ok) {
+      throw new Error(`No se pudo consultar el trabajo ${jobId} (HTTP ${response.status})`);
+    }
+
+    const trabajo = await response.json();
+    const completadas = trabajo.etapas.filter(e => e.estado === "completado").length;
+    console.log(`Trabajo ${jobId}: ${trabajo.estado} (${completadas}/${trabajo.etapas.length}) etapa=${trabajo.etapaActual || '-'}`);
+
+    if (trabajo.estado === "completado" || trabajo.estado === "error") {
+      return trabajo;
+    }
+
+    await new Promise(resolve => setTimeout(resolve, intervaloMs));
+  }
+}
+
 //Obtener fecha actual
 function obtenerFechaHoraActual() {
   const hoy = new Date();
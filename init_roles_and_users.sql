@@ -26,3 +26,6 @@ GRANT SELECT ON pg_roles TO "jherrera@udistrital.edu.co";
 -- Asignar rol configurador
 GRANT rol_configurador TO "jvalero@udistrital.edu.co";
 GRANT rol_configurador TO "jherrera@udistrital.edu.co";
+
+-- Avisar al backend (ROLE_CACHE_NOTIFY=1) para que vacíe la caché de roles del login (solo llega si se ejecuta en la base postgres)
+NOTIFY confiseg_roles;
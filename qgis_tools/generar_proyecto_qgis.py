@@ -19,12 +19,13 @@ backend_init.cargar_env_manual()
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from qgis_tools.qgis_init import inicializar_qgis, finalizar_qgis
-from qgis_tools.qgis_core import generar_proyectos_qgis, dict_to_request
+from qgis_tools.qgis_core import generar_proyectos_qgis, cerrar_pool_qgis
+from qgis_tools.modelo_payload import payload_desde_lista, decodificar
 
 def main():
     print("Entrando a main()", file=sys.stderr)
     if len(sys.argv) != 2:
-        print("Uso: generar_proyecto_qgis.py <ruta_json>", file=sys.stderr)
+        print("Uso: generar_proyecto_qgis.py <ruta_parametros>", file=sys.stderr)
         sys.exit(1)
 
     ruta_json = sys.argv[1]
@@ -34,9 +35,10 @@ def main():
         sys.exit(1)
 
     try:
-        print("Abriendo archivo JSON...", file=sys.stderr)
-        with open(ruta_json, "r", encoding="utf-8") as f:
-            datos = json.load(f)
+        # Parámetros en msgpack o JSON, con el payload en forma posicional
+        print("Abriendo archivo de parámetros...", file=sys.stderr)
+        with open(ruta_json, "rb") as f:
+            datos = decodificar(f.read())
 
         print("Archivo cargado", file=sys.stderr)
         payload_dict = datos["payload"]
@@ -44,7 +46,7 @@ def main():
         grupo_contenedor = datos["grupo_contenedor"]
 
         print("Reconstruyendo objeto ProjectExecutionRequest", file=sys.stderr)
-        payload = dict_to_request(payload_dict)
+        payload = payload_desde_lista(payload_dict)
         print("Reconstrucción exitosa", file=sys.stderr)
 
         inicializar_qgis()
@@ -66,6 +68,7 @@ def main():
         sys.exit(1)
 
     finally:
+        cerrar_pool_qgis()
         finalizar_qgis()
 
 if __name__ == "__main__":
@@ -0,0 +1,59 @@
+# qgis_tools/indice_payload.py
+# Índices del payload de creación, construidos una sola vez por petición.
+# Sin dependencias de FastAPI ni de QGIS: lo usan tanto el backend como los generadores QGIS.
+import os
+
+# Nombre de la tabla ráster (y sufijo de sus segmentaciones) a partir del nombre del archivo
+def nombre_tabla_raster(nombre_imagen: str) -> str:
+    return os.path.splitext(nombre_imagen)[0].lower()
+
+# Esquema de un miembro (usuario del correo en minúsculas)
+def esquema_miembro(miembro) -> str:
+    return miembro.email.split("@")[0].lower()
+
+class IndicePayload:
+    def __init__(self, payload):
+        # Miembros por id
+        self.miembros_por_id = {m.id: m for m in payload.members}
+
+        # Nombre de grupo por groupId (según las segmentaciones de cada ráster)
+        self.grupos_por_id = {}
+        for mapping in payload.rasterGroupMappings:
+            for grupo in mapping.groups:
+                self.grupos_por_id.setdefault(grupo.groupId, grupo.groupName)
+
+        # Esquemas de tutores por groupId, sin repetidos y en orden de aparición
+        self.tutores_por_grupo = {}
+        for rel in payload.memberGroupMappings:
+            miembro = self.miembros_por_id.get(rel.memberId)
+            if miembro and miembro.role == "Tutor":
+                tutores = self.tutores_por_grupo.setdefault(rel.groupId, [])
+                esquema = esquema_miembro(miembro)
+                if esquema not in tutores:
+                    tutores.append(esquema)
+
+        # Mapeos de rásters por nombre de tabla
+        self.rasters_por_tabla = {nombre_tabla_raster(m.imageName): m for m in payload.rasterGroupMappings}
+
+    # Esquemas con tabla de segmentación para un ráster: primero los grupos, luego sus tutores
+    def esquemas_segmentacion(self, mapping_raster) -> list:
+        esquemas = [grupo.groupName.lower() for grupo in mapping_raster.groups]
+        for grupo in mapping_raster.groups:
+            esquemas.extend(self.tutores_por_grupo.get(grupo.groupId, []))
+        return list(dict.fromkeys(esquemas))
+
+    # Esquemas (grupos y tutores) cuyas segmentaciones se cargan en el proyecto de un ráster
+    def esquemas_relevantes(self, mapping_raster) -> list:
+        return sorted(self.esquemas_segmentacion(mapping_raster))
+
+# Índice del payload, reutilizado si ya se construyó para este objeto.
+# El payload se trata como inmutable una vez indexado.
+def indice_payload(payload) -> IndicePayload:
+    indice = getattr(payload, "_indice", None)
+    if indice is None:
+        indice = IndicePayload(payload)
+        try:
+            payload._indice = indice
+        except (AttributeError, ValueError):
+            pass
+    return indice
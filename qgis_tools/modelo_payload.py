@@ -0,0 +1,150 @@
+# qgis_tools/modelo_payload.py
+# Representación compacta del payload de creación, compartida por el backend y los procesos QGIS.
+# Clases con __slots__ (sin __dict__ por instancia) y serialización posicional: msgpack si está
+# instalado, JSON en caso contrario. El formato se detecta al decodificar.
+import struct
+import json
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Versión del formato posicional; cambia si se agregan o reordenan campos
+VERSION_FORMATO = 1
+
+class Segmentacion:
+    __slots__ = ("groupId", "groupName", "segmentacionName")
+
+    def __init__(self, groupId, groupName, segmentacionName):
+        self.groupId = groupId
+        self.groupName = groupName
+        self.segmentacionName = segmentacionName
+
+class RasterGroupMapping:
+    __slots__ = ("servantMap", "imageId", "imageName", "srid", "groups")
+
+    def __init__(self, servantMap, imageId, imageName, srid, groups):
+        self.servantMap = servantMap
+        self.imageId = imageId
+        self.imageName = imageName
+        self.srid = srid
+        self.groups = groups
+
+class MemberGroupMapping:
+    __slots__ = ("memberId", "groupId")
+
+    def __init__(self, memberId, groupId):
+        self.memberId = memberId
+        self.groupId = groupId
+
+class Miembro:
+    __slots__ = ("id", "email", "role", "groupId")
+
+    def __init__(self, id, email, role, groupId=None):
+        self.id = id
+        self.email = email
+        self.role = role
+        self.groupId = groupId
+
+class ProjectExecutionRequest:
+    __slots__ = (
+        "projectName", "studentTutor", "ciafLevel", "numImages", "numGroups", "numMembers",
+        "groupNames", "rasterGroupMappings", "memberGroupMappings", "members", "grupoContenedor",
+        "_indice"
+    )
+
+    def __init__(self, projectName, studentTutor, ciafLevel, numImages, numGroups, numMembers,
+                 groupNames, rasterGroupMappings, memberGroupMappings, members, grupoContenedor):
+        self.projectName = projectName
+        self.studentTutor = studentTutor
+        self.ciafLevel = ciafLevel
+        self.numImages = numImages
+        self.numGroups = numGroups
+        self.numMembers = numMembers
+        self.groupNames = groupNames
+        self.rasterGroupMappings = rasterGroupMappings
+        self.memberGroupMappings = memberGroupMappings
+        self.members = members
+        self.grupoContenedor = grupoContenedor
+        self._indice = None  # ver qgis_tools.indice_payload
+
+# Payload -> lista posicional. Acepta el modelo Pydantic del backend o las clases de este módulo.
+def payload_a_lista(payload) -> list:
+    return [
+        VERSION_FORMATO,
+        payload.projectName,
+        payload.studentTutor,
+        payload.ciafLevel,
+        payload.numImages,
+        payload.numGroups,
+        payload.numMembers,
+        list(payload.groupNames),
+        [
+            [r.servantMap, r.imageId, r.imageName, r.srid,
+             [[g.groupId, g.groupName, g.segmentacionName] for g in r.groups]]
+            for r in payload.rasterGroupMappings
+        ],
+        [[m.memberId, m.groupId] for m in payload.memberGroupMappings],
+        [[m.id, m.email, m.role, m.groupId] for m in payload.members],
+        payload.grupoContenedor,
+    ]
+
+# Lista posicional -> ProjectExecutionRequest
+def payload_desde_lista(datos) -> ProjectExecutionRequest:
+    if datos[0] != VERSION_FORMATO:
+        raise ValueError(f"Versión de payload no soportada: {datos[0]} (se esperaba {VERSION_FORMATO})")
+    (_, nombre, estudiante_tutor, nivel, num_imagenes, num_grupos, num_miembros,
+     grupos, rasters, relaciones, miembros, contenedor) = datos
+    return ProjectExecutionRequest(
+        nombre, estudiante_tutor, nivel, num_imagenes, num_grupos, num_miembros,
+        grupos,
+        [RasterGroupMapping(s, i, n, srid, [Segmentacion(*g) for g in segs]) for s, i, n, srid, segs in rasters],
+        [MemberGroupMapping(*r) for r in relaciones],
+        [Miembro(*m) for m in miembros],
+        contenedor
+    )
+
+# Codecs disponibles en este intérprete (el de QGIS puede no tener msgpack)
+def codecs_disponibles() -> list:
+    return ["msgpack", "json"] if msgpack is not None else ["json"]
+
+def codificar(obj, codec: str = "msgpack") -> bytes:
+    if codec == "msgpack" and msgpack is not None:
+        return msgpack.packb(obj, use_bin_type=True)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+# Los mensajes son siempre mapas o listas: JSON empieza con '{' o '[', msgpack nunca con esos bytes
+def decodificar(datos: bytes):
+    if datos[:1] in (b"{", b"["):
+        return json.loads(datos.decode("utf-8"))
+    if msgpack is None:
+        raise RuntimeError("Mensaje msgpack recibido, pero msgpack no está instalado en este intérprete.")
+    return msgpack.unpackb(datos, raw=False)
+
+def codec_de(datos: bytes) -> str:
+    return "json" if datos[:1] in (b"{", b"[") else "msgpack"
+
+# Tramas con prefijo de longitud (4 bytes, big-endian) sobre un canal binario
+def escribir_trama(canal, datos: bytes):
+    canal.write(struct.pack(">I", len(datos)))
+    canal.write(datos)
+    canal.flush()
+
+def _leer_exacto(canal, n: int):
+    partes = []
+    while n > 0:
+        parte = canal.read(n)
+        if not parte:
+            return None
+        partes.append(parte)
+        n -= len(parte)
+    return b"".join(partes)
+
+# Retorna None si el canal se cerró
+def leer_trama(canal):
+    cabecera = _leer_exacto(canal, 4)
+    if cabecera is None:
+        return None
+    (longitud,) = struct.unpack(">I", cabecera)
+    return _leer_exacto(canal, longitud)
@@ -0,0 +1,163 @@
+# qgis_tools/plantilla_qgs.py
+# Escritura de proyectos .qgz a partir de una plantilla XML, sin el runtime de QGIS.
+# La existencia de las capas se resuelve antes con una consulta al catálogo (ver backend).
+from qgis_tools.indice_payload import indice_payload
+import xml.etree.ElementTree as ET
+import zipfile
+import uuid
+import sys
+import os
+
+VERSION_QGIS_PLANTILLA = "3.28.0-Firenze"
+
+# Esquemas (grupos y tutores) cuyas segmentaciones se cargan en el proyecto de un ráster
+def esquemas_relevantes(payload, mapping_raster) -> list:
+    return indice_payload(payload).esquemas_relevantes(mapping_raster)
+
+def _spatialrefsys(padre, srid):
+    srs = ET.SubElement(padre, "spatialrefsys")
+    ET.SubElement(srs, "authid").text = f"EPSG:{srid}"
+    ET.SubElement(srs, "srid").text = str(srid)
+    return srs
+
+def _extent(padre, extension):
+    nodo = ET.SubElement(padre, "extent")
+    for nombre, valor in zip(("xmin", "ymin", "xmax", "ymax"), extension):
+        ET.SubElement(nodo, nombre).text = repr(float(valor))
+    return nodo
+
+def _maplayer(capas, tipo, id_capa, nombre, fuente, proveedor, srid, extension, geometria=None):
+    atributos = {"type": tipo}
+    if geometria:
+        atributos.update({"geometry": geometria, "wkbType": geometria})
+    capa = ET.SubElement(capas, "maplayer", atributos)
+    if extension:
+        _extent(capa, extension)
+    ET.SubElement(capa, "id").text = id_capa
+    ET.SubElement(capa, "datasource").text = fuente
+    ET.SubElement(capa, "layername").text = nombre
+    _spatialrefsys(ET.SubElement(capa, "srs"), srid)
+    ET.SubElement(capa, "provider").text = proveedor
+    return capa
+
+def _lista(padre, etiqueta, valores):
+    nodo = ET.SubElement(padre, etiqueta, {"type": "QStringList"})
+    for valor in valores:
+        ET.SubElement(nodo, "value").text = str(valor)
+    return nodo
+
+# Propiedades OWS del proyecto para QGIS Server: WMS con título, extensión y CRS;
+# las segmentaciones se publican por WFS y se editan por WFS-T
+def _propiedades_ows(raiz, titulo, srid, extension, ids_vectoriales):
+    propiedades = ET.SubElement(raiz, "properties")
+    ET.SubElement(propiedades, "WMSServiceCapabilities", {"type": "bool"}).text = "true"
+    ET.SubElement(propiedades, "WMSServiceTitle", {"type": "QString"}).text = titulo
+    ET.SubElement(propiedades, "WMSUseLayerIDs", {"type": "bool"}).text = "false"
+    _lista(propiedades, "WMSCrsList", list(dict.fromkeys([f"EPSG:{srid}", "EPSG:4326", "EPSG:3857"])))
+    if extension:
+        _lista(propiedades, "WMSExtent", [repr(float(v)) for v in extension])
+    _lista(propiedades, "WFSLayers", ids_vectoriales)
+    wfst = ET.SubElement(propiedades, "WFSTLayers")
+    for operacion in ("Update", "Insert", "Delete"):
+        _lista(wfst, operacion, ids_vectoriales)
+    return propiedades
+
+# Construye el XML .qgs de un ráster y sus segmentaciones
+def construir_qgs(nombre_raster: str, raster_uri: str, capas_vectoriales: list, srid, extension) -> bytes:
+    raiz = ET.Element("qgis", {"projectname": nombre_raster, "version": VERSION_QGIS_PLANTILLA})
+    ET.SubElement(raiz, "title").text = nombre_raster
+    _spatialrefsys(ET.SubElement(raiz, "projectCrs"), srid)
+
+    arbol = ET.SubElement(raiz, "layer-tree-group")
+    capas = ET.SubElement(raiz, "projectlayers")
+    orden = ET.SubElement(raiz, "layerorder")
+
+    # Las capas vectoriales se dibujan sobre el ráster
+    definiciones = [(nombre, uri, "vector", "postgres", "Polygon") for nombre, uri in capas_vectoriales]
+    if raster_uri:
+        definiciones.append((nombre_raster, raster_uri, "raster", "postgresraster", None))
+
+    ids_vectoriales = []
+    for nombre, uri, tipo, proveedor, geometria in definiciones:
+        id_capa = f"{nombre}_{uuid.uuid4().hex}"
+        if tipo == "vector":
+            ids_vectoriales.append(id_capa)
+        ET.SubElement(arbol, "layer-tree-layer", {
+            "id": id_capa, "name": nombre, "source": uri,
+            "providerKey": proveedor, "checked": "Qt::Checked", "expanded": "1"
+        })
+        _maplayer(capas, tipo, id_capa, nombre, uri, proveedor, srid, extension, geometria)
+        ET.SubElement(orden, "layer", {"id": id_capa})
+
+    if extension:
+        canvas = ET.SubElement(raiz, "mapcanvas", {"name": "theMapCanvas"})
+        _extent(canvas, extension)
+        _spatialrefsys(ET.SubElement(canvas, "destinationsrs"), srid)
+
+    _propiedades_ows(raiz, nombre_raster, srid, extension, ids_vectoriales)
+
+    return b"<!DOCTYPE qgis PUBLIC 'http://mrcc.com/qgis.dtd' 'SYSTEM'>\n" + ET.tostring(raiz, encoding="utf-8")
+
+# Escribe el .qgz (zip con el .qgs) de forma atómica
+def escribir_qgz(ruta_qgz: str, nombre_raster: str, contenido_qgs: bytes):
+    temporal = f"{ruta_qgz}.tmp"
+    with zipfile.ZipFile(temporal, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(f"{nombre_raster}.qgs", contenido_qgs)
+    os.replace(temporal, ruta_qgz)
+
+# Genera los .qgz de todos los rásters del payload.
+#   tablas_existentes: {(esquema, tabla)} según information_schema
+#   metadatos_raster:  {tabla_raster: (srid, (xmin, ymin, xmax, ymax))} según raster_columns
+def generar_proyectos_qgs(payload, nombre_db, grupo_contenedor, tablas_existentes: set, metadatos_raster: dict) -> list:
+    resultados = []
+    db_user = os.getenv("DB_USER")
+    db_pass = os.getenv("DB_PASSWORD")
+    db_host = os.getenv("DB_HOST", "localhost")
+    db_port = os.getenv("DB_PORT", "5432")
+
+    conn_info = (
+        f"host={db_host} port={db_port} dbname='{nombre_db}' user={db_user} password={db_pass}"
+    )
+
+    host = os.getenv("QGIS_SERVER_HOST", "localhost")
+    port = os.getenv("QGIS_SERVER_PORT", "80")
+    dev_base = os.getenv("QGIS_PROJECTS_DEV_PATH", "C:/proyectos/dev_qgis_projects")
+    nombre_proyecto = payload.projectName.lower()
+
+    for mapping_raster in payload.rasterGroupMappings:
+        nombre_raster = os.path.splitext(mapping_raster.imageName)[0].lower()
+        carpeta_raster = os.path.join(dev_base, nombre_proyecto, nombre_raster)
+        os.makedirs(carpeta_raster, exist_ok=True)
+        ruta_qgz = os.path.join(carpeta_raster, f"{nombre_raster}.qgz")
+
+        srid, extension = metadatos_raster.get(nombre_raster, (mapping_raster.srid, None))
+
+        raster_uri = None
+        if (grupo_contenedor.lower(), nombre_raster) in tablas_existentes:
+            raster_uri = (
+                f"dbname='{nombre_db}' host={db_host} port={db_port} user={db_user} password={db_pass} "
+                f"table=\"{grupo_contenedor}\".\"{nombre_raster}\" (rast)"
+            )
+        else:
+            print(f"Capa ráster NO encontrada en el catálogo: {grupo_contenedor}.{nombre_raster}", file=sys.stderr)
+
+        capas_vectoriales = []
+        for esquema in esquemas_relevantes(payload, mapping_raster):
+            tabla_segmentacion = f"{esquema}_{nombre_raster}"
+            if (esquema, tabla_segmentacion) not in tablas_existentes:
+                continue
+            vector_uri = (
+                f"{conn_info} sslmode=disable key='id' srid={srid} type=Polygon "
+                f"table=\"{esquema}\".\"{tabla_segmentacion}\" (geom)"
+            )
+            capas_vectoriales.append((tabla_segmentacion, vector_uri))
+
+        escribir_qgz(ruta_qgz, nombre_raster, construir_qgs(nombre_raster, raster_uri, capas_vectoriales, srid, extension))
+        servant_map = f"https://{host}:{port}/cgi-bin/Segmentations/{nombre_proyecto}/{nombre_raster}/qgis_mapserv.fcgi"
+
+        resultados.append({
+            "imagen": mapping_raster.imageName,
+            "servantMap": servant_map
+        })
+
+    return resultados
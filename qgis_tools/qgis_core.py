@@ -1,72 +1,48 @@
 # qgis_tools/qgis_core.py
 import os
 import sys
-import uuid
+import multiprocessing
 from qgis.core import QgsProject, QgsRasterLayer, QgsVectorLayer
-
-# Construcción de clases nativas
-class Segmentacion:
-    def __init__(self, groupId, groupName, segmentacionName):
-        self.groupId = groupId
-        self.groupName = groupName
-        self.segmentacionName = segmentacionName
-
-class RasterGroupMapping:
-    def __init__(self, servantMap, imageId, imageName, srid, groups):
-        self.servantMap = servantMap
-        self.imageId = imageId
-        self.imageName = imageName
-        self.srid = srid
-        self.groups = groups
-
-class MemberGroupMapping:
-    def __init__(self, memberId, groupId):
-        self.memberId = memberId
-        self.groupId = groupId
-
-class Miembro:
-    def __init__(self, id, email, role, groupId=None):
-        self.id = id
-        self.email = email
-        self.role = role
-        self.groupId = groupId
-
-class ProjectExecutionRequest:
-    def __init__(self, projectName, studentTutor, ciafLevel, numImages, numGroups, numMembers,
-                 groupNames, rasterGroupMappings, memberGroupMappings, members, grupoContenedor):
-        self.projectName = projectName
-        self.studentTutor = studentTutor
-        self.ciafLevel = ciafLevel
-        self.numImages = numImages
-        self.numGroups = numGroups
-        self.numMembers = numMembers
-        self.groupNames = groupNames
-        self.rasterGroupMappings = rasterGroupMappings
-        self.memberGroupMappings = memberGroupMappings
-        self.members = members
-        self.grupoContenedor = grupoContenedor
-
-# Conversión diccionario a ProjectExecutionRequest
-def dict_to_request(d):
-    return ProjectExecutionRequest(
-        d["projectName"],
-        d["studentTutor"],
-        d["ciafLevel"],
-        d["numImages"],
-        d["numGroups"],
-        d["numMembers"],
-        d["groupNames"],
-        [RasterGroupMapping(rgm["servantMap"], rgm["imageId"], rgm["imageName"], rgm.get("srid"), [
-            Segmentacion(g["groupId"], g["groupName"], g["segmentacionName"]) for g in rgm["groups"]
-        ]) for rgm in d["rasterGroupMappings"]],
-        [MemberGroupMapping(m["memberId"], m["groupId"]) for m in d["memberGroupMappings"]],
-        [Miembro(m["id"], m["email"], m["role"], m.get("groupId")) for m in d["members"]],
-        d["grupoContenedor"]
-    )
-
-# Lógica de generación QGIS
-def generar_proyectos_qgis(payload, nombre_db, grupo_contenedor):
-    resultados = []
+from qgis_tools.indice_payload import indice_payload
+
+# Pool de procesos QGIS reutilizado entre llamadas (QGIS_PROJECT_WORKERS > 1)
+_pool_qgis = None
+_pool_qgis_workers = 0
+
+def _inicializar_worker_qgis():
+    # stdout puede ser el canal de protocolo del proceso padre: los mensajes van a stderr
+    sys.stdout = sys.stderr
+    from qgis_tools.qgis_init import inicializar_qgis
+    inicializar_qgis()
+
+def _obtener_pool_qgis(workers):
+    global _pool_qgis, _pool_qgis_workers
+    if _pool_qgis is None or _pool_qgis_workers != workers:
+        if _pool_qgis is not None:
+            _pool_qgis.terminate()
+        # spawn: Qt/QGIS no son seguros tras un fork
+        contexto = multiprocessing.get_context("spawn")
+        _pool_qgis = contexto.Pool(processes=workers, initializer=_inicializar_worker_qgis)
+        _pool_qgis_workers = workers
+    return _pool_qgis
+
+def cerrar_pool_qgis():
+    global _pool_qgis, _pool_qgis_workers
+    if _pool_qgis is not None:
+        _pool_qgis.close()
+        _pool_qgis.join()
+        _pool_qgis = None
+        _pool_qgis_workers = 0
+
+def _workers_qgis(num_rasters):
+    try:
+        workers = int(os.getenv("QGIS_PROJECT_WORKERS", "1"))
+    except ValueError:
+        workers = 1
+    return max(1, min(workers, num_rasters))
+
+# Genera el proyecto .qgz de un ráster con un QgsProject independiente
+def generar_proyecto_raster(payload, mapping_raster, nombre_db, grupo_contenedor):
     db_user = os.getenv("DB_USER")
     db_pass = os.getenv("DB_PASSWORD")
     db_host = os.getenv("DB_HOST", "localhost")
@@ -79,60 +55,68 @@ def generar_proyectos_qgis(payload, nombre_db, grupo_contenedor):
     host = os.getenv("QGIS_SERVER_HOST", "localhost")
     port = os.getenv("QGIS_SERVER_PORT", "80")
 
-    for mapping_raster in payload.rasterGroupMappings:
-        nombre_raster = os.path.splitext(mapping_raster.imageName)[0].lower()
-        nombre_proyecto = payload.projectName.lower()
+    nombre_raster = os.path.splitext(mapping_raster.imageName)[0].lower()
+    nombre_proyecto = payload.projectName.lower()
 
-        dev_base = os.getenv("QGIS_PROJECTS_DEV_PATH", "C:/proyectos/dev_qgis_projects")
-        carpeta_raster = os.path.join(dev_base, nombre_proyecto, nombre_raster)
-        os.makedirs(carpeta_raster, exist_ok=True)
-        ruta_qgz = os.path.join(carpeta_raster, f"{nombre_raster}.qgz")
+    dev_base = os.getenv("QGIS_PROJECTS_DEV_PATH", "C:/proyectos/dev_qgis_projects")
+    carpeta_raster = os.path.join(dev_base, nombre_proyecto, nombre_raster)
+    os.makedirs(carpeta_raster, exist_ok=True)
+    ruta_qgz = os.path.join(carpeta_raster, f"{nombre_raster}.qgz")
 
-        if os.path.exists(ruta_qgz):
-            os.remove(ruta_qgz)
+    if os.path.exists(ruta_qgz):
+        os.remove(ruta_qgz)
 
-        proyecto = QgsProject.instance()
-        proyecto.clear()
+    proyecto = QgsProject()
 
-        raster_uri = (
-            f"dbname='{nombre_db}' host={db_host} port={db_port} user={db_user} password={db_pass} "
-            f"table=\"{grupo_contenedor}\".\"{nombre_raster}\" (rast)"
+    raster_uri = (
+        f"dbname='{nombre_db}' host={db_host} port={db_port} user={db_user} password={db_pass} "
+        f"table=\"{grupo_contenedor}\".\"{nombre_raster}\" (rast)"
+    )
+    # El proveedor lee raster_overviews al abrir la capa: las pirámides o_<factor>_<tabla>
+    # registradas en la importación se usan solas al renderizar escalas alejadas
+    capa_raster = QgsRasterLayer(raster_uri, nombre_raster, "postgresraster")
+
+    if capa_raster.isValid():
+        proyecto.addMapLayer(capa_raster)
+    
+    else:
+        print(f"Capa ráster NO válida: {nombre_raster}", file=sys.stderr)
+        print(f"URI usada: {raster_uri}", file=sys.stderr)
+
+    for esquema in indice_payload(payload).esquemas_relevantes(mapping_raster):
+        tabla_segmentacion = f"{esquema}_{nombre_raster}"
+        vector_uri = (
+            f"{conn_info} sslmode=disable key='id' type=Polygon "
+            f"table=\"{esquema}\".\"{tabla_segmentacion}\" (geom)"
         )
-        capa_raster = QgsRasterLayer(raster_uri, nombre_raster, "postgresraster")
-
-        if capa_raster.isValid():
-            proyecto.addMapLayer(capa_raster)
-        
-        else:
-            print(f"Capa ráster NO válida: {nombre_raster}", file=sys.stderr)
-            print(f"URI usada: {raster_uri}", file=sys.stderr)
-
-        esquemas_relevantes = set()
-        for grupo in mapping_raster.groups:
-            esquemas_relevantes.add(grupo.groupName)
-            for rel in payload.memberGroupMappings:
-                if rel.groupId == grupo.groupId:
-                    miembro = next((m for m in payload.members if m.id == rel.memberId and m.role == "Tutor"), None)
-                    if miembro:
-                        esquemas_relevantes.add(miembro.email.split("@")[0].lower())
-
-        for esquema in esquemas_relevantes:
-            tabla_segmentacion = f"{esquema}_{nombre_raster}"
-            vector_uri = (
-                f"{conn_info} sslmode=disable key='id' type=Polygon "
-                f"table=\"{esquema}\".\"{tabla_segmentacion}\" (geom)"
-            )
-            capa_vector = QgsVectorLayer(vector_uri, tabla_segmentacion, "postgres")
-
-            if capa_vector.isValid():
-                proyecto.addMapLayer(capa_vector)
-
-        proyecto.write(ruta_qgz)
-        servant_map = f"https://{host}:{port}/cgi-bin/Segmentations/{nombre_proyecto}/{nombre_raster}/qgis_mapserv.fcgi"
-
-        resultados.append({
-            "imagen": mapping_raster.imageName,
-            "servantMap": servant_map
-        })
-
-    return resultados
+        capa_vector = QgsVectorLayer(vector_uri, tabla_segmentacion, "postgres")
+
+        if capa_vector.isValid():
+            proyecto.addMapLayer(capa_vector)
+
+    proyecto.write(ruta_qgz)
+    servant_map = f"https://{host}:{port}/cgi-bin/Segmentations/{nombre_proyecto}/{nombre_raster}/qgis_mapserv.fcgi"
+
+    return {
+        "imagen": mapping_raster.imageName,
+        "servantMap": servant_map
+    }
+
+def _generar_proyecto_raster_args(args):
+    return generar_proyecto_raster(*args)
+
+# Lógica de generación QGIS: un proyecto por ráster, en paralelo si QGIS_PROJECT_WORKERS > 1
+def generar_proyectos_qgis(payload, nombre_db, grupo_contenedor):
+    rasters = payload.rasterGroupMappings
+    indice_payload(payload)  # se construye una vez y viaja con el payload a los workers
+    workers = _workers_qgis(len(rasters))
+
+    if workers == 1:
+        return [generar_proyecto_raster(payload, mapping_raster, nombre_db, grupo_contenedor) for mapping_raster in rasters]
+
+    # map conserva el orden de rasterGroupMappings
+    pool = _obtener_pool_qgis(workers)
+    return pool.map(
+        _generar_proyecto_raster_args,
+        [(payload, mapping_raster, nombre_db, grupo_contenedor) for mapping_raster in rasters]
+    )
@@ -0,0 +1,67 @@
+#qgis_tools/qgis_worker.py
+# Proceso QGIS de larga duración: inicializa QgsApplication una sola vez y atiende
+# trabajos de generación recibidos por stdin, una trama por trabajo (ver qgis_tools/modelo_payload.py).
+#   Trama:     4 bytes de longitud (big-endian) + mensaje msgpack o JSON
+#   Saludo:    {"id": null, "ok": true, "listo": true, "codecs": [...]}  (siempre JSON)
+#   Petición:  {"id": "...", "payload": [...posicional...], "nombre_db": "...", "grupo_contenedor": "..."}
+#   Respuesta: {"id": "...", "ok": true, "resultado": [...]} | {"id": "...", "ok": false, "error": "..."}
+#   La respuesta usa el mismo codec que la petición.
+import sys
+import os
+
+# Cargar variables de entorno desde .env sin usar dotenv
+import importlib.util
+
+# Ruta absoluta al archivo backend/__init__.py
+ruta_backend_init = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend", "__init__.py"))
+spec = importlib.util.spec_from_file_location("backend_init", ruta_backend_init)
+backend_init = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(backend_init)
+
+# Ejecutar función cargar_env_manual
+backend_init.cargar_env_manual()
+
+# Ajustar ruta para importar núcleo de QGIS
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from qgis_tools.qgis_init import inicializar_qgis, finalizar_qgis
+from qgis_tools.qgis_core import generar_proyectos_qgis, cerrar_pool_qgis
+from qgis_tools.modelo_payload import (
+    payload_desde_lista, codecs_disponibles, codificar, decodificar, codec_de, escribir_trama, leer_trama
+)
+
+def responder(canal, respuesta: dict, codec: str):
+    escribir_trama(canal, codificar(respuesta, codec))
+
+def main():
+    # stdout queda reservado al protocolo; cualquier print (incluido QGIS) va a stderr
+    canal = sys.stdout.buffer
+    entrada = sys.stdin.buffer
+    sys.stdout = sys.stderr
+
+    inicializar_qgis()
+    responder(canal, {"id": None, "ok": True, "listo": True, "codecs": codecs_disponibles()}, "json")
+
+    try:
+        while True:
+            trama = leer_trama(entrada)
+            if trama is None:
+                break
+
+            id_trabajo = None
+            codec = codec_de(trama)
+            try:
+                datos = decodificar(trama)
+                id_trabajo = datos.get("id")
+                payload = payload_desde_lista(datos["payload"])
+                resultado = generar_proyectos_qgis(payload, datos["nombre_db"], datos["grupo_contenedor"])
+                responder(canal, {"id": id_trabajo, "ok": True, "resultado": resultado}, codec)
+            except Exception as e:
+                print(f"Error en trabajo {id_trabajo}: {e}", file=sys.stderr)
+                responder(canal, {"id": id_trabajo, "ok": False, "error": str(e)}, codec)
+    finally:
+        cerrar_pool_qgis()
+        finalizar_qgis()
+
+if __name__ == "__main__":
+    main()
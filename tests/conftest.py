@@ -0,0 +1,6 @@
+# tests/conftest.py
+import sys
+import os
+
+# Los módulos se importan como paquetes desde la raíz del repositorio (backend.*, qgis_tools.*)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
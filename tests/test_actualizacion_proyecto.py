@@ -0,0 +1,82 @@
+# tests/test_actualizacion_proyecto.py
+import asyncio
+import json
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("rasterio")
+
+from backend.routers import projects
+from backend.routers.projects import ProjectExecutionRequest, diferencias_proyecto, plan_miembros_y_roles
+
+NOMBRE = "proyecto_20260101_120000"
+
+# Estado actual del proyecto: imagen_1 importada, segmentada por grupo_a y configurada
+TABLAS = {("rasters", "imagen_1"), ("grupo_a", "grupo_a_imagen_1"), ("rasters", "parametros_configuracion")}
+CONFIGURADAS = {"imagen_1"}
+
+def _payload(rasters=("imagen_1",), miembros=()):
+    grupos = {"imagen_1": ("g1", "grupo_a"), "imagen_2": ("g2", "grupo_b")}
+    return ProjectExecutionRequest(
+        projectName=NOMBRE, studentTutor="no", ciafLevel=1,
+        numImages=len(rasters), numGroups=2, numMembers=1 + len(miembros),
+        groupNames=["grupo_a", "grupo_b"],
+        rasterGroupMappings=[
+            {"servantMap": r, "imageId": r, "imageName": f"{r}.tif", "srid": "3116",
+             "groups": [{"groupId": grupos[r][0], "groupName": grupos[r][1], "segmentacionName": r}]}
+            for r in rasters
+        ],
+        memberGroupMappings=[{"memberId": "u1", "groupId": "g1"}] + [{"memberId": m["id"], "groupId": "g1"} for m in miembros],
+        members=[{"id": "u1", "email": "ana@x.co", "role": "Estudiante", "groupId": "g1"}] + list(miembros),
+        grupoContenedor="rasters",
+    )
+
+def _nombres(mapeos) -> list:
+    return [m.imageName for m in mapeos]
+
+def test_sin_cambios():
+    assert diferencias_proyecto(_payload(), "rasters", TABLAS, CONFIGURADAS) == ([], [])
+
+def test_raster_nuevo():
+    nuevos, afectados = diferencias_proyecto(_payload(("imagen_1", "imagen_2")), "Rasters", TABLAS, CONFIGURADAS)
+    assert _nombres(nuevos) == ["imagen_2.tif"]
+    assert _nombres(afectados) == ["imagen_2.tif"]
+
+def test_estudiante_nuevo_solo_cambia_roles():
+    estudiante = {"id": "u2", "email": "beto@x.co", "role": "Estudiante", "groupId": "g1"}
+    payload = _payload(miembros=[estudiante])
+    nuevos, afectados = diferencias_proyecto(payload, "rasters", TABLAS, CONFIGURADAS)
+    assert (nuevos, afectados) == ([], [])
+
+    # Los permisos sobre tablas se limitan a los rásters afectados (ninguno); la membresía sí se otorga
+    sentencias = plan_miembros_y_roles(payload, NOMBRE, "20260101_120000", afectados)
+    assert 'GRANT "grupo_a_20260101_120000" TO "beto@x.co";' in sentencias
+    assert not any(" ON rasters." in s or " ON grupo_a." in s for s in sentencias)
+
+def test_tutor_nuevo_afecta_sus_rasters():
+    tutor = {"id": "t1", "email": "tutora@x.co", "role": "Tutor"}
+    nuevos, afectados = diferencias_proyecto(_payload(miembros=[tutor]), "rasters", TABLAS, CONFIGURADAS)
+    # Falta tutora.tutora_imagen_1: hay que crearla y regenerar el proyecto QGIS de imagen_1
+    assert nuevos == [] and _nombres(afectados) == ["imagen_1.tif"]
+
+def test_raster_sin_configuracion():
+    nuevos, afectados = diferencias_proyecto(_payload(), "rasters", TABLAS, set())
+    assert nuevos == [] and _nombres(afectados) == ["imagen_1.tif"]
+
+def _respuesta(coro):
+    respuesta = asyncio.run(coro)
+    return respuesta.status_code, json.loads(respuesta.body)
+
+def test_patch_valida_el_nombre(monkeypatch):
+    def no_consultar(nombre_db):
+        raise AssertionError("No debe consultarse la base con un nombre inválido")
+    monkeypatch.setattr(projects, "existe_base_de_datos", no_consultar)
+
+    payload = _payload().model_copy(update={"projectName": "otro; DROP DATABASE x"})
+    codigo, cuerpo = _respuesta(projects.update_project("otro; DROP DATABASE x", payload))
+    assert codigo == 400 and not cuerpo["success"]
+
+def test_patch_proyecto_inexistente(monkeypatch):
+    monkeypatch.setattr(projects, "existe_base_de_datos", lambda nombre_db: False)
+    codigo, _ = _respuesta(projects.update_project(NOMBRE, _payload()))
+    assert codigo == 404
@@ -0,0 +1,139 @@
+# tests/test_bitacora.py
+import asyncio
+import json
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("rasterio")
+
+from fastapi import HTTPException
+from backend.bitacora import BitacoraProyecto
+from backend.trabajos import Trabajo
+from backend.routers import projects
+from backend.routers.projects import ProjectExecutionRequest, etapa_con_bitacora, huella_de_payload, tras_fallo_creacion
+
+NOMBRE = "proyecto_20260101_120000"
+
+@pytest.fixture(autouse=True)
+def carpetas(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROJECT_JOURNAL_DIR", str(tmp_path / "bitacoras"))
+    monkeypatch.setenv("PROJECT_JOB_DIR", str(tmp_path / "trabajos"))
+
+@pytest.fixture
+def revertidos(monkeypatch):
+    llamadas = []
+    monkeypatch.setattr(projects, "revertir_proyecto_fallido", llamadas.append)
+    return llamadas
+
+def _payload(srid: str = "3116") -> ProjectExecutionRequest:
+    return ProjectExecutionRequest(
+        projectName=NOMBRE, studentTutor="no", ciafLevel=1,
+        numImages=1, numGroups=1, numMembers=1,
+        groupNames=["grupo_a"],
+        rasterGroupMappings=[{"servantMap": "imagen_1", "imageId": "imagen_1", "imageName": "imagen_1.tif", "srid": srid,
+                              "groups": [{"groupId": "g1", "groupName": "grupo_a", "segmentacionName": "imagen_1"}]}],
+        memberGroupMappings=[{"memberId": "u1", "groupId": "g1"}],
+        members=[{"id": "u1", "email": "ana@x.co", "role": "Estudiante", "groupId": "g1"}],
+        grupoContenedor="rasters",
+    )
+
+def _respuesta(coro):
+    respuesta = asyncio.run(coro)
+    return respuesta.status_code, json.loads(respuesta.body)
+
+def test_etapa_se_registra_y_se_omite_al_reanudar():
+    llamadas = []
+    def crear_esquemas(nombre_db):
+        llamadas.append(nombre_db)
+        return {"esquemas": ["rasters"]}
+
+    bitacora = BitacoraProyecto(NOMBRE)
+    bitacora.iniciar("huella")
+    assert etapa_con_bitacora(Trabajo(["esquemas"]), bitacora, "esquemas", crear_esquemas, NOMBRE) == {"esquemas": ["rasters"]}
+
+    # Otra ejecución lee la bitácora desde disco: no repite la etapa y reutiliza su resultado
+    trabajo = Trabajo(["esquemas"])
+    resultado = etapa_con_bitacora(trabajo, BitacoraProyecto(NOMBRE), "esquemas", crear_esquemas, NOMBRE)
+    assert resultado == {"esquemas": ["rasters"]}
+    assert llamadas == [NOMBRE]
+    assert trabajo.etapas[0]["estado"] == "completado"
+    assert trabajo.etapas[0]["detalle"] == "completada en una ejecución anterior"
+
+def test_etapa_fallida_no_se_registra():
+    def fallar(nombre_db):
+        raise RuntimeError("sin conexión")
+
+    bitacora = BitacoraProyecto(NOMBRE)
+    bitacora.iniciar("huella")
+    trabajo = Trabajo(["extensiones"])
+    with pytest.raises(RuntimeError):
+        etapa_con_bitacora(trabajo, bitacora, "extensiones", fallar, NOMBRE)
+    assert not bitacora.completado("extensiones")
+    assert trabajo.etapas[0]["estado"] == "error"
+
+def test_fallo_revierte_por_defecto(monkeypatch, revertidos):
+    monkeypatch.delenv("PROJECT_ROLLBACK_ON_ERROR", raising=False)
+    bitacora = BitacoraProyecto(NOMBRE)
+    bitacora.iniciar("huella")
+    bitacora.marcar("base_de_datos")
+
+    assert tras_fallo_creacion(NOMBRE, bitacora) is False
+    assert revertidos == [NOMBRE]
+    assert not bitacora.existe()
+
+def test_fallo_conserva_para_reanudar(monkeypatch, revertidos):
+    monkeypatch.setenv("PROJECT_ROLLBACK_ON_ERROR", "0")
+    bitacora = BitacoraProyecto(NOMBRE)
+    bitacora.iniciar("huella")
+    bitacora.marcar("base_de_datos")
+
+    assert tras_fallo_creacion(NOMBRE, bitacora) is True
+    assert revertidos == [] and bitacora.existe()
+
+    # Sin pasos completados no hay desde dónde reanudar
+    bitacora.iniciar("huella")
+    assert tras_fallo_creacion(NOMBRE, bitacora) is False
+    assert not bitacora.existe()
+
+def test_resume_rechaza_otro_payload(monkeypatch):
+    def no_lanzar(*args, **kwargs):
+        raise AssertionError("No debe lanzarse la reanudación")
+    monkeypatch.setattr(projects, "lanzar_trabajo", no_lanzar)
+
+    codigo, _ = _respuesta(projects.resume_project(NOMBRE, _payload()))
+    assert codigo == 404
+
+    bitacora = BitacoraProyecto(NOMBRE)
+    bitacora.iniciar(huella_de_payload(_payload()))
+    bitacora.marcar("base_de_datos")
+    codigo, cuerpo = _respuesta(projects.resume_project(NOMBRE, _payload(srid="9377")))
+    assert codigo == 409 and not cuerpo["success"]
+
+def test_resume_ignora_el_upload_id(monkeypatch):
+    lanzados = []
+    class TrabajoFalso:
+        id, estado = "abc", "pendiente"
+    def lanzar(funcion, etapas, *args, descripcion=""):
+        lanzados.append(args)
+        return TrabajoFalso()
+    monkeypatch.setattr(projects, "lanzar_trabajo", lanzar)
+    monkeypatch.setattr(projects, "resolver_espacio", lambda payload: None)
+
+    BitacoraProyecto(NOMBRE).iniciar(huella_de_payload(_payload()))
+    payload = _payload().model_copy(update={"uploadId": "otra_carga"})
+    codigo, cuerpo = _respuesta(projects.resume_project(NOMBRE, payload))
+    assert codigo == 202 and cuerpo["jobId"] == "abc"
+    assert lanzados[0][-1] is True
+
+def test_rollback_explicito(revertidos):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(projects.rollback_project(NOMBRE))
+    assert error.value.status_code == 404
+
+    bitacora = BitacoraProyecto(NOMBRE)
+    bitacora.iniciar("huella")
+    bitacora.marcar("base_de_datos")
+    respuesta = asyncio.run(projects.rollback_project(NOMBRE))
+    assert respuesta["success"]
+    assert revertidos == [NOMBRE]
+    assert not bitacora.existe()
@@ -0,0 +1,110 @@
+# tests/test_cache_roles.py
+from contextlib import contextmanager
+import pytest
+
+pytest.importorskip("psycopg2")
+
+from backend.database import cache_roles as modulo
+from backend.database.cache_roles import CacheRoles, CANAL_ROLES
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def __call__(self):
+        return self.ahora
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = Reloj()
+    monkeypatch.setattr(modulo.time, "monotonic", reloj)
+    return reloj
+
+def test_positivos_duran_el_ttl(reloj):
+    cache = CacheRoles(ttl=60, capacidad=10, ttl_negativo=5)
+    cache.guardar("rol", "ana", True)
+    reloj.ahora += 59
+    assert cache.obtener("rol", "ana") is True
+    reloj.ahora += 2
+    assert cache.obtener("rol", "ana") is None
+
+def test_negativos_duran_poco(reloj):
+    cache = CacheRoles(ttl=60, capacidad=10, ttl_negativo=5)
+    cache.guardar("rol", "ana", False)
+    assert cache.obtener("rol", "ana") is False
+    reloj.ahora += 6
+    assert cache.obtener("rol", "ana") is None
+
+def test_negativos_sin_cache(reloj):
+    cache = CacheRoles(ttl=60, capacidad=10)
+    cache.guardar("rol", "ana", False)
+    assert cache.obtener("rol", "ana") is None
+
+    # El TTL negativo nunca supera al positivo; con TTL 0 no se guarda nada
+    cache = CacheRoles(ttl=0, capacidad=10, ttl_negativo=5)
+    cache.guardar("rol", "ana", True)
+    cache.guardar("rol", "beto", False)
+    assert cache.obtener("rol", "ana") is None and cache.obtener("rol", "beto") is None
+
+def test_desalojo_lru(reloj):
+    cache = CacheRoles(ttl=60, capacidad=2)
+    cache.guardar("rol", "ana", True)
+    cache.guardar("rol", "beto", True)
+    cache.obtener("rol", "ana")
+    cache.guardar("rol", "carla", True)
+
+    assert cache.obtener("rol", "beto") is None
+    assert cache.obtener("rol", "ana") is True and cache.obtener("rol", "carla") is True
+
+class Cursor:
+    def __init__(self, enviados):
+        self.enviados = enviados
+
+    def execute(self, sentencia, parametros=None):
+        self.enviados.append((sentencia, parametros))
+
+    def close(self):
+        pass
+
+class Conexion:
+    def __init__(self):
+        self.enviados = []
+        self.confirmada = False
+
+    def cursor(self):
+        return Cursor(self.enviados)
+
+    def commit(self):
+        self.confirmada = True
+
+@pytest.fixture
+def conexiones(monkeypatch):
+    abiertas = {}
+
+    @contextmanager
+    def conexion(dbname="postgres"):
+        abiertas[dbname] = Conexion()
+        yield abiertas[dbname]
+
+    monkeypatch.setattr(modulo, "conexion", conexion)
+    return abiertas
+
+def test_notificar_en_la_base_postgres(monkeypatch, conexiones):
+    monkeypatch.setenv("ROLE_CACHE_NOTIFY", "1")
+    modulo.cache_roles.guardar("rol", "ana", True)
+
+    modulo.notificar_cambio_roles()
+
+    assert modulo.cache_roles.obtener("rol", "ana") is None
+    assert list(conexiones) == ["postgres"]
+    assert conexiones["postgres"].enviados == [("SELECT pg_notify(%s, 'invalidar')", (CANAL_ROLES,))]
+    assert conexiones["postgres"].confirmada
+
+def test_notificar_sin_escucha(monkeypatch, conexiones):
+    monkeypatch.setenv("ROLE_CACHE_NOTIFY", "0")
+    modulo.cache_roles.guardar("rol", "ana", True)
+
+    modulo.notificar_cambio_roles()
+
+    assert modulo.cache_roles.obtener("rol", "ana") is None
+    assert conexiones == {}
@@ -0,0 +1,98 @@
+# tests/test_cargador_nativo.py
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("rasterio")
+pytest.importorskip("psycopg2")
+
+from affine import Affine
+from backend.rasters.cargador_nativo import tesela_a_wkb, tesela_outdb_a_wkb, nodata_de_banda
+
+# Tesela 2x2 de una banda 8BUI (nodata 0), SRID 4326, píxel de 1 unidad y esquina superior izquierda en (0, 10):
+# salida de "raster2pgsql -Y -s 4326 -t 2x2" para ese archivo (WKB en hexadecimal de la columna rast)
+WKB_RASTER2PGSQL = (
+    "01"                    # little endian
+    "0000"                  # versión 0
+    "0100"                  # 1 banda
+    "000000000000F03F"      # scaleX = 1
+    "000000000000F0BF"      # scaleY = -1
+    "0000000000000000"      # ipX = 0
+    "0000000000002440"      # ipY = 10
+    "0000000000000000"      # skewX = 0
+    "0000000000000000"      # skewY = 0
+    "E6100000"              # SRID 4326
+    "0200"                  # ancho 2
+    "0200"                  # alto 2
+    "44"                    # 8BUI con nodata
+    "00"                    # nodata = 0
+    "01020304"              # píxeles por filas
+)
+
+TRANSFORMACION = Affine(1.0, 0.0, 0.0, 0.0, -1.0, 10.0)
+
+def _hex(partes) -> str:
+    return b"".join(bytes(p) for p in partes).hex().upper()
+
+def test_tesela_coincide_con_raster2pgsql():
+    datos = np.array([[[1, 2], [3, 4]]], dtype="uint8")
+    assert _hex(tesela_a_wkb(datos, TRANSFORMACION, 4326, [0])) == WKB_RASTER2PGSQL
+
+def test_banda_sin_nodata_no_marca_bandera():
+    datos = np.array([[[1, 2], [3, 4]]], dtype="uint8")
+    wkb = _hex(tesela_a_wkb(datos, TRANSFORMACION, 4326, [None]))
+    # Misma cabecera; bandera 0x04 y nodata en 0
+    assert wkb == WKB_RASTER2PGSQL[:-12] + "04" + "00" + "01020304"
+
+def test_banda_16_bits_en_little_endian():
+    datos = np.array([[[1, 256]]], dtype=">u2")
+    wkb = _hex(tesela_a_wkb(datos, TRANSFORMACION, 4326, [65535]))
+    assert wkb.endswith("46" + "FFFF" + "0100" + "0001")
+
+def test_tipo_no_soportado():
+    datos = np.zeros((1, 1, 1), dtype="complex64")
+    with pytest.raises(ValueError):
+        tesela_a_wkb(datos, TRANSFORMACION, 4326, [None])
+
+def test_tesela_outdb_referencia_archivo_y_banda():
+    wkb = _hex(tesela_outdb_a_wkb(TRANSFORMACION, 2, 2, 4326, ["uint8"], [0], b"/datos/a.tif"))
+    # Cabecera igual a la in-db; la banda lleva la bandera out-db (0x80), número de banda 0 y la ruta terminada en nulo
+    assert wkb == WKB_RASTER2PGSQL[:-12] + "C4" + "00" + "00" + b"/datos/a.tif\0".hex().upper()
+
+@pytest.mark.parametrize("nodata, dtype, esperado", [
+    (-9999, "uint16", 0),
+    (70000, "uint16", 65535),
+    (-9999, "int8", -128),
+    (300.0, "uint8", 255),
+    (float("nan"), "int16", None),
+    (1e40, "float32", float(np.finfo(np.float32).max)),
+    (-9999, "float32", -9999),
+    (None, "uint8", None),
+])
+def test_nodata_ajustado_al_tipo(nodata, dtype, esperado):
+    assert nodata_de_banda(nodata, dtype) == esperado
+
+def test_nodata_nan_en_flotantes_se_conserva():
+    assert np.isnan(nodata_de_banda(float("nan"), "float64"))
+
+def test_tesela_con_nodata_fuera_de_rango():
+    datos = np.array([[[1, 256]]], dtype="uint16")
+    assert _hex(tesela_a_wkb(datos, TRANSFORMACION, 4326, [-9999])).endswith("46" + "0000" + "0100" + "0001")
+    # NaN en una banda entera: la banda queda sin nodata
+    assert _hex(tesela_a_wkb(datos, TRANSFORMACION, 4326, [float("nan")])).endswith("06" + "0000" + "0100" + "0001")
+
+def test_filas_copy_desde_archivo(tmp_path):
+    import rasterio
+    from backend.rasters.cargador_nativo import generar_filas_copy
+
+    ruta = tmp_path / "banda.tif"
+    perfil = {"driver": "GTiff", "width": 3, "height": 2, "count": 1, "dtype": "int16",
+              "crs": "EPSG:4326", "transform": TRANSFORMACION, "nodata": -9999}
+    with rasterio.open(ruta, "w", **perfil) as dst:
+        dst.write(np.arange(6, dtype="int16").reshape(1, 2, 3))
+
+    filas = list(generar_filas_copy(str(ruta), 4326, tamano_tesela=(2, 2)))
+    assert len(filas) == 2
+    wkb, nombre = filas[0].rstrip(b"\n").split(b"\t")
+    assert nombre == b"banda.tif"
+    # Primera tesela 2x2: bandera 16BSI con nodata (0x45) y nodata -9999
+    assert wkb.upper().endswith(b"45" + b"F1D8" + b"0000" + b"0100" + b"0300" + b"0400")
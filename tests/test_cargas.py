@@ -0,0 +1,167 @@
+# tests/test_cargas.py
+import hashlib
+import os
+import time
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi import HTTPException
+from backend import cargas
+
+CONTENIDO = b"II*\x00" + bytes(range(256)) * 8
+SHA_CONTENIDO = hashlib.sha256(CONTENIDO).hexdigest()
+
+@pytest.fixture(autouse=True)
+def almacen(tmp_path, monkeypatch):
+    monkeypatch.setenv("TEMP_UPLOAD_DIR", str(tmp_path / "cargas"))
+    monkeypatch.setenv("TIFF_STORE_DIR", str(tmp_path / "almacen"))
+    return tmp_path / "almacen"
+
+def _rutas(sesion):
+    return cargas._rutas_sesion(sesion["sessionId"])
+
+def test_bloques_por_offset_y_finalizacion():
+    sesion = cargas.crear_sesion("banda_1.tif", len(CONTENIDO), SHA_CONTENIDO)
+    assert sesion["offset"] == 0 and not sesion["completa"]
+
+    estado = cargas.escribir_bloque(sesion["sessionId"], 0, CONTENIDO[:1000])
+    assert estado["offset"] == 1000
+
+    # Un reintento del mismo bloque no se duplica: el servidor indica dónde continuar
+    with pytest.raises(HTTPException) as error:
+        cargas.escribir_bloque(sesion["sessionId"], 0, CONTENIDO[:1000])
+    assert error.value.status_code == 409
+
+    with pytest.raises(HTTPException) as error:
+        cargas.escribir_bloque(sesion["sessionId"], 1000, CONTENIDO[1000:] + b"x")
+    assert error.value.status_code == 400
+
+    cargas.escribir_bloque(sesion["sessionId"], 1000, CONTENIDO[1000:])
+    resultado = cargas.finalizar_sesion(sesion["sessionId"])
+
+    assert resultado == {"nombre": "banda_1.tif", "bytes": len(CONTENIDO), "sha256": SHA_CONTENIDO}
+    with open(cargas.ruta_blob(SHA_CONTENIDO), "rb") as f:
+        assert f.read() == CONTENIDO
+    assert not any(os.path.exists(r) for r in _rutas(sesion))
+
+def test_finalizar_incompleta_o_hash_distinto():
+    sesion = cargas.crear_sesion("banda_1.tif", len(CONTENIDO), "0" * 64)
+    cargas.escribir_bloque(sesion["sessionId"], 0, CONTENIDO[:10])
+    with pytest.raises(HTTPException) as error:
+        cargas.finalizar_sesion(sesion["sessionId"])
+    assert error.value.status_code == 409
+
+    cargas.escribir_bloque(sesion["sessionId"], 10, CONTENIDO[10:])
+    with pytest.raises(HTTPException) as error:
+        cargas.finalizar_sesion(sesion["sessionId"])
+    assert error.value.status_code == 422
+    assert not cargas.existe_blob("0" * 64)
+
+def test_contenido_existente_no_requiere_bytes():
+    ruta = cargas.ruta_blob(SHA_CONTENIDO)
+    os.makedirs(os.path.dirname(ruta))
+    with open(ruta, "wb") as f:
+        f.write(CONTENIDO)
+
+    sesion = cargas.crear_sesion("banda_1.tif", len(CONTENIDO), SHA_CONTENIDO.upper())
+    assert sesion["completa"] and sesion["offset"] == len(CONTENIDO)
+    assert cargas.escribir_bloque(sesion["sessionId"], 0, b"ignorado")["completa"]
+
+def test_finalizar_deduplicada_elimina_parte():
+    sesion = cargas.crear_sesion("banda_1.tif", len(CONTENIDO), SHA_CONTENIDO)
+    cargas.escribir_bloque(sesion["sessionId"], 0, CONTENIDO[:100])
+
+    # Otra sesión con el mismo contenido termina antes
+    otra = cargas.crear_sesion("banda_2.tif", len(CONTENIDO), SHA_CONTENIDO)
+    cargas.escribir_bloque(otra["sessionId"], 0, CONTENIDO)
+    cargas.finalizar_sesion(otra["sessionId"])
+
+    resultado = cargas.finalizar_sesion(sesion["sessionId"])
+    assert resultado["sha256"] == SHA_CONTENIDO
+    assert not any(os.path.exists(r) for r in _rutas(sesion))
+
+def _blob_antiguo(contenido: bytes) -> str:
+    sha256 = hashlib.sha256(contenido).hexdigest()
+    ruta = cargas.ruta_blob(sha256)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, "wb") as f:
+        f.write(contenido)
+    antiguo = time.time() - 30 * 86400
+    os.utime(ruta, (antiguo, antiguo))
+    return sha256
+
+def test_purgar_almacen_conserva_referenciados(almacen):
+    huerfano = _blob_antiguo(b"huerfano")
+    en_espacio = _blob_antiguo(b"en espacio")
+    en_sesion = _blob_antiguo(b"en sesion")
+    reciente = hashlib.sha256(b"reciente").hexdigest()
+    os.makedirs(os.path.dirname(cargas.ruta_blob(reciente)), exist_ok=True)
+    open(cargas.ruta_blob(reciente), "wb").close()
+
+    metadatos = almacen / "metadatos" / f"{huerfano}.json"
+    cog = almacen / "cog" / huerfano[:2] / f"{huerfano}.tif"
+    for derivado in (metadatos, cog):
+        derivado.parent.mkdir(parents=True, exist_ok=True)
+        derivado.write_bytes(b"{}")
+
+    espacio = cargas.EspacioTrabajo(cargas.uuid.uuid4().hex)
+    os.makedirs(espacio.ruta)
+    espacio.registrar_archivo("banda_1.tif", en_espacio)
+    sesion_json, _ = cargas._rutas_sesion(cargas.uuid.uuid4().hex)
+    with open(sesion_json, "w") as f:
+        f.write('{"sha256": "%s"}' % en_sesion)
+
+    cargas.purgar_almacen(forzar=True)
+
+    assert not os.path.exists(cargas.ruta_blob(huerfano))
+    assert not metadatos.exists() and not cog.exists()
+    for sha256 in (en_espacio, en_sesion, reciente):
+        assert os.path.exists(cargas.ruta_blob(sha256))
+
+def test_purgar_almacen_desactivada(monkeypatch):
+    monkeypatch.setenv("TIFF_STORE_TTL", "0")
+    huerfano = _blob_antiguo(b"huerfano")
+    cargas.purgar_almacen(forzar=True)
+    assert os.path.exists(cargas.ruta_blob(huerfano))
+
+def _envejecer(*rutas):
+    antiguo = time.time() - 30 * 86400
+    for ruta in rutas:
+        if os.path.exists(ruta):
+            os.utime(ruta, (antiguo, antiguo))
+
+def test_purga_de_sesiones_por_ultima_actividad(monkeypatch):
+    monkeypatch.setenv("UPLOAD_SESSION_TTL", "3600")
+    activa = cargas.crear_sesion("banda_1.tif", len(CONTENIDO), SHA_CONTENIDO)
+    cargas.escribir_bloque(activa["sessionId"], 0, CONTENIDO[:10])
+    abandonada = cargas.crear_sesion("banda_2.tif", len(CONTENIDO), SHA_CONTENIDO)
+    cargas.escribir_bloque(abandonada["sessionId"], 0, CONTENIDO[:10])
+
+    # La activa se creó hace mucho, pero acaba de recibir un bloque (.parte reciente)
+    json_activa, parte_activa = _rutas(activa)
+    _envejecer(json_activa, json_activa[:-len(".json")] + ".lock")
+    json_abandonada, parte_abandonada = _rutas(abandonada)
+    _envejecer(json_abandonada, parte_abandonada, json_abandonada[:-len(".json")] + ".lock")
+
+    cargas._purgar_sesiones()
+
+    assert os.path.exists(json_activa) and os.path.exists(parte_activa)
+    assert not any(os.path.exists(json_abandonada[:-len(".json")] + e) for e in (".json", ".parte", ".lock"))
+    assert cargas.escribir_bloque(activa["sessionId"], 10, CONTENIDO[10:20])["offset"] == 20
+
+def test_purga_respeta_sesiones_bloqueadas(monkeypatch):
+    monkeypatch.setenv("UPLOAD_SESSION_TTL", "3600")
+    sesion = cargas.crear_sesion("banda_1.tif", len(CONTENIDO), SHA_CONTENIDO)
+    cargas.escribir_bloque(sesion["sessionId"], 0, CONTENIDO[:10])
+    ruta_json, ruta_parte = _rutas(sesion)
+    ruta_lock = ruta_json[:-len(".json")] + ".lock"
+    _envejecer(ruta_json, ruta_parte, ruta_lock)
+
+    with cargas._bloqueo_sesion(sesion["sessionId"]) as obtenido:
+        assert obtenido
+        cargas._purgar_sesiones()
+        assert all(os.path.exists(r) for r in (ruta_json, ruta_parte, ruta_lock))
+
+    cargas._purgar_sesiones()
+    assert not any(os.path.exists(r) for r in (ruta_json, ruta_parte, ruta_lock))
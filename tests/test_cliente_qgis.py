@@ -0,0 +1,119 @@
+# tests/test_cliente_qgis.py
+import os
+import sys
+import time
+import textwrap
+import pytest
+
+from backend.cliente_qgis import ClienteWorkerQgis
+from qgis_tools import modelo_payload
+from qgis_tools.modelo_payload import (
+    ProjectExecutionRequest, codecs_disponibles
+)
+
+# Worker falso con el protocolo de qgis_tools/qgis_worker.py, sin QGIS.
+# Anota en bitacora el codec de cada petición; "colgar" en nombre_db no responde nunca y
+# "morir" termina el proceso la primera vez (marca en disco).
+WORKER_FALSO = textwrap.dedent('''
+    import os, sys, time
+    sys.path.insert(0, {raiz!r})
+    from qgis_tools import modelo_payload
+    from qgis_tools.modelo_payload import codificar, decodificar, codec_de, escribir_trama, leer_trama, payload_desde_lista
+
+    codecs = {codecs!r}
+    if "msgpack" not in codecs:
+        modelo_payload.msgpack = None
+    canal, entrada = sys.stdout.buffer, sys.stdin.buffer
+    escribir_trama(canal, codificar({{"id": None, "ok": True, "listo": True, "codecs": codecs}}, "json"))
+    with open({bitacora!r}, "a") as f:
+        f.write("inicio\\n")
+    while True:
+        trama = leer_trama(entrada)
+        if trama is None:
+            break
+        datos = decodificar(trama)
+        with open({bitacora!r}, "a") as f:
+            f.write(codec_de(trama) + "\\n")
+        if datos["nombre_db"] == "colgar":
+            time.sleep(60)
+        if datos["nombre_db"] == "morir" and not os.path.exists({marca!r}):
+            open({marca!r}, "w").close()
+            sys.exit(1)
+        payload = payload_desde_lista(datos["payload"])
+        escribir_trama(canal, codificar({{"id": datos["id"], "ok": True, "resultado": [payload.projectName, datos["nombre_db"]]}}, codec_de(trama)))
+''')
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _payload():
+    return ProjectExecutionRequest("proyecto", "no", 1, 0, 0, 0, [], [], [], [], "rasters")
+
+@pytest.fixture
+def crear_cliente(tmp_path):
+    clientes = []
+
+    def crear(codecs=("msgpack", "json"), timeout_trabajo=10.0):
+        script = tmp_path / "worker_falso.py"
+        script.write_text(WORKER_FALSO.format(
+            raiz=RAIZ,
+            codecs=list(codecs), bitacora=str(tmp_path / "bitacora"), marca=str(tmp_path / "murio")
+        ))
+        cliente = ClienteWorkerQgis(sys.executable, str(script), timeout_inicio=10.0, timeout_trabajo=timeout_trabajo)
+        clientes.append(cliente)
+        return cliente
+
+    yield crear
+    for cliente in clientes:
+        cliente.detener()
+
+def _bitacora(tmp_path) -> list:
+    return (tmp_path / "bitacora").read_text().split()
+
+def test_codec_negociado_msgpack(crear_cliente, tmp_path):
+    if "msgpack" not in codecs_disponibles():
+        pytest.skip("msgpack no está instalado")
+    cliente = crear_cliente()
+    assert cliente.generar(_payload(), "db_1", "rasters") == ["proyecto", "db_1"]
+    assert cliente._codec == "msgpack"
+    assert _bitacora(tmp_path) == ["inicio", "msgpack"]
+
+def test_codec_json_si_el_worker_no_tiene_msgpack(crear_cliente, tmp_path):
+    cliente = crear_cliente(codecs=("json",))
+    cliente.generar(_payload(), "db_1", "rasters")
+    assert cliente._codec == "json"
+    assert _bitacora(tmp_path) == ["inicio", "json"]
+
+def test_codec_json_si_el_backend_no_tiene_msgpack(crear_cliente, tmp_path, monkeypatch):
+    monkeypatch.setattr(modelo_payload, "msgpack", None)
+    cliente = crear_cliente()
+    cliente.generar(_payload(), "db_1", "rasters")
+    assert cliente._codec == "json"
+
+def test_proceso_reutilizado_entre_trabajos(crear_cliente, tmp_path):
+    cliente = crear_cliente()
+    cliente.generar(_payload(), "db_1", "rasters")
+    pid = cliente._proceso.pid
+    cliente.generar(_payload(), "db_2", "rasters")
+    assert cliente._proceso.pid == pid
+    assert _bitacora(tmp_path).count("inicio") == 1
+
+def test_worker_caido_se_reinicia_y_reintenta(crear_cliente, tmp_path):
+    cliente = crear_cliente()
+    assert cliente.generar(_payload(), "morir", "rasters") == ["proyecto", "morir"]
+    assert _bitacora(tmp_path).count("inicio") == 2
+
+def test_timeout_mata_y_relanza_el_worker(crear_cliente, tmp_path):
+    cliente = crear_cliente(timeout_trabajo=0.5)
+    cliente.precalentar()
+    colgado = cliente._proceso
+
+    with pytest.raises(TimeoutError):
+        cliente.generar(_payload(), "colgar", "rasters")
+    assert colgado.poll() is not None
+
+    for _ in range(100):
+        if cliente._activo():
+            break
+        time.sleep(0.05)
+    assert cliente._activo() and cliente._proceso is not colgado
+    assert cliente.generar(_payload(), "db_1", "rasters") == ["proyecto", "db_1"]
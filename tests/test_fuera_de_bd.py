@@ -0,0 +1,50 @@
+# tests/test_fuera_de_bd.py
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi import HTTPException
+from backend.rasters.fuera_de_bd import puede_habilitar_outdb, habilitar_outdb
+
+class CursorFalso:
+    def __init__(self, superusuario: bool, version: int, privilegio_set: bool = False):
+        self.respuestas = {"is_superuser": (superusuario, version), "has_parameter_privilege": (privilegio_set,)}
+        self.ejecutadas = []
+        self._ultima = None
+
+    def execute(self, consulta, parametros=None):
+        self.ejecutadas.append((consulta, parametros))
+        self._ultima = next((r for clave, r in self.respuestas.items() if clave in consulta), None)
+
+    def fetchone(self):
+        return self._ultima
+
+def _alter(cur) -> list:
+    return [c for c, _ in cur.ejecutadas if c.startswith("ALTER DATABASE")]
+
+def test_superusuario():
+    cur = CursorFalso(superusuario=True, version=140000)
+    habilitar_outdb(cur, "proyecto_x")
+    assert _alter(cur) == [
+        "ALTER DATABASE proyecto_x SET postgis.enable_outdb_rasters = true;",
+        "ALTER DATABASE proyecto_x SET postgis.gdal_enabled_drivers = 'GTiff';",
+    ]
+    # Solo parámetros de la base: nada de SET de sesión sobre una conexión del pool
+    assert not any(c.startswith("SET") for c, _ in cur.ejecutadas)
+
+def test_sin_privilegios_falla_antes_de_alterar():
+    cur = CursorFalso(superusuario=False, version=140000)
+    with pytest.raises(HTTPException) as error:
+        habilitar_outdb(cur, "proyecto_x")
+    assert "superusuario" in error.value.detail
+    assert _alter(cur) == []
+    # Antes de PostgreSQL 15 no existe has_parameter_privilege
+    assert not any("has_parameter_privilege" in c for c, _ in cur.ejecutadas)
+
+def test_grant_set_on_parameter():
+    cur = CursorFalso(superusuario=False, version=160000, privilegio_set=True)
+    assert puede_habilitar_outdb(cur)
+    assert cur.ejecutadas[-1][1] == (["postgis.enable_outdb_rasters", "postgis.gdal_enabled_drivers"],)
+
+    cur = CursorFalso(superusuario=False, version=160000, privilegio_set=False)
+    assert not puede_habilitar_outdb(cur)
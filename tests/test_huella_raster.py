@@ -0,0 +1,29 @@
+# tests/test_huella_raster.py
+import pytest
+
+pytest.importorskip("rasterio")
+shapely_wkt = pytest.importorskip("shapely.wkt")
+pytest.importorskip("fastapi")
+
+from backend.rasters.metadatos import huella_wkt, srid_desde_metadatos
+
+def test_huella_desde_bounds_conocidos():
+    wkt = huella_wkt({"bounds": [1000.0, 2000.0, 1040.0, 2020.0]})
+    assert wkt.startswith("POLYGON")
+
+    huella = shapely_wkt.loads(wkt)
+    assert huella.bounds == (1000.0, 2000.0, 1040.0, 2020.0)
+    assert huella.area == 40.0 * 20.0
+    # Anillo cerrado de 4 vértices, como ST_Envelope
+    coordenadas = list(huella.exterior.coords)
+    assert len(coordenadas) == 5 and coordenadas[0] == coordenadas[-1]
+    assert set(coordenadas) == {(1000.0, 2000.0), (1040.0, 2000.0), (1040.0, 2020.0), (1000.0, 2020.0)}
+
+@pytest.mark.parametrize("epsg, geografico, esperado", [
+    (3116, False, "3116"),
+    (4326, True, "4326"),
+    (None, True, "4326"),
+    (None, False, None),
+])
+def test_srid_desde_metadatos(epsg, geografico, esperado):
+    assert srid_desde_metadatos({"epsg": epsg, "es_geografico": geografico}) == esperado
@@ -0,0 +1,64 @@
+# tests/test_indice_payload.py
+from types import SimpleNamespace
+
+from qgis_tools.indice_payload import IndicePayload, indice_payload, nombre_tabla_raster, esquema_miembro
+
+def _payload():
+    grupo = lambda id_grupo, nombre: SimpleNamespace(groupId=id_grupo, groupName=nombre)
+    miembro = lambda id_miembro, email, rol: SimpleNamespace(id=id_miembro, email=email, role=rol)
+    relacion = lambda id_miembro, id_grupo: SimpleNamespace(memberId=id_miembro, groupId=id_grupo)
+    return SimpleNamespace(
+        members=[
+            miembro("u1", "ana@x.co", "Estudiante"),
+            miembro("t1", "Tutor.Uno@x.co", "Tutor"),
+            miembro("t2", "tutor_dos@x.co", "Tutor"),
+        ],
+        rasterGroupMappings=[
+            SimpleNamespace(imageName="Imagen_1.TIF", groups=[grupo("g1", "Grupo_A"), grupo("g2", "grupo_b")]),
+            SimpleNamespace(imageName="imagen_2.tif", groups=[grupo("g2", "otro_nombre")]),
+        ],
+        memberGroupMappings=[
+            relacion("u1", "g1"),
+            relacion("t1", "g1"),
+            relacion("t1", "g1"),
+            relacion("t2", "g1"),
+            relacion("t1", "g2"),
+            relacion("desconocido", "g2"),
+        ],
+    )
+
+def test_nombres_derivados():
+    assert nombre_tabla_raster("Imagen_1.TIF") == "imagen_1"
+    assert esquema_miembro(SimpleNamespace(email="Tutor.Uno@x.co")) == "tutor.uno"
+
+def test_indices():
+    indice = IndicePayload(_payload())
+
+    assert set(indice.miembros_por_id) == {"u1", "t1", "t2"}
+    # El primer nombre de cada groupId es el que vale
+    assert indice.grupos_por_id == {"g1": "Grupo_A", "g2": "grupo_b"}
+    # Solo tutores, sin repetidos y en orden de aparición
+    assert indice.tutores_por_grupo == {"g1": ["tutor.uno", "tutor_dos"], "g2": ["tutor.uno"]}
+    assert list(indice.rasters_por_tabla) == ["imagen_1", "imagen_2"]
+
+def test_esquemas_segmentacion():
+    payload = _payload()
+    indice = IndicePayload(payload)
+    imagen_1, imagen_2 = payload.rasterGroupMappings
+
+    assert indice.esquemas_segmentacion(imagen_1) == ["grupo_a", "grupo_b", "tutor.uno", "tutor_dos"]
+    assert indice.esquemas_segmentacion(imagen_2) == ["otro_nombre", "tutor.uno"]
+    assert indice.esquemas_relevantes(imagen_1) == ["grupo_a", "grupo_b", "tutor.uno", "tutor_dos"]
+
+def test_indice_se_reutiliza_por_payload():
+    payload = _payload()
+    assert indice_payload(payload) is indice_payload(payload)
+    assert indice_payload(_payload()) is not indice_payload(payload)
+
+def test_indice_sin_atributos_asignables():
+    class Congelado:
+        __slots__ = ("members", "rasterGroupMappings", "memberGroupMappings")
+
+    payload = Congelado()
+    payload.members, payload.rasterGroupMappings, payload.memberGroupMappings = [], [], []
+    assert isinstance(indice_payload(payload), IndicePayload)
@@ -0,0 +1,65 @@
+# tests/test_mantenimiento.py
+import pytest
+
+pytest.importorskip("psycopg2")
+
+from backend.database.mantenimiento import (
+    LONGITUD_MAXIMA_IDENTIFICADOR, fillfactor_segmentaciones, opciones_tabla_segmentacion,
+    nombre_indice, sentencias_indices_segmentacion, consultar_tablas_segmentacion
+)
+
+def test_fillfactor_acotado(monkeypatch):
+    monkeypatch.setenv("SEGMENTATION_FILLFACTOR", "70")
+    assert fillfactor_segmentaciones() == 70
+    monkeypatch.setenv("SEGMENTATION_FILLFACTOR", "5")
+    assert fillfactor_segmentaciones() == 10
+    monkeypatch.setenv("SEGMENTATION_FILLFACTOR", "x")
+    assert fillfactor_segmentaciones() == 85
+
+def test_opciones_tabla(monkeypatch):
+    monkeypatch.delenv("SEGMENTATION_FILLFACTOR", raising=False)
+    monkeypatch.setenv("SEGMENTATION_AUTOVACUUM_SCALE", "0.1")
+    monkeypatch.delenv("SEGMENTATION_AUTOANALYZE_SCALE", raising=False)
+    assert opciones_tabla_segmentacion() == (
+        "fillfactor = 85, autovacuum_vacuum_scale_factor = 0.1, autovacuum_analyze_scale_factor = 0.02"
+    )
+
+def test_nombre_indice_dentro_del_limite():
+    assert nombre_indice("grupo_a_imagen_1", "geom_gist") == "grupo_a_imagen_1_geom_gist"
+
+    larga_1 = "grupo_" + "a" * 60 + "_imagen_1"
+    larga_2 = "grupo_" + "a" * 60 + "_imagen_2"
+    nombre_1 = nombre_indice(larga_1, "id_ciaf_2n")
+    nombre_2 = nombre_indice(larga_2, "id_ciaf_2n")
+    assert len(nombre_1) <= LONGITUD_MAXIMA_IDENTIFICADOR
+    assert nombre_1.endswith("_id_ciaf_2n")
+    # Tablas que comparten el prefijo recortado no chocan
+    assert nombre_1 != nombre_2
+    assert nombre_indice(larga_1, "id_ciaf_2n") == nombre_1
+
+def test_sentencias_indices(monkeypatch):
+    monkeypatch.setenv("SEGMENTATION_FILLFACTOR", "90")
+    assert sentencias_indices_segmentacion("grupo_a", "grupo_a_imagen_1", ["ciaf_2", "id_ciaf_2n"]) == [
+        "CREATE INDEX IF NOT EXISTS grupo_a_imagen_1_geom_gist ON grupo_a.grupo_a_imagen_1 USING gist (geom) WITH (fillfactor = 90);",
+        "CREATE INDEX IF NOT EXISTS grupo_a_imagen_1_ciaf_2 ON grupo_a.grupo_a_imagen_1 (ciaf_2) WITH (fillfactor = 90);",
+        "CREATE INDEX IF NOT EXISTS grupo_a_imagen_1_id_ciaf_2n ON grupo_a.grupo_a_imagen_1 (id_ciaf_2n) WITH (fillfactor = 90);",
+    ]
+
+class CursorFalso:
+    def __init__(self, filas):
+        self.filas = filas
+        self.sentencia = None
+
+    def execute(self, sentencia):
+        self.sentencia = sentencia
+
+    def fetchall(self):
+        return self.filas
+
+def test_consulta_limitada_a_segmentaciones():
+    cur = CursorFalso([("grupo_a", "grupo_a_imagen_1", ["ciaf_1", "id_ciaf_1n"])])
+    assert consultar_tablas_segmentacion(cur) == [("grupo_a", "grupo_a_imagen_1", ["ciaf_1", "id_ciaf_1n"])]
+
+    sentencia = " ".join(cur.sentencia.split())
+    assert "JOIN information_schema.columns" in sentencia and "LEFT JOIN" not in sentencia
+    assert "left(g.f_table_name, length(g.f_table_schema) + 1) = g.f_table_schema || '_'" in sentencia
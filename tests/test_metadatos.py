@@ -0,0 +1,83 @@
+# tests/test_metadatos.py
+import hashlib
+import pytest
+
+np = pytest.importorskip("numpy")
+rasterio = pytest.importorskip("rasterio")
+pytest.importorskip("shapely")
+pytest.importorskip("fastapi")
+
+from affine import Affine
+from backend.rasters import metadatos
+from backend.rasters.metadatos import CacheMetadatos, obtener_metadatos, extraer_metadatos, leer_metadatos
+
+SHA_1 = hashlib.sha256(b"uno").hexdigest()
+SHA_2 = hashlib.sha256(b"dos").hexdigest()
+SHA_3 = hashlib.sha256(b"tres").hexdigest()
+
+@pytest.fixture(autouse=True)
+def almacen(tmp_path, monkeypatch):
+    monkeypatch.setenv("TIFF_STORE_DIR", str(tmp_path / "almacen"))
+    monkeypatch.setattr(metadatos, "cache_metadatos", CacheMetadatos())
+    return tmp_path / "almacen"
+
+def _tiff(ruta, crs="EPSG:3116", nodata=0, dtype="uint8"):
+    perfil = {"driver": "GTiff", "width": 4, "height": 2, "count": 2, "dtype": dtype, "crs": crs,
+              "transform": Affine(10.0, 0.0, 1000.0, 0.0, -10.0, 2020.0), "nodata": nodata}
+    with rasterio.open(ruta, "w", **perfil) as dst:
+        dst.write(np.zeros((2, 2, 4), dtype=dtype))
+    return str(ruta)
+
+def test_leer_metadatos(tmp_path):
+    datos = leer_metadatos(_tiff(tmp_path / "a.tif"))
+    assert datos["epsg"] == 3116 and not datos["es_geografico"]
+    assert datos["bounds"] == [1000.0, 2000.0, 1040.0, 2020.0]
+    assert (datos["ancho"], datos["alto"], datos["bandas"], datos["dtype"], datos["nodata"]) == (4, 2, 2, "uint8", 0)
+
+def test_cache_memoria_y_disco(almacen):
+    cache = CacheMetadatos()
+    assert cache.obtener(SHA_1) is None
+    cache.guardar(SHA_1, {"epsg": 3116})
+    assert cache.obtener(SHA_1) == {"epsg": 3116}
+    assert (almacen / "metadatos" / f"{SHA_1}.json").exists()
+
+    # Otro proceso (caché en memoria vacía) la lee del disco
+    assert CacheMetadatos().obtener(SHA_1) == {"epsg": 3116}
+
+def test_cache_desaloja_la_menos_usada(almacen):
+    cache = CacheMetadatos(capacidad=2)
+    cache.guardar(SHA_1, {"n": 1})
+    cache.guardar(SHA_2, {"n": 2})
+    cache.obtener(SHA_1)
+    cache.guardar(SHA_3, {"n": 3})
+    assert list(cache._memoria) == [SHA_1, SHA_3]
+
+    # Lo desalojado de memoria sigue en disco y vuelve a memoria al pedirlo
+    assert cache.obtener(SHA_2) == {"n": 2}
+    assert list(cache._memoria) == [SHA_3, SHA_2]
+
+def test_obtener_metadatos_usa_la_cache(tmp_path, monkeypatch):
+    ruta = _tiff(tmp_path / "a.tif")
+    lecturas = []
+    leer = metadatos.leer_metadatos
+    monkeypatch.setattr(metadatos, "leer_metadatos", lambda r: lecturas.append(r) or leer(r))
+
+    primera = obtener_metadatos(ruta, SHA_1)
+    assert obtener_metadatos(ruta, SHA_1) == primera
+    assert lecturas == [ruta]
+
+    # Sin hash válido no hay caché
+    obtener_metadatos(ruta, None)
+    obtener_metadatos(ruta, "no-es-un-hash")
+    assert len(lecturas) == 3
+
+def test_extraer_metadatos_en_paralelo(tmp_path):
+    resultado = extraer_metadatos({
+        "a.tif": (_tiff(tmp_path / "a.tif"), SHA_1),
+        "b.tif": (_tiff(tmp_path / "b.tif", crs="EPSG:4326"), None),
+        "roto.tif": (str(tmp_path / "no_existe.tif"), None),
+    })
+    assert resultado["a.tif"]["epsg"] == 3116
+    assert resultado["b.tif"]["epsg"] == 4326
+    assert "error" in resultado["roto.tif"]
+    assert extraer_metadatos({}) == {}
@@ -0,0 +1,79 @@
+# tests/test_metricas.py
+import pytest
+
+from backend import metricas
+from backend.metricas import Contador, Histograma, exponer_metricas
+
+@pytest.fixture(autouse=True)
+def registro(monkeypatch):
+    # Cada prueba expone solo las métricas que crea
+    monkeypatch.setattr(metricas, "_registro", [])
+
+def test_contador_con_etiquetas():
+    contador = Contador("prueba_total", "Eventos de prueba", ("via",))
+    contador.inc(via="sesion")
+    contador.inc(2, via="sesion")
+    contador.inc(via="multipart")
+
+    assert exponer_metricas() == (
+        "# HELP prueba_total Eventos de prueba\n"
+        "# TYPE prueba_total counter\n"
+        'prueba_total{via="multipart"} 1\n'
+        'prueba_total{via="sesion"} 3\n'
+    )
+
+def test_contador_sin_etiquetas_ni_valores():
+    Contador("vacio_total", "Sin eventos")
+    contador = Contador("simple_total", "Sin etiquetas")
+    contador.inc()
+
+    assert exponer_metricas().splitlines() == [
+        "# HELP vacio_total Sin eventos",
+        "# TYPE vacio_total counter",
+        "# HELP simple_total Sin etiquetas",
+        "# TYPE simple_total counter",
+        "simple_total 1",
+    ]
+
+def test_histograma_cubetas_acumuladas():
+    histograma = Histograma("prueba_segundos", "Duración de prueba", ("etapa",), cubetas=(1, 0.5, 5))
+    for valor in (0.2, 0.5, 0.7, 3, 100):
+        histograma.observar(valor, etapa="a")
+
+    assert histograma.exponer() == [
+        "# HELP prueba_segundos Duración de prueba",
+        "# TYPE prueba_segundos histogram",
+        'prueba_segundos_bucket{etapa="a",le="0.5"} 2',
+        'prueba_segundos_bucket{etapa="a",le="1"} 3',
+        'prueba_segundos_bucket{etapa="a",le="5"} 4',
+        'prueba_segundos_bucket{etapa="a",le="+Inf"} 5',
+        'prueba_segundos_sum{etapa="a"} 104.4',
+        'prueba_segundos_count{etapa="a"} 5',
+    ]
+
+def test_histograma_sin_etiquetas():
+    histograma = Histograma("simple_segundos", "Sin etiquetas", cubetas=(1,))
+    histograma.observar(2)
+    assert histograma.exponer()[2:] == [
+        'simple_segundos_bucket{le="1"} 0',
+        'simple_segundos_bucket{le="+Inf"} 1',
+        "simple_segundos_sum 2.0",
+        "simple_segundos_count 1",
+    ]
+
+def test_medir_registra_aunque_falle():
+    histograma = Histograma("medido_segundos", "Medición", ("etapa",), cubetas=(60,))
+    with pytest.raises(RuntimeError):
+        with histograma.medir(etapa="falla"):
+            raise RuntimeError("error")
+    assert 'medido_segundos_count{etapa="falla"} 1' in histograma.exponer()
+
+def test_escape_de_etiquetas():
+    contador = Contador("escape_total", "Escape", ("comando",))
+    contador.inc(comando='psql "-c"\\n\nfin')
+    contador.inc(otra="ignorada")
+
+    lineas = contador.exponer()
+    assert 'escape_total{comando="psql \\"-c\\"\\\\n\\nfin"} 1' in lineas
+    # Las etiquetas no declaradas se ignoran y las faltantes quedan vacías
+    assert 'escape_total{comando=""} 1' in lineas
@@ -0,0 +1,96 @@
+# tests/test_modelo_payload.py
+import io
+import pytest
+
+from qgis_tools import modelo_payload
+from qgis_tools.modelo_payload import (
+    Segmentacion, RasterGroupMapping, MemberGroupMapping, Miembro, ProjectExecutionRequest,
+    payload_a_lista, payload_desde_lista, codificar, decodificar, codec_de, codecs_disponibles,
+    escribir_trama, leer_trama, VERSION_FORMATO
+)
+
+def _payload():
+    return ProjectExecutionRequest(
+        "proyecto_prueba", "no", 2, 1, 2, 2,
+        ["grupo_a", "grupo_b"],
+        [RasterGroupMapping("m1", "i1", "imagen_1.tif", "3116", [
+            Segmentacion("g1", "grupo_a", "s1"), Segmentacion("g2", "grupo_b", "s2")
+        ])],
+        [MemberGroupMapping("u1", "g1"), MemberGroupMapping("t1", "g2")],
+        [Miembro("u1", "niño@x.co", "Estudiante", "g1"), Miembro("t1", "tutor@x.co", "Tutor")],
+        "rasters"
+    )
+
+def test_ida_y_vuelta_de_la_lista():
+    lista = payload_a_lista(_payload())
+    assert lista[0] == VERSION_FORMATO
+
+    payload = payload_desde_lista(lista)
+    assert payload.projectName == "proyecto_prueba" and payload.ciafLevel == 2
+    assert payload.rasterGroupMappings[0].groups[1].groupName == "grupo_b"
+    assert payload.members[1].groupId is None
+    assert payload_a_lista(payload) == lista
+
+def test_version_desconocida():
+    lista = payload_a_lista(_payload())
+    lista[0] = VERSION_FORMATO + 1
+    with pytest.raises(ValueError):
+        payload_desde_lista(lista)
+
+def test_acepta_el_modelo_pydantic():
+    pytest.importorskip("fastapi")
+    pytest.importorskip("rasterio")
+    from backend.routers.projects import ProjectExecutionRequest as ModeloPydantic
+
+    lista = payload_a_lista(_payload())
+    modelo = ModeloPydantic(
+        projectName="proyecto_prueba", studentTutor="no", ciafLevel=2, numImages=1, numGroups=2, numMembers=2,
+        groupNames=["grupo_a", "grupo_b"],
+        rasterGroupMappings=[{"servantMap": "m1", "imageId": "i1", "imageName": "imagen_1.tif", "srid": "3116",
+                              "groups": [{"groupId": "g1", "groupName": "grupo_a", "segmentacionName": "s1"},
+                                         {"groupId": "g2", "groupName": "grupo_b", "segmentacionName": "s2"}]}],
+        memberGroupMappings=[{"memberId": "u1", "groupId": "g1"}, {"memberId": "t1", "groupId": "g2"}],
+        members=[{"id": "u1", "email": "niño@x.co", "role": "Estudiante", "groupId": "g1"},
+                 {"id": "t1", "email": "tutor@x.co", "role": "Tutor"}],
+        grupoContenedor="rasters"
+    )
+    assert payload_a_lista(modelo) == lista
+
+@pytest.mark.parametrize("codec", ["json", "msgpack"])
+def test_codificar_y_decodificar(codec):
+    if codec not in codecs_disponibles():
+        pytest.skip("msgpack no está instalado")
+    lista = payload_a_lista(_payload())
+    datos = codificar(lista, codec)
+
+    assert codec_de(datos) == codec
+    assert decodificar(datos) == lista
+    assert payload_a_lista(payload_desde_lista(decodificar(datos))) == lista
+
+def test_json_si_no_hay_msgpack(monkeypatch):
+    monkeypatch.setattr(modelo_payload, "msgpack", None)
+    assert codecs_disponibles() == ["json"]
+
+    datos = codificar({"ok": True}, "msgpack")
+    assert datos == b'{"ok":true}'
+    assert decodificar(datos) == {"ok": True}
+    with pytest.raises(RuntimeError):
+        decodificar(b"\x81\xa2ok\xc3")
+
+def test_tramas():
+    canal = io.BytesIO()
+    escribir_trama(canal, b"uno")
+    escribir_trama(canal, b"")
+    escribir_trama(canal, codificar({"dos": 2}, "json"))
+
+    canal.seek(0)
+    assert leer_trama(canal) == b"uno"
+    assert leer_trama(canal) == b""
+    assert decodificar(leer_trama(canal)) == {"dos": 2}
+    assert leer_trama(canal) is None
+
+def test_trama_truncada():
+    canal = io.BytesIO()
+    escribir_trama(canal, b"completa")
+    canal = io.BytesIO(canal.getvalue()[:-2])
+    assert leer_trama(canal) is None
@@ -0,0 +1,125 @@
+# tests/test_normalizacion.py
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+
+np = pytest.importorskip("numpy")
+rasterio = pytest.importorskip("rasterio")
+pytest.importorskip("fastapi")
+
+from affine import Affine
+from rasterio.enums import Compression
+from rasterio.env import GDALVersion
+from backend.rasters import normalizacion
+from backend.rasters.normalizacion import convertir_a_cog, normalizar_archivos, ruta_cog
+
+SHA_1 = hashlib.sha256(b"uno").hexdigest()
+SHA_2 = hashlib.sha256(b"dos").hexdigest()
+
+@pytest.fixture(autouse=True)
+def almacen(tmp_path, monkeypatch):
+    monkeypatch.setenv("TIFF_STORE_DIR", str(tmp_path / "almacen"))
+    monkeypatch.delenv("RASTER_COG_NORMALIZE", raising=False)
+    monkeypatch.setattr(normalizacion, "_en_curso", {})
+    return tmp_path / "almacen"
+
+@pytest.fixture
+def pool_en_hilos(monkeypatch):
+    # Mismo flujo que el pool de procesos, sin lanzar intérpretes nuevos
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(normalizacion, "_obtener_pool", lambda: pool)
+    yield pool
+    pool.shutdown(wait=True)
+
+@pytest.fixture
+def sin_pool(monkeypatch):
+    def no_convertir():
+        raise AssertionError("No debe convertirse de nuevo")
+    monkeypatch.setattr(normalizacion, "_obtener_pool", no_convertir)
+
+def _tiff(ruta, lado: int, **opciones):
+    perfil = {"driver": "GTiff", "width": lado, "height": lado, "count": 1, "dtype": "uint8", "crs": "EPSG:3116",
+              "transform": Affine(1.0, 0.0, 1000.0, 0.0, -1.0, 2000.0), **opciones}
+    with rasterio.open(ruta, "w", **perfil) as dst:
+        dst.write(np.arange(lado * lado, dtype="uint32").reshape(1, lado, lado).astype("uint8"))
+    return str(ruta)
+
+def _es_cog(ruta) -> bool:
+    with rasterio.open(ruta) as src:
+        return normalizacion._es_cog(src)
+
+def test_archivo_pequeno_se_reutiliza(tmp_path):
+    origen = _tiff(tmp_path / "pequeno.tif", 64)
+    destino = str(tmp_path / "cog" / "pequeno.tif")
+    assert convertir_a_cog(origen, destino, "DEFLATE") == "ya_optimizado"
+    with open(origen, "rb") as a, open(destino, "rb") as b:
+        assert a.read() == b.read()
+
+def test_cog_existente_no_se_reescribe(tmp_path):
+    origen = _tiff(tmp_path / "plano.tif", 1100)
+    intermedio = str(tmp_path / "intermedio.tif")
+    assert convertir_a_cog(origen, intermedio, "DEFLATE") == "convertido"
+
+    destino = str(tmp_path / "cog" / "otra_vez.tif")
+    assert convertir_a_cog(intermedio, destino, "DEFLATE") == "ya_optimizado"
+    assert os.path.getsize(destino) == os.path.getsize(intermedio)
+
+def test_conversion_cog(tmp_path):
+    origen = _tiff(tmp_path / "plano.tif", 1100)
+    assert not _es_cog(origen)
+
+    destino = str(tmp_path / "cog" / "plano.tif")
+    assert convertir_a_cog(origen, destino, "LZW") == "convertido"
+    with rasterio.open(origen) as src, rasterio.open(destino) as dst:
+        assert dst.block_shapes[0] == (512, 512)
+        assert dst.compression == Compression.lzw
+        assert dst.overviews(1)
+        assert np.array_equal(dst.read(1), src.read(1))
+    # Sin temporales abandonados junto al destino
+    assert os.listdir(os.path.dirname(destino)) == ["plano.tif"]
+
+def test_respaldo_gdal_sin_driver_cog(tmp_path, monkeypatch):
+    monkeypatch.setattr(GDALVersion, "runtime", classmethod(lambda cls: GDALVersion(3, 0)))
+    origen = _tiff(tmp_path / "plano.tif", 1100)
+    destino = str(tmp_path / "cog" / "plano.tif")
+
+    assert convertir_a_cog(origen, destino, "DEFLATE") == "convertido"
+    with rasterio.open(destino) as dst:
+        assert dst.driver == "GTiff"
+        assert dst.block_shapes[0] == (512, 512)
+        assert dst.compression == Compression.deflate
+        # 1100 / 2 >= 512 > 1100 / 4
+        assert dst.overviews(1) == [2]
+    assert _es_cog(destino)
+
+def test_cache_por_sha256(tmp_path, pool_en_hilos, monkeypatch):
+    origen = _tiff(tmp_path / "plano.tif", 1100)
+    rutas, resumen = normalizar_archivos({"a.tif": (origen, SHA_1)})
+    assert rutas == {"a.tif": ruta_cog(SHA_1)}
+    assert resumen == [{"imagen": "a.tif", "resultado": "convertido"}]
+
+    # El mismo contenido con otro nombre o en otra carga usa la conversión guardada
+    monkeypatch.setattr(normalizacion, "_obtener_pool", lambda: pytest.fail("No debe convertirse de nuevo"))
+    copia = _tiff(tmp_path / "copia.tif", 1100)
+    rutas, resumen = normalizar_archivos({"b.tif": (copia, SHA_1)})
+    assert rutas == {"b.tif": ruta_cog(SHA_1)}
+    assert resumen == [{"imagen": "b.tif", "resultado": "cache"}]
+    assert normalizacion.solicitar_normalizacion(copia, SHA_1) is None
+
+def test_conversion_fallida_usa_el_original(tmp_path, pool_en_hilos):
+    danado = tmp_path / "danado.tif"
+    danado.write_bytes(b"no es un tiff")
+    sano = _tiff(tmp_path / "sano.tif", 64)
+
+    rutas, resumen = normalizar_archivos({"danado.tif": (str(danado), SHA_1), "sano.tif": (sano, SHA_2)})
+    assert rutas == {"danado.tif": str(danado), "sano.tif": ruta_cog(SHA_2)}
+    errores = [r for r in resumen if r["resultado"] == "error"]
+    assert [r["imagen"] for r in errores] == ["danado.tif"] and errores[0]["error"]
+    assert not os.path.exists(ruta_cog(SHA_1))
+
+def test_deshabilitada_o_sin_hash(tmp_path, sin_pool, monkeypatch):
+    origen = _tiff(tmp_path / "plano.tif", 64)
+    assert normalizar_archivos({"a.tif": (origen, None)}) == ({"a.tif": origen}, [])
+    monkeypatch.setenv("RASTER_COG_NORMALIZE", "0")
+    assert normalizar_archivos({"a.tif": (origen, SHA_1)}) == ({"a.tif": origen}, [])
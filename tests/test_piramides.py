@@ -0,0 +1,126 @@
+# tests/test_piramides.py
+import pytest
+
+pytest.importorskip("psycopg2")
+pytest.importorskip("fastapi")
+
+from psycopg2 import sql
+from backend.rasters.piramides import (
+    factores_piramide, remuestreo_piramide, argumentos_raster2pgsql, crear_piramides,
+    sentencia_permisos_piramides, sentencia_eliminar_piramides
+)
+
+# Texto de una sentencia compuesta con psycopg2.sql, sin necesitar una conexión real
+def _texto(consulta) -> str:
+    if isinstance(consulta, sql.Composed):
+        return "".join(_texto(parte) for parte in consulta.seq)
+    if isinstance(consulta, sql.Identifier):
+        return ".".join(f'"{s}"' for s in consulta.strings)
+    if isinstance(consulta, sql.SQL):
+        return consulta.string
+    return consulta
+
+class CursorFalso:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, consulta, parametros=None):
+        texto = _texto(consulta)
+        if self.conn.fallar_en and self.conn.fallar_en in texto:
+            raise RuntimeError("fallo simulado")
+        self.conn.ejecutadas.append((texto, parametros, self.conn.autocommit))
+
+    def close(self):
+        pass
+
+class ConexionFalsa:
+    def __init__(self, fallar_en=None):
+        self.autocommit = True
+        self.fallar_en = fallar_en
+        self.ejecutadas = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return CursorFalso(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+def test_factores(monkeypatch):
+    monkeypatch.delenv("RASTER_OVERVIEW_FACTORS", raising=False)
+    assert factores_piramide() == [2, 4, 8, 16]
+    monkeypatch.setenv("RASTER_OVERVIEW_FACTORS", " 8, 2,x,1,,-4,8")
+    assert factores_piramide() == [2, 8]
+    monkeypatch.setenv("RASTER_OVERVIEW_FACTORS", "0")
+    assert factores_piramide() == []
+    monkeypatch.setenv("RASTER_OVERVIEW_FACTORS", "")
+    assert factores_piramide() == []
+
+def test_remuestreo(monkeypatch):
+    monkeypatch.setenv("RASTER_OVERVIEW_RESAMPLING", "bilinear")
+    assert remuestreo_piramide() == "Bilinear"
+    monkeypatch.setenv("RASTER_OVERVIEW_RESAMPLING", "promedio")
+    assert remuestreo_piramide() == "NearestNeighbor"
+
+def test_argumentos_raster2pgsql():
+    assert argumentos_raster2pgsql([]) == []
+    assert argumentos_raster2pgsql([2, 4, 8]) == ["-l", "2,4,8"]
+
+def test_crear_piramides():
+    conn = ConexionFalsa()
+    crear_piramides(conn, "rasters", "imagen_1", [2, 4], "Cubic")
+
+    transaccion = [e for e in conn.ejecutadas if not e[2]]
+    assert transaccion == [
+        ("SELECT ST_CreateOverview(format('%%I.%%I', %s, %s)::regclass, 'rast', %s, %s);", ("rasters", "imagen_1", 2, "Cubic"), False),
+        ('CREATE INDEX ON "rasters"."o_2_imagen_1" USING gist (st_convexhull("rast"));', None, False),
+        ("SELECT ST_CreateOverview(format('%%I.%%I', %s, %s)::regclass, 'rast', %s, %s);", ("rasters", "imagen_1", 4, "Cubic"), False),
+        ('CREATE INDEX ON "rasters"."o_4_imagen_1" USING gist (st_convexhull("rast"));', None, False),
+    ]
+    assert conn.commits == 1
+    # VACUUM no puede ejecutarse dentro de una transacción
+    assert [e[0] for e in conn.ejecutadas if e[2]] == [
+        'VACUUM ANALYZE "rasters"."o_2_imagen_1";',
+        'VACUUM ANALYZE "rasters"."o_4_imagen_1";',
+    ]
+    assert conn.autocommit
+
+def test_crear_piramides_sin_factores():
+    conn = ConexionFalsa()
+    crear_piramides(conn, "rasters", "imagen_1", [])
+    assert conn.ejecutadas == [] and conn.commits == 0
+
+def test_crear_piramides_revierte_ante_un_fallo():
+    conn = ConexionFalsa(fallar_en="o_4_imagen_1")
+    with pytest.raises(RuntimeError):
+        crear_piramides(conn, "rasters", "imagen_1", [2, 4])
+    assert conn.rollbacks == 1 and conn.commits == 0
+    assert not any(e[0].startswith("VACUUM") for e in conn.ejecutadas)
+
+def test_permisos_piramides():
+    sentencia = sentencia_permisos_piramides("rasters", ["imagen_1", "imagen_2"], "SELECT", ["grupo_a_x", "o'brien@x.co"])
+    assert "WHERE r_table_schema = 'rasters' AND r_table_name = ANY(ARRAY['imagen_1', 'imagen_2']::text[])" in sentencia
+    assert "FOREACH r IN ARRAY ARRAY['grupo_a_x', 'o''brien@x.co']::text[] LOOP" in sentencia
+    assert "EXECUTE format('GRANT SELECT ON %s TO %I', t, r);" in sentencia
+    assert sentencia.strip().startswith("DO $$") and sentencia.strip().endswith("END $$;")
+
+def test_eliminar_piramides():
+    sentencia = sentencia_eliminar_piramides("rasters", "imagen_1")
+    assert "WHERE r_table_schema = 'rasters' AND r_table_name = 'imagen_1'" in sentencia
+    assert "EXECUTE 'DROP TABLE IF EXISTS ' || t || ' CASCADE';" in sentencia
+    assert sentencia.strip().startswith("DO $$") and sentencia.strip().endswith("END $$;")
+
+def test_crear_piramides_outdb_solo_en_la_transaccion():
+    conn = ConexionFalsa()
+    crear_piramides(conn, "rasters", "imagen_1", [2], fuera_de_bd=True)
+    # SET LOCAL antes de leer los píxeles y dentro de la transacción: no queda en la conexión del pool
+    assert [e[0] for e in conn.ejecutadas[:2]] == [
+        "SET LOCAL postgis.enable_outdb_rasters = true;",
+        "SET LOCAL postgis.gdal_enabled_drivers = 'GTiff';",
+    ]
+    assert not any(e[2] for e in conn.ejecutadas[:2])
+    assert all(e[0].startswith("SET LOCAL") for e in conn.ejecutadas if e[0].startswith("SET"))
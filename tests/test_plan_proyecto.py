@@ -0,0 +1,117 @@
+# tests/test_plan_proyecto.py
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("rasterio")
+
+from backend.database.lotes import literal, sin_duplicados
+from backend.routers.projects import (
+    ProjectExecutionRequest, plan_esquemas, plan_segmentaciones, plan_miembros_y_roles, tablas_en_plan
+)
+
+FECHA = "20260101"
+
+@pytest.fixture
+def payload():
+    return ProjectExecutionRequest(
+        projectName="proyecto_prueba",
+        studentTutor="no",
+        ciafLevel=2,
+        numImages=2,
+        numGroups=2,
+        numMembers=4,
+        groupNames=["grupo_a", "grupo_b"],
+        rasterGroupMappings=[
+            {"servantMap": "m1", "imageId": "i1", "imageName": "Imagen_1.tif", "srid": "3116",
+             "groups": [{"groupId": "g1", "groupName": "grupo_a", "segmentacionName": "s1"},
+                        {"groupId": "g2", "groupName": "grupo_b", "segmentacionName": "s2"}]},
+            {"servantMap": "m2", "imageId": "i2", "imageName": "imagen_2.tif", "srid": "4326",
+             "groups": [{"groupId": "g2", "groupName": "grupo_b", "segmentacionName": "s3"}]},
+        ],
+        memberGroupMappings=[
+            {"memberId": "u1", "groupId": "g1"},
+            {"memberId": "u2", "groupId": "g2"},
+            {"memberId": "t1", "groupId": "g1"},
+        ],
+        members=[
+            {"id": "u1", "email": "niño@universidad.edu.co", "role": "Estudiante", "groupId": "g1"},
+            {"id": "u2", "email": "學生@universidad.edu.co", "role": "Estudiante", "groupId": "g2"},
+            {"id": "t1", "email": "tutora@universidad.edu.co", "role": "Tutor"},
+            {"id": "l1", "email": "lider@universidad.edu.co", "role": "Líder"},
+        ],
+        grupoContenedor="rasters",
+    )
+
+def test_literal_texto_unicode_y_escapes():
+    assert literal("niño@universidad.edu.co") == "'niño@universidad.edu.co'"
+    assert literal("學生") == "'學生'"
+    assert literal("O'Brien") == "'O''Brien'"
+    assert literal("a\\b") == "E'a\\\\b'"
+    assert literal(None) == "NULL"
+    assert literal(3) == "3"
+    with pytest.raises(ValueError):
+        literal("a\x00b")
+
+def test_sin_duplicados_conserva_orden():
+    assert sin_duplicados(["b", "a", "b", "c", "a"]) == ["b", "a", "c"]
+
+def test_plan_esquemas(payload):
+    assert plan_esquemas(payload) == [
+        "CREATE SCHEMA IF NOT EXISTS grupo_a;",
+        "CREATE SCHEMA IF NOT EXISTS grupo_b;",
+        "CREATE SCHEMA IF NOT EXISTS tutora;",
+        "CREATE SCHEMA IF NOT EXISTS rasters;",
+    ]
+
+def test_plan_esquemas_contenedor_de_tutor(payload):
+    payload.studentTutor = "si"
+    assert "CREATE SCHEMA IF NOT EXISTS rasters;" not in plan_esquemas(payload)
+
+def test_plan_segmentaciones(payload):
+    huellas = {"Imagen_1.tif": ("POLYGON((0 0,1 0,1 1,0 1,0 0))", 3116)}
+    sentencias = plan_segmentaciones(payload, "rasters", huellas)
+    creaciones = [" ".join(s.split()) for s in sentencias if "CREATE TABLE" in s]
+
+    # Grupos y después el tutor del grupo g1; imagen_2 solo para grupo_b
+    assert [c.split(" (")[0] for c in creaciones] == [
+        "CREATE TABLE IF NOT EXISTS grupo_a.grupo_a_imagen_1",
+        "CREATE TABLE IF NOT EXISTS grupo_b.grupo_b_imagen_1",
+        "CREATE TABLE IF NOT EXISTS tutora.tutora_imagen_1",
+        "CREATE TABLE IF NOT EXISTS grupo_b.grupo_b_imagen_2",
+    ]
+    assert "ciaf_2 TEXT" in creaciones[0] and "geometry(Polygon, 3116)" in creaciones[0]
+    assert "geometry(Polygon, 4326)" in creaciones[3]
+
+    texto = "\n".join(sentencias)
+    assert "ST_GeomFromText('POLYGON((0 0,1 0,1 1,0 1,0 0))', 3116)" in texto
+    # Sin huella, la geometría sale de raster_columns
+    assert "r_table_schema = 'rasters' AND r_table_name = 'imagen_2'" in texto
+    assert "CREATE INDEX IF NOT EXISTS grupo_a_imagen_1_geom_gist ON grupo_a.grupo_a_imagen_1 USING gist (geom)" in texto
+    # El plan mezcla tablas, INSERT e índices: el conteo solo considera las tablas
+    assert tablas_en_plan(sentencias) == 4
+
+def test_plan_segmentaciones_omite_existentes(payload):
+    existentes = {("grupo_a", "grupo_a_imagen_1"), ("grupo_b", "grupo_b_imagen_1"), ("tutora", "tutora_imagen_1")}
+    texto = "\n".join(plan_segmentaciones(payload, "rasters", {}, existentes))
+    assert "imagen_1 (" not in texto
+    assert "grupo_b.grupo_b_imagen_2" in texto
+
+def test_plan_miembros_y_roles_con_texto_no_latin1(payload):
+    sentencias = plan_miembros_y_roles(payload, "proyecto_prueba", FECHA)
+    texto = "\n".join(sentencias)
+
+    assert "'學生@universidad.edu.co'" in texto
+    assert "'niño@universidad.edu.co'" in texto
+    assert 'GRANT "grupo_a_20260101" TO "niño@universidad.edu.co";' in sentencias
+    assert 'GRANT "grupo_b_20260101" TO "學生@universidad.edu.co";' in sentencias
+    assert 'GRANT "tutor_proyecto_prueba" TO "tutora@universidad.edu.co", "lider@universidad.edu.co";' in sentencias
+    assert 'GRANT SELECT ON grupo_a.grupo_a_imagen_1 TO "grupo_b_20260101";' in sentencias
+    # Los GRANT repetidos por imagen se emiten una vez
+    assert sentencias.count('GRANT USAGE ON SCHEMA grupo_b TO "grupo_b_20260101";') == 1
+    assert len(sentencias) == len(set(sentencias))
+
+def test_plan_miembros_y_roles_incremental(payload):
+    sentencias = plan_miembros_y_roles(payload, "proyecto_prueba", FECHA, payload.rasterGroupMappings[1:])
+    texto = "\n".join(sentencias)
+    assert "imagen_2" in texto
+    assert "imagen_1" not in texto
@@ -0,0 +1,109 @@
+# tests/test_plantilla_qgs.py
+import os
+import zipfile
+import xml.etree.ElementTree as ET
+import pytest
+
+from qgis_tools.modelo_payload import (
+    Segmentacion, RasterGroupMapping, MemberGroupMapping, Miembro, ProjectExecutionRequest
+)
+from qgis_tools.plantilla_qgs import construir_qgs, generar_proyectos_qgs
+
+EXTENSION = (1000.0, 2000.0, 1512.0, 2512.0)
+
+def _payload():
+    return ProjectExecutionRequest(
+        "Proyecto_Prueba", "no", 1, 1, 2, 1,
+        ["grupo_a", "grupo_b"],
+        [RasterGroupMapping("m1", "i1", "Imagen_1.tif", "3116", [
+            Segmentacion("g1", "grupo_a", "s1"), Segmentacion("g2", "grupo_b", "s2")
+        ])],
+        [MemberGroupMapping("t1", "g1")],
+        [Miembro("t1", "tutora@x.co", "Tutor")],
+        "Rasters"
+    )
+
+def _valores(nodo) -> list:
+    return [v.text for v in nodo.findall("value")]
+
+@pytest.fixture
+def qgs():
+    contenido = construir_qgs(
+        "imagen_1", "uri_raster",
+        [("grupo_a_imagen_1", "uri_a"), ("grupo_b_imagen_1", "uri_b")],
+        3116, EXTENSION
+    )
+    assert contenido.startswith(b"<!DOCTYPE qgis")
+    return ET.fromstring(contenido.split(b"\n", 1)[1])
+
+def test_capas_y_arbol(qgs):
+    arbol = qgs.findall("layer-tree-group/layer-tree-layer")
+    assert [c.get("name") for c in arbol] == ["grupo_a_imagen_1", "grupo_b_imagen_1", "imagen_1"]
+    assert [c.get("providerKey") for c in arbol] == ["postgres", "postgres", "postgresraster"]
+    assert all(c.get("checked") == "Qt::Checked" for c in arbol)
+
+    capas = {c.findtext("layername"): c for c in qgs.findall("projectlayers/maplayer")}
+    assert capas["imagen_1"].get("type") == "raster"
+    assert capas["grupo_a_imagen_1"].get("geometry") == "Polygon"
+    assert capas["grupo_b_imagen_1"].findtext("datasource") == "uri_b"
+
+    # Árbol, capas y orden de dibujo comparten ids
+    ids = [c.get("id") for c in arbol]
+    assert [capas[c.get("name")].findtext("id") for c in arbol] == ids
+    assert [c.get("id") for c in qgs.findall("layerorder/layer")] == ids
+
+def test_crs_y_extension(qgs):
+    assert qgs.findtext("projectCrs/spatialrefsys/authid") == "EPSG:3116"
+    assert qgs.findtext("mapcanvas/destinationsrs/spatialrefsys/authid") == "EPSG:3116"
+    for capa in qgs.findall("projectlayers/maplayer"):
+        assert capa.findtext("srs/spatialrefsys/srid") == "3116"
+        assert float(capa.findtext("extent/xmax")) == 1512.0
+
+def test_propiedades_ows(qgs):
+    propiedades = qgs.find("properties")
+    assert propiedades.findtext("WMSServiceCapabilities") == "true"
+    assert propiedades.findtext("WMSServiceTitle") == "imagen_1"
+    assert _valores(propiedades.find("WMSCrsList")) == ["EPSG:3116", "EPSG:4326", "EPSG:3857"]
+    assert [float(v) for v in _valores(propiedades.find("WMSExtent"))] == list(EXTENSION)
+
+    vectoriales = [c.findtext("id") for c in qgs.findall("projectlayers/maplayer") if c.get("type") == "vector"]
+    assert _valores(propiedades.find("WFSLayers")) == vectoriales
+    for operacion in ("Update", "Insert", "Delete"):
+        assert _valores(propiedades.find(f"WFSTLayers/{operacion}")) == vectoriales
+
+def test_sin_raster_ni_extension():
+    contenido = construir_qgs("imagen_1", None, [("grupo_a_imagen_1", "uri_a")], 4326, None)
+    raiz = ET.fromstring(contenido.split(b"\n", 1)[1])
+    assert [c.get("type") for c in raiz.findall("projectlayers/maplayer")] == ["vector"]
+    assert raiz.find("mapcanvas") is None and raiz.find("properties/WMSExtent") is None
+    assert _valores(raiz.find("properties/WMSCrsList")) == ["EPSG:4326", "EPSG:3857"]
+
+def test_generar_proyectos_qgs(tmp_path, monkeypatch):
+    for variable, valor in {"DB_USER": "usuario", "DB_PASSWORD": "clave", "DB_HOST": "db", "DB_PORT": "5433",
+                            "QGIS_PROJECTS_DEV_PATH": str(tmp_path), "QGIS_SERVER_HOST": "mapas",
+                            "QGIS_SERVER_PORT": "443"}.items():
+        monkeypatch.setenv(variable, valor)
+
+    # Falta la segmentación del tutor: no se incluye
+    existentes = {("rasters", "imagen_1"), ("grupo_a", "grupo_a_imagen_1"), ("grupo_b", "grupo_b_imagen_1")}
+    resultado = generar_proyectos_qgs(_payload(), "proyecto_db", "Rasters", existentes, {"imagen_1": (3116, EXTENSION)})
+
+    assert resultado == [{
+        "imagen": "Imagen_1.tif",
+        "servantMap": "https://mapas:443/cgi-bin/Segmentations/proyecto_prueba/imagen_1/qgis_mapserv.fcgi"
+    }]
+    ruta = tmp_path / "proyecto_prueba" / "imagen_1" / "imagen_1.qgz"
+    with zipfile.ZipFile(ruta) as zf:
+        assert zf.namelist() == ["imagen_1.qgs"]
+        raiz = ET.fromstring(zf.read("imagen_1.qgs").split(b"\n", 1)[1])
+    assert not os.path.exists(f"{ruta}.tmp")
+
+    fuentes = {c.findtext("layername"): c.findtext("datasource") for c in raiz.findall("projectlayers/maplayer")}
+    assert set(fuentes) == {"grupo_a_imagen_1", "grupo_b_imagen_1", "imagen_1"}
+    assert fuentes["imagen_1"] == (
+        "dbname='proyecto_db' host=db port=5433 user=usuario password=clave table=\"Rasters\".\"imagen_1\" (rast)"
+    )
+    assert fuentes["grupo_a_imagen_1"] == (
+        "host=db port=5433 dbname='proyecto_db' user=usuario password=clave sslmode=disable key='id' srid=3116 "
+        "type=Polygon table=\"grupo_a\".\"grupo_a_imagen_1\" (geom)"
+    )
@@ -0,0 +1,78 @@
+# tests/test_plantillas.py
+import pytest
+
+pytest.importorskip("psycopg2")
+
+from backend.database import plantillas
+from backend.database.plantillas import (
+    EXTENSIONES_PROYECTO, version_plantilla, prefijo_bases_calientes, PREFIJO_BASE_CALIENTE
+)
+
+VERSIONES = {ext: "1.0" for ext in EXTENSIONES_PROYECTO}
+
+def test_version_estable_para_las_mismas_versiones():
+    assert version_plantilla(VERSIONES) == version_plantilla(dict(VERSIONES))
+
+def test_version_cambia_al_actualizar_una_extension():
+    actualizadas = dict(VERSIONES, postgis="3.5.0")
+    assert version_plantilla(actualizadas) != version_plantilla(VERSIONES)
+
+def test_bases_calientes_ligadas_a_la_plantilla():
+    plantilla = f"confiseg_plantilla_{version_plantilla(VERSIONES)}"
+    prefijo = prefijo_bases_calientes(plantilla)
+    assert prefijo == f"{PREFIJO_BASE_CALIENTE}{version_plantilla(VERSIONES)}_"
+
+# Catálogo pg_database simulado: evalúa left(datname, length(p)) = p y registra los DDL
+class CursorCatalogo:
+    def __init__(self, bases):
+        self.bases = list(bases)
+        self.ddl = []
+        self._filas = []
+
+    def execute(self, sentencia, parametros=None):
+        if sentencia.startswith("SELECT datname FROM pg_database"):
+            assert "LIKE" not in sentencia
+            prefijo, comparado = parametros
+            self._filas = [(d,) for d in sorted(self.bases) if d[:len(prefijo)] == comparado]
+        elif not sentencia.startswith("SELECT pg_advisory"):
+            self.ddl.append(sentencia)
+
+    def fetchall(self):
+        return self._filas
+
+    def close(self):
+        pass
+
+PLANTILLA = f"confiseg_plantilla_{version_plantilla(VERSIONES)}"
+CALIENTE = f"{prefijo_bases_calientes(PLANTILLA)}abc"
+# Coincidiría con LIKE 'confiseg_caliente_<ver>_%' porque "_" es comodín
+PARECIDA = f"confisegXcalienteX{version_plantilla(VERSIONES)}Xabc"
+
+def test_tomar_base_caliente_exige_el_prefijo_literal():
+    cur = CursorCatalogo([PARECIDA])
+    assert not plantillas._tomar_base_caliente(cur, "proyecto_1", PLANTILLA)
+    assert cur.ddl == []
+
+    cur = CursorCatalogo([PARECIDA, CALIENTE])
+    assert plantillas._tomar_base_caliente(cur, "proyecto_1", PLANTILLA)
+    assert cur.ddl == [f"ALTER DATABASE {CALIENTE} RENAME TO proyecto_1"]
+
+def test_reponer_solo_cuenta_y_elimina_bases_calientes(monkeypatch):
+    obsoleta = f"{PREFIJO_BASE_CALIENTE}00000000_abc"
+    cur = CursorCatalogo([PARECIDA, CALIENTE, obsoleta])
+
+    class Conexion:
+        autocommit = False
+        def cursor(self):
+            return cur
+        def close(self):
+            pass
+
+    monkeypatch.setenv("PROJECT_DB_WARM_POOL", "2")
+    monkeypatch.setattr(plantillas, "asegurar_plantilla", lambda: PLANTILLA)
+    monkeypatch.setattr(plantillas, "get_connection", lambda dbname: Conexion())
+    plantillas.reponer_bases_calientes()
+
+    assert cur.ddl[0] == f"DROP DATABASE IF EXISTS {obsoleta}"
+    assert len(cur.ddl) == 2 and cur.ddl[1].startswith(f"CREATE DATABASE {prefijo_bases_calientes(PLANTILLA)}")
+    assert not any(PARECIDA in d for d in cur.ddl)
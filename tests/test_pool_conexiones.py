@@ -0,0 +1,155 @@
+# tests/test_pool_conexiones.py
+import threading
+import pytest
+
+pytest.importorskip("psycopg2")
+
+from backend.database import database
+from backend.database.database import PoolConexiones
+
+class CursorFalso:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sentencia):
+        self.conn.consultas += 1
+        if self.conn.al_consultar:
+            self.conn.al_consultar()
+        if self.conn.rota:
+            raise RuntimeError("conexión rota")
+
+    def close(self):
+        pass
+
+class ConexionFalsa:
+    def __init__(self):
+        self.closed = 0
+        self.rota = False
+        self.consultas = 0
+        self.al_consultar = None
+        self.autocommit = False
+
+    def cursor(self):
+        return CursorFalso(self)
+
+    def rollback(self):
+        pass
+
+    def get_transaction_status(self):
+        return 0
+
+    def close(self):
+        self.closed = 1
+
+@pytest.fixture
+def abiertas(monkeypatch):
+    conexiones = []
+    def abrir(dbname):
+        conn = ConexionFalsa()
+        conexiones.append(conn)
+        return conn
+    monkeypatch.setattr(database, "get_connection", abrir)
+    return conexiones
+
+def _pool(minimo=0, maximo=3, validar_despues=0.0):
+    return PoolConexiones("prueba", minimo, maximo, idle_timeout=300, validar_despues=validar_despues, espera_maxima=0.2)
+
+def test_rellenar_minimo_abre_conexiones_libres(abiertas):
+    pool = _pool(minimo=2)
+    pool.rellenar_minimo()
+    assert len(abiertas) == 2
+    assert len(pool._libres) == 2 and pool._en_uso == 0
+
+    # Ya está completo: no abre más
+    pool.rellenar_minimo()
+    assert len(abiertas) == 2
+
+def test_reutiliza_conexion_devuelta(abiertas):
+    pool = _pool()
+    conn = pool.obtener()
+    pool.devolver(conn)
+    assert pool.obtener() is conn
+    assert len(abiertas) == 1
+
+def test_validacion_fuera_del_lock(abiertas):
+    pool = _pool()
+    conn = pool.obtener()
+    pool.devolver(conn)
+
+    adquirido = []
+    def intentar_lock():
+        adquirido.append(pool._condicion.acquire(timeout=1))
+        if adquirido[-1]:
+            pool._condicion.release()
+    def al_consultar():
+        hilo = threading.Thread(target=intentar_lock)
+        hilo.start()
+        hilo.join()
+    conn.al_consultar = al_consultar
+
+    assert pool.obtener() is conn
+    assert conn.consultas == 1
+    assert adquirido == [True]
+
+def test_conexion_rota_se_descarta_y_se_abre_otra(abiertas):
+    pool = _pool()
+    rota = pool.obtener()
+    pool.devolver(rota)
+    rota.rota = True
+
+    nueva = pool.obtener()
+    assert nueva is not rota
+    assert rota.closed
+    assert pool._en_uso == 1 and not pool._libres
+
+def test_maximo_agota_la_espera(abiertas):
+    pool = _pool(maximo=1)
+    pool.obtener()
+    with pytest.raises(TimeoutError):
+        pool.obtener()
+
+@pytest.fixture
+def pools(monkeypatch, abiertas):
+    monkeypatch.setattr(database, "_pools", {})
+    monkeypatch.setattr(database, "_iniciar_mantenimiento", lambda: None)
+    monkeypatch.setenv("DB_POOL_MIN", "2")
+    monkeypatch.setenv("DB_POOL_IDLE_TIMEOUT", "0")
+    return database._pools
+
+def test_minimo_solo_en_postgres(pools):
+    assert database.obtener_pool("postgres").minimo == 2
+    assert database.obtener_pool("proyecto_1").minimo == 0
+
+def test_pools_de_proyecto_inactivos_se_olvidan(pools, monkeypatch):
+    monkeypatch.setenv("DB_POOL_MIN", "0")
+    with database.conexion("proyecto_1"):
+        # En uso no se cierra
+        database._mantener_pools_una_vez()
+        assert "proyecto_1" in pools
+    pool = pools["proyecto_1"]
+
+    database._mantener_pools_una_vez()
+    database.obtener_pool("postgres")
+    database._mantener_pools_una_vez()
+
+    assert "proyecto_1" not in pools and "postgres" in pools
+    assert pool._cerrado
+
+def test_conexion_sobre_pool_recien_cerrado(pools, monkeypatch):
+    viejo = database.obtener_pool("proyecto_1")
+    viejo.cerrar()
+    entregados = iter([viejo])
+    obtener_pool = database.obtener_pool
+
+    def obtener(dbname="postgres"):
+        # La primera vez entrega el pool ya cerrado, como si el mantenimiento lo hubiera desalojado
+        pool = next(entregados, None)
+        if pool is None:
+            pools.pop(dbname, None)
+            pool = obtener_pool(dbname)
+        return pool
+    monkeypatch.setattr(database, "obtener_pool", obtener)
+
+    with database.conexion("proyecto_1") as conn:
+        assert not conn.closed
+    assert pools["proyecto_1"] is not viejo
@@ -0,0 +1,57 @@
+# tests/test_trabajos.py
+import time
+import pytest
+
+pytest.importorskip("fastapi")
+
+from backend import trabajos
+
+@pytest.fixture(autouse=True)
+def carpeta_trabajos(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROJECT_JOB_DIR", str(tmp_path))
+    return tmp_path
+
+def _esperar(id_trabajo: str) -> dict:
+    for _ in range(200):
+        estado = trabajos.estado_trabajo(id_trabajo)
+        if estado and estado["estado"] in ("completado", "error"):
+            return estado
+        time.sleep(0.01)
+    raise AssertionError("El trabajo no terminó")
+
+def _trabajo_ok(trabajo, valor):
+    with trabajo.etapa("uno"):
+        pass
+    with trabajo.etapa("dos"):
+        pass
+    return 200, {"valor": valor}
+
+def test_estado_visible_desde_otro_proceso(carpeta_trabajos):
+    trabajo = trabajos.lanzar_trabajo(_trabajo_ok, ["uno", "dos"], 7)
+    _esperar(trabajo.id)
+
+    # Otro worker no tiene el trabajo en memoria: lo lee del disco
+    with trabajos._lock:
+        trabajos._trabajos.pop(trabajo.id)
+    estado = trabajos.estado_trabajo(trabajo.id)
+
+    assert estado["estado"] == "completado"
+    assert estado["resultado"] == {"valor": 7}
+    assert [e["estado"] for e in estado["etapas"]] == ["completado", "completado"]
+    assert "inicio_reloj" not in estado
+    assert (carpeta_trabajos / f"{trabajo.id}.json").exists()
+
+def test_error_de_etapa_queda_registrado():
+    def fallar(trabajo):
+        with trabajo.etapa("uno"):
+            raise RuntimeError("falla")
+
+    trabajo = trabajos.lanzar_trabajo(fallar, ["uno"])
+    estado = _esperar(trabajo.id)
+    assert estado["estado"] == "error"
+    assert estado["status_code"] == 500
+    assert estado["etapas"][0]["estado"] == "error"
+
+def test_id_invalido_o_desconocido():
+    assert trabajos.estado_trabajo("../../etc/passwd") is None
+    assert trabajos.estado_trabajo("0" * 32) is None